@@ -12,18 +12,24 @@ TODO:
 4. Add a get list from trello command
 5. Add a shopping list by shop-route command
 """
+import sys
 
+from hyper_shopping.client import delegate
+
+# categorize through a running service before any of the slow imports below
+if __name__ == "__main__" and delegate(sys.argv[1:]):
+    sys.exit(0)
+
+import asyncio
+import dbm
+from functools import lru_cache
 from pprint import pprint
-import re
+import json
 import shelve
 from pathlib import Path
-from typing import List
-
-from spellchecker import SpellChecker
-from nltk.corpus import wordnet as wn
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 import click
-from click_repl import register_repl
 from prompt_toolkit.shortcuts import (
     button_dialog,
     input_dialog,
@@ -32,35 +38,393 @@ from prompt_toolkit.shortcuts import (
     radiolist_dialog,
 )
 
-from hyper_shopping.trello_helpers import get_card, get_checklist_items
-from hyper_shopping.datastore import Storage
+from hyper_shopping.datastore import (
+    ShelveBackend,
+    SQLiteBackend,
+    Storage,
+    migrate_shelf,
+)
+from hyper_shopping.batch import (
+    RECORDED,
+    ReviewQueue,
+    categorize_batch,
+    department_categories,
+    read_items,
+)
+from hyper_shopping.catalog import Catalog
+from hyper_shopping.client import SERVICE_SOCKET, ServiceClient, service_available
+from hyper_shopping.categorize import (
+    CategoryIndex,
+    CategoryResolver,
+    normalize_word,
+)
+from hyper_shopping.instrument import Recorder, start_profile
+from hyper_shopping.hypernyms import (
+    build_hypernym_index,
+    lookup_hypernims,
+    lookup_many_hypernims,
+    walk_hypernims,
+)
+from hyper_shopping.layout import RouteCache, frequent_combinations
+from hyper_shopping.lexicon import Lexicon, write_lexicon
+from hyper_shopping.phrases import PhraseResolver
+from hyper_shopping.routing import SHOP_LAYOUTS, SHOP_ROUTES, RouteSorter
+from hyper_shopping.spelling import SpellingIndex
+from hyper_shopping.trigrams import TrigramIndex, TrigramMatch
+
+if TYPE_CHECKING:
+    from hyper_shopping.embeddings import EmbeddingClassifier
 
-spell = SpellChecker()
 dictionary = Path("./dictionary.txt")
-if not dictionary.exists():
-    dictionary.touch()
-spell.word_frequency.load_text_file("./dictionary.txt")
+SPELLING_INDEX = Path("./spelling.idx")
+WORD_VECTORS = Path("./vectors.npy")
+TRIGRAM_INDEX = Path("./trigrams.idx")
 
-re_non_word = re.compile("[^\w]+")
+SHELVE_STORAGE = Path("./.data")
+SQLITE_STORAGE = Path("./.data.sqlite")
+CARD_CACHE = Path("./.cards")
+ROUTE_CACHE = Path("./.routes")
 
-storage = Storage(shelve.open(".data"))
 
+# the stores, indexes and files below are opened on first use, so that
+# commands only pay for what they use
+
+
+@lru_cache(maxsize=None)
+def get_storage() -> Storage:
+    """
+    Use the SQLite store once it was created by ``migrate-storage``,
+    the original shelve otherwise.
+    """
+    if SQLITE_STORAGE.exists():
+        return Storage(SQLiteBackend(SQLITE_STORAGE))
+    return Storage(shelve.open(str(SHELVE_STORAGE)))
+
+
+@lru_cache(maxsize=None)
+def get_review_queue() -> ReviewQueue:
+    return ReviewQueue(Path("./review.jsonl"))
+
+# a new name, as the text hypernyms.idx of earlier versions isn't a lexicon
+HYPERNYM_INDEX = Path("./hypernyms.lex")
+
+
+@lru_cache(maxsize=None)
+def get_lexicon() -> Optional[Lexicon]:
+    """
+    Open the lexicon built by ``build-index``, if any; WordNet is walked
+    directly without one
+    """
+    if not HYPERNYM_INDEX.exists():
+        return None
+    try:
+        return Lexicon(HYPERNYM_INDEX)
+    except ValueError as error:
+        click.echo(
+            f"Ignoring {error}, run 'build-index' to rebuild it", err=True
+        )
+        return None
+
+
+# the store products, crawled by the scrapers' greens spider
+CATALOG = Path("./catalog.sqlite")
+
+
+@lru_cache(maxsize=None)
+def get_catalog() -> Optional[Catalog]:
+    return Catalog(CATALOG) if CATALOG.exists() else None
+
+
+@lru_cache(maxsize=None)
+def get_resolver() -> CategoryResolver:
+    return CategoryResolver(
+        get_storage(),
+        lambda item: get_hypernims(item),
+        phrases=PhraseResolver(lambda phrases: get_many_hypernims(phrases)),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_route_cache(read_only: bool = False) -> RouteCache:
+    """
+    :param read_only: start from a copy of the persisted routes and keep
+        the new ones in memory, for a long running process that mustn't
+        overwrite the routes other commands persist
+    """
+    if not read_only:
+        return RouteCache(SHOP_LAYOUTS, shelve.open(str(ROUTE_CACHE)))
+    try:
+        with shelve.open(str(ROUTE_CACHE), flag="r") as shelf:
+            routes = dict(shelf)
+    except dbm.error:  # none were persisted yet
+        routes = {}
+    return RouteCache(SHOP_LAYOUTS, routes)
+
+
+@lru_cache(maxsize=None)
+def get_route_sorter(read_only: bool = False) -> RouteSorter:
+    storage = get_storage()
+    return RouteSorter(
+        SHOP_LAYOUTS,
+        lambda item: storage.get_item_category(item),
+        get_route_cache(read_only),
+        storage.get_category_synonyms(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_spelling_index() -> SpellingIndex:
+    """
+    Load the spelling index on first use, building it from the spell
+    checker's word frequencies if needed, plus our custom dictionary words
+    """
+    if SPELLING_INDEX.exists():
+        index = SpellingIndex.load(SPELLING_INDEX)
+    else:
+        from spellchecker import SpellChecker
+
+        index = SpellingIndex.build(SpellChecker().word_frequency.dictionary)
+        index.save(SPELLING_INDEX)
+    if dictionary.exists():
+        index.add_words(
+            word for word in dictionary.read_text().split() if word not in index
+        )
+    return index
+
+
+@lru_cache(maxsize=None)
+def get_classifier() -> Optional["EmbeddingClassifier"]:
+    """
+    Load the word vector classifier on first use, when there are vectors
+    (see the ``build-vectors`` command), trained on the stored categories
+    """
+    if not WORD_VECTORS.exists():
+        return None
+    # NumPy is only imported by the commands that use the vectors
+    from hyper_shopping.embeddings import (
+        EmbeddingClassifier,
+        WordVectors,
+        category_examples,
+    )
+
+    storage = get_storage()
+    examples = category_examples(
+        storage.get_item_categories(), storage.get_known_categories()
+    )
+    return EmbeddingClassifier(WordVectors(WORD_VECTORS), examples)
+
+
+def trigram_entries() -> Dict[str, str]:
+    """
+    Return the names to match items to: the catalog products (with the
+    category their department maps to) and the categorized items, which
+    take precedence
+    """
+    entries: Dict[str, str] = {}
+    catalog = get_catalog()
+    if catalog is not None:
+        products = list(catalog.products())
+        mapped = department_categories(
+            {product["department"] for product in products}, get_resolver()
+        )
+        entries.update(
+            (product["name"], mapped[product["department"]])
+            for product in products
+            if product["department"] in mapped
+        )
+    entries.update(get_storage().get_item_categories())
+    return entries
+
+
+def trigram_stamp():
+    """
+    Return what the trigram entries depend on, without reading them: the
+    catalog version, the number of categorized items, and the number of
+    known categories and synonyms, which the departments are mapped onto
+    """
+    storage = get_storage()
+    catalog = get_catalog()
+    return (
+        catalog.version if catalog is not None else None,
+        storage.count_item_categories(),
+        len(storage.get_known_categories()),
+        len(storage.get_category_synonyms()),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_trigram_index() -> TrigramIndex:
+    """
+    Load the trigram index on first use, adding the products and items
+    that are new since it was saved, if its stamp changed (see
+    ``build-trigrams`` to rebuild it)
+    """
+    index = None
+    if TRIGRAM_INDEX.exists():
+        try:
+            index = TrigramIndex.load(TRIGRAM_INDEX)
+        except ValueError as error:  # of an earlier version
+            click.echo(f"Ignoring {error}, rebuilding it", err=True)
+    if index is None:
+        index = TrigramIndex()
+    stamp = trigram_stamp()
+    if index.stamp != stamp:
+        index.update(trigram_entries())
+        index.stamp = stamp
+        index.save(TRIGRAM_INDEX)
+    return index
+
+
+def update_trigram_index(item_categories: Dict[str, str]):
+    """
+    Add newly categorized items to the trigram index, if it's loaded (it
+    is updated when loaded otherwise), and save it with its new stamp
+    """
+    if not item_categories or not get_trigram_index.cache_info().currsize:
+        return
+    index = get_trigram_index()
+    index.update(item_categories)
+    index.stamp = trigram_stamp()
+    index.save(TRIGRAM_INDEX)
+
+
+def get_classify():
+    classifier = get_classifier()
+    return classifier.classify if classifier is not None else None
+
+
+def add_custom_spelling(word):
+    """
+    Learn a spelling confirmed by the user, in the index and the dictionary
+    """
+    get_spelling_index().add_words(word.split())
+    with open(dictionary, "a") as file:
+        file.write(f"{word}\n")
+
+
+@lru_cache(maxsize=None)
+def get_wordnet():
+    """
+    Import NLTK WordNet on demand, only needed when there is no lexicon,
+    offering to download its data when it is missing
+    """
+    from nltk.corpus import wordnet
 
-@click.group()
-def cli():
     try:
-        wn.synsets("test")
+        wordnet.synsets("test")
     except LookupError:
         if not yes_no_dialog(
             title="NLTK WordNet dataset is missing",
             text="Would you like to download it?",
         ).run():
-            click.echo("NLTK Wordnet is required to run Hyper Shopping")
-            return
+            raise click.ClickException(
+                "NLTK Wordnet is required to run Hyper Shopping"
+            )
 
         import nltk
 
         nltk.download("wordnet")
+    return wordnet
+
+
+# what --instrument measures: functions of this module, the category
+# store (and its backend) and index, and all Trello calls
+INSTRUMENTED_FUNCTIONS = [
+    "get_hypernims",
+    "get_many_hypernims",
+    "get_valid_categories",
+    "test_typos",
+    "choose_word",
+    "choose_category",
+    "choose_spelling",
+    "choose_category_synonym",
+    "confirm_fuzzy_match",
+    "confirm_guessed_category",
+]
+INSTRUMENTED_STORAGE = [
+    "flush",
+    "get_known_categories",
+    "update_known_categories",
+    "get_item_category",
+    "get_item_categories",
+    "set_item_categories",
+    "get_category_synonyms",
+    "add_category_synonym",
+]
+INSTRUMENTED_BACKEND = [
+    "get_item_category",
+    "get_item_categories",
+    "set_item_categories",
+    "add_known_categories",
+    "add_category_synonyms",
+]
+INSTRUMENTED_TRELLO = [
+    "get_shopping_cards",
+    "get_checklist_items",
+    "get_card",
+    "get_card_from_file",
+    "sort_checklists",
+    "sort_checklist",
+]
+
+
+def start_instrumentation(ctx, trace):
+    """
+    Measure the pipeline's hot paths until the command ends, then print a
+    summary (and write the trace file, if given)
+    """
+    # the commands import these on demand, and so get the patched functions
+    from hyper_shopping import trello_helpers
+    from hyper_shopping.trello_async import AsyncTrello
+
+    recorder = Recorder()
+    recorder.patch(sys.modules[__name__], INSTRUMENTED_FUNCTIONS)
+    recorder.patch(Storage, INSTRUMENTED_STORAGE, "Storage.")
+    # the batch and resolver path matches categories through the index
+    recorder.patch(CategoryIndex, ["match"], "CategoryIndex.")
+    # patching both leaves the store closed until a command needs it
+    for backend in (ShelveBackend, SQLiteBackend):
+        recorder.patch(backend, INSTRUMENTED_BACKEND, f"{backend.__name__}.")
+    recorder.patch(trello_helpers, INSTRUMENTED_TRELLO, "trello.")
+    recorder.patch(AsyncTrello, ["request"], "trello.")
+
+    def finish():
+        recorder.unpatch()
+        stats = get_resolver().stats()
+        for name in ("hits", "misses", "evictions"):
+            recorder.count(f"resolver.{name}", stats[name])
+        click.echo(recorder.summary(), err=True)
+        if trace:
+            recorder.save(Path(trace))
+
+    ctx.call_on_close(finish)
+
+
+@click.group()
+@click.option(
+    "--instrument",
+    is_flag=True,
+    envvar="HYPER_SHOPPING_INSTRUMENT",
+    help="Time the pipeline's hot paths and print a summary",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False),
+    envvar="HYPER_SHOPPING_TRACE",
+    help="Also write the timings as a Chrome trace JSON file",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False),
+    envvar="HYPER_SHOPPING_PROFILE",
+    help="Capture the run with cProfile into this file",
+)
+@click.pass_context
+def cli(ctx, instrument, trace, profile):
+    if instrument or trace:
+        start_instrumentation(ctx, trace)
+    if profile:
+        ctx.call_on_close(start_profile(Path(profile)))
 
 
 def make_labels(options: List[str]):
@@ -112,7 +476,7 @@ def choose_category_synonym(item, hypernims, **kwargs):
     if not synonym:
         return
 
-    known_categories = storage.get_known_categories()
+    known_categories = get_storage().get_known_categories()
     category = radiolist_dialog(
         values=make_labels(sorted(known_categories)),
         title=f"Choose category for '{synonym}'",
@@ -128,12 +492,14 @@ def choose_category_synonym(item, hypernims, **kwargs):
             text=f"What is the category for synonym '{item}'",
         ).run()
     if category:
-        storage.add_category_synonym(synonym, category)
+        get_storage().add_category_synonym(synonym, category)
 
     return category
 
 
 def get_checklist():
+    from hyper_shopping.trello_helpers import get_card, get_checklist_items
+
     # TODO: get user's trello card matching ID
     card = get_card()
     card_prompt_result = yes_no_dialog(
@@ -150,34 +516,30 @@ def get_checklist():
 
 def get_hypernims(item: str) -> List:
     """
-    Unpack a list of synsets into a list of lemma names pertaining to each
-    matched hypernim.
+    Return a deduplicated list of lemma names pertaining to each hypernim
+    of the item's synsets.
 
-    :param synsets: a list of nltk.corpus.reader.wordnet.Synset
-    :type synsets: List
+    Answered from the memory-mapped lexicon when one was built (see the
+    ``build-index`` command), otherwise by walking WordNet directly.
     """
-    synsets = wn.synsets(item)
-    hypernim_paths = [
-        paths for synset in synsets for paths in synset.hypernym_paths()
-    ]
-    hypernym_synsets = [
-        synset for hypernims in hypernim_paths for synset in hypernims
-    ]
-    return [
-        name for synset in hypernym_synsets for name in synset.lemma_names()
-    ]
+    lexicon = get_lexicon()
+    if lexicon is not None:
+        return lookup_hypernims(lexicon, item)
+    return walk_hypernims(get_wordnet().synsets(item))
+
+
+def get_many_hypernims(items: List[str]) -> Dict[str, List[str]]:
+    """
+    Return the hypernims of many items, in a single pass over the lexicon
+    """
+    lexicon = get_lexicon()
+    if lexicon is not None:
+        return lookup_many_hypernims(lexicon, items)
+    return {item: get_hypernims(item) for item in items}
 
 
 def get_valid_categories(hypernims):
-    direct_matches = sorted(
-        storage.get_known_categories() & set(hypernims), key=hypernims.index
-    )
-    synonyms = storage.get_category_synonyms()
-    matched_synonyms = set()
-    for hypernim in hypernims:
-        if hypernim in synonyms:
-            matched_synonyms.add(synonyms[hypernim])
-    return direct_matches + list(matched_synonyms)
+    return get_storage().category_index.match(hypernims)
 
 
 def category_from_hypernims(item, hypernims):
@@ -197,13 +559,14 @@ def category_from_hypernims(item, hypernims):
     return category
 
 
-def normalize_word(item):
-    return re.sub(re_non_word, "_", item)
-
-
 def test_typos(item):
     # possible typo
-    candidates = spell.candidates(item)
+    index = get_spelling_index()
+    if " " in item.strip():
+        candidates = [index.correct_phrase(item)]
+        candidates = [c for c in candidates if c != item.lower()]
+    else:
+        candidates = index.candidates(item)
     if not candidates:
         ...  # unknown word, no hypernims, ask user
         raise RuntimeError(
@@ -217,29 +580,56 @@ def test_typos(item):
                 text=f"Spelling not found, please enter the correct word for {item}",
             ).run()
             if chosen == item:
-                spell.word_frequency.load_words([chosen])
+                add_custom_spelling(chosen)
             item = normalize_word(chosen)
         else:
             item = chosen
     return item
 
 
+def confirm_fuzzy_match(item, match: TrigramMatch) -> bool:
+    """
+    Ask whether an item is the known name it was fuzzy matched to, before
+    its category is saved
+    """
+    return yes_no_dialog(
+        title="Similar item found",
+        text=f"Is {item} {match.name} ({match.category})?",
+    ).run()
+
+
+def confirm_guessed_category(item, category) -> bool:
+    """
+    Ask whether the category guessed from word vectors is right, before it
+    is saved
+    """
+    return yes_no_dialog(
+        title="Category guessed", text=f"Is {item} in {category}?",
+    ).run()
+
+
 def get_category(item):
-    # replace all spaces with '_' for synset lookup to work
-    normalized_item = normalize_word(item)
-    hypernims = get_hypernims(normalized_item)
-    words_in_item = item.split()
-    if not hypernims:
+    # resolved by canonical form ('_' for spaces) for synset lookup to work
+    resolution = get_resolver().resolve(item)
+    if not resolution.hypernims:
+        # typos and brand names, matched to a known product or item
+        matches = get_trigram_index().search(item, top_k=1)
+        if matches and confirm_fuzzy_match(item, matches[0]):
+            return matches[0].category
+        classifier = get_classifier()
+        if classifier is not None:
+            [category] = classifier.classify([item])
+            if category and confirm_guessed_category(item, category):
+                return category
         # sentence unmatchable
         word = choose_word(item)
         if not word:
             word = test_typos(item)
         assert item, "no word chosen"
-        normalized_item = normalize_word(word)
+        resolution = get_resolver().resolve(word)
 
-    hypernims = get_hypernims(normalized_item)
-    if hypernims:
-        return category_from_hypernims(normalized_item, hypernims)
+    if resolution.hypernims:
+        return category_from_hypernims(resolution.key, resolution.hypernims)
 
     # handle unknown category:
     # 1. check if it's in known categories
@@ -316,17 +706,155 @@ dummy_words = [
 
 @cli.command()
 def get_categories():
-    for i, item in enumerate(dummy_words):
-        click.echo(f"{i}. '{item}'")
-        stored_category = storage.get_item_category(item)
-        if not stored_category:
-            category = get_category(item)
-            if category:
-                storage.set_item_category(item, category)
-            else:
-                raise Exception("Category could not be found!")
+    storage = get_storage()
+    categorized = {}
+    try:
+        for i, item in enumerate(dummy_words):
+            click.echo(f"{i}. '{item}'")
+            stored_category = storage.get_item_category(item)
+            if not stored_category:
+                category = get_category(item)
+                if category:
+                    storage.set_item_category(item, category)
+                    categorized[item] = category
+                else:
+                    raise Exception("Category could not be found!")
+    finally:
+        update_trigram_index(categorized)
 
-    pprint(storage.data["item_categories"])
+    pprint(storage.get_item_categories())
+
+
+@cli.command()
+@click.argument("items", type=click.File("r"), default="-")
+@click.option(
+    "--output", "-o", type=click.File("w"), default="-", help="JSON lines output"
+)
+@click.option("--chunk-size", default=1000, show_default=True)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Worker processes, 0 for one per core (needs a built index)",
+)
+@click.option(
+    "--local", is_flag=True, help="Don't delegate to a running 'serve' service"
+)
+def categorize(items, output, chunk_size, workers, local):
+    """
+    Categorize a file (or stdin) of items, one per line, without prompts.
+
+    Results are written as JSON lines, items that need a decision are
+    deferred to the review queue (see the ``review`` command).
+    """
+    if workers == 1 and not local and service_available(SERVICE_SOCKET):
+        # when not run through ``delegate``, e.g. from the repl
+        with ServiceClient(SERVICE_SOCKET) as client:
+            for result in client.categorize_many(read_items(items), chunk_size):
+                output.write(json.dumps(result) + "\n")
+        return
+    if workers == 1:
+        results = categorize_batch(
+            read_items(items),
+            get_resolver(),
+            review_queue=get_review_queue(),
+            chunk_size=chunk_size,
+            classify=get_classify(),
+            catalog=get_catalog(),
+            fuzzy=get_trigram_index().classify,
+        )
+    elif get_lexicon() is None:
+        raise click.UsageError("Parallel categorization needs 'build-index'")
+    else:
+        from hyper_shopping.parallel import categorize_parallel
+
+        results = categorize_parallel(
+            read_items(items),
+            get_storage(),
+            HYPERNYM_INDEX,
+            review_queue=get_review_queue(),
+            workers=workers or None,
+            chunk_size=chunk_size,
+            classify=get_classify(),
+            catalog=get_catalog(),
+            fuzzy=get_trigram_index().classify,
+        )
+    write_results(results, output, chunk_size)
+
+
+def write_results(results, output, chunk_size):
+    recorded = {}
+    with get_storage().batch(size=chunk_size):
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            if result["source"] in RECORDED:
+                recorded[result["item"]] = result["category"]
+    update_trigram_index(recorded)
+    click.echo(f"Resolver cache: {get_resolver().stats()}", err=True)
+
+
+@cli.command()
+@click.argument("export", type=click.File("rb"), default="-")
+@click.option(
+    "--output", "-o", type=click.File("w"), default="-", help="JSON lines output"
+)
+@click.option("--chunk-size", default=1000, show_default=True)
+@click.option(
+    "--prefix",
+    help="JSON path of the check items in the export, by default those of "
+    "a card or a whole board export",
+)
+def categorize_export(export, output, chunk_size, prefix):
+    """
+    Categorize every check item of a Trello JSON export (of a card or a
+    whole board), streaming it rather than loading it in memory.
+    """
+    from hyper_shopping.trello_helpers import EXPORT_CHECK_ITEMS, stream_check_items
+
+    check_items = stream_check_items(export, prefix or EXPORT_CHECK_ITEMS)
+    names = (item["name"] for item in check_items)
+    results = categorize_batch(
+        names,
+        get_resolver(),
+        review_queue=get_review_queue(),
+        chunk_size=chunk_size,
+        classify=get_classify(),
+        catalog=get_catalog(),
+        fuzzy=get_trigram_index().classify,
+    )
+    write_results(results, output, chunk_size)
+
+
+@cli.command()
+def review():
+    """
+    Interactively categorize the items deferred by ``categorize``.
+    """
+    storage = get_storage()
+    review_queue = get_review_queue()
+    results = review_queue.read()
+    unresolved = []
+    categorized = {}
+    reviewed = 0
+    try:
+        for result in results:
+            item = result["item"]
+            if not storage.get_item_category(item):
+                click.echo(f"'{item}'")
+                if result["candidates"]:
+                    category = choose_category(item, result["candidates"])
+                else:
+                    category = get_category(item)
+                if category:
+                    storage.set_item_category(item, category)
+                    categorized[item] = category
+                else:
+                    unresolved.append(result)
+            reviewed += 1
+    finally:
+        # keep what was skipped, or not reached, for the next review
+        review_queue.replace(unresolved + results[reviewed:])
+        update_trigram_index(categorized)
 
 
 @cli.command()
@@ -351,11 +879,370 @@ def get_items_from_checklists():
     create_shopping_card()
 
 
+@cli.command()
+@click.option(
+    "--board", "boards", multiple=True, default=["Our Board"], show_default=True
+)
+@click.option("--concurrency", default=10, show_default=True)
+def fetch_cards(boards, concurrency):
+    """
+    Fetch the shopping cards of all given boards concurrently and list
+    their checklist items.
+    """
+    from hyper_shopping.trello_async import AsyncTrello
+
+    async def fetch():
+        async with AsyncTrello(concurrency=concurrency) as trello:
+            return await trello.get_shopping_cards(boards)
+
+    for card in asyncio.run(fetch()):
+        click.echo(f"{card['name']} ({card['dateLastActivity']})")
+        for checklist in card["checklists"]:
+            for check_item in checklist["checkItems"]:
+                click.echo(f"  {check_item['name']}")
+
+
+@cli.command()
+@click.option(
+    "--board", "boards", multiple=True, default=["Our Board"], show_default=True
+)
+@click.option("--concurrency", default=10, show_default=True)
+@click.option(
+    "--output", "-o", type=click.File("w"), default="-", help="JSON lines output"
+)
+def sync(boards, concurrency, output):
+    """
+    Fetch only the shopping cards changed since the last sync, and
+    categorize their new or renamed items without prompts.
+    """
+    from hyper_shopping.sync import CardCache, changed_items, sync_cards
+    from hyper_shopping.trello_async import AsyncTrello
+
+    async def fetch():
+        async with AsyncTrello(concurrency=concurrency) as trello:
+            return await sync_cards(trello, cache, boards)
+
+    cache = CardCache(shelve.open(str(CARD_CACHE)))
+    try:
+        diffs = asyncio.run(fetch())
+        for diff in diffs:
+            click.echo(
+                f"{diff['card']}: {len(diff['added'])} added,"
+                f" {len(diff['renamed'])} renamed,"
+                f" {len(diff['removed'])} removed",
+                err=True,
+            )
+        results = categorize_batch(
+            changed_items(diffs),
+            get_resolver(),
+            review_queue=get_review_queue(),
+            classify=get_classify(),
+            catalog=get_catalog(),
+            fuzzy=get_trigram_index().classify,
+        )
+        write_results(results, output, chunk_size=None)
+        # only now, so cards whose items weren't recorded are synced again
+        cache.record(diffs)
+    finally:
+        cache.close()
+
+
+@cli.command()
+@click.option("--shop", type=click.Choice(sorted(SHOP_LAYOUTS)), default="smart")
+@click.option(
+    "--board", "boards", multiple=True, default=["Our Board"], show_default=True
+)
+@click.option("--concurrency", default=10, show_default=True)
+def reorder(shop, boards, concurrency):
+    """
+    Sort the checklists of the latest shopping card by the shortest route
+    through the shop, updating only the positions of the items that moved.
+    """
+    from hyper_shopping.reorder import apply_positions, plan_positions
+    from hyper_shopping.trello_async import AsyncTrello
+
+    async def write_back():
+        async with AsyncTrello(concurrency=concurrency) as trello:
+            cards = await trello.get_shopping_cards(boards)
+            if not cards:
+                raise click.ClickException("No shopping card found")
+            card = cards[0]
+            requests = 0
+            for checklist in card["checklists"]:
+                items = checklist["checkItems"]
+                sorted_items = get_route_sorter().sort_for_shop(items, shop)
+                updates = plan_positions(
+                    {item["id"]: item["pos"] for item in items},
+                    [item["id"] for item in sorted_items],
+                )
+                requests += await apply_positions(trello, card["id"], updates)
+            return requests
+
+    click.echo(f"Moved items with {asyncio.run(write_back())} requests")
+
+
+@cli.command()
+@click.option(
+    "--top",
+    default=100,
+    show_default=True,
+    help="Number of the most frequent department combinations to plan",
+)
+def precompute_routes(top):
+    """
+    Plan and persist the routes of every shop for the department
+    combinations most often seen on the synced shopping cards.
+
+    Meant to run in the background (e.g. from cron) after 'sync'.
+    """
+    from hyper_shopping.sync import CardCache
+
+    storage = get_storage()
+    cache = CardCache(shelve.open(str(CARD_CACHE)))
+    try:
+        lists = [
+            [storage.get_item_category(name) for name in card["items"].values()]
+            for card in cache.data.values()
+        ]
+    finally:
+        cache.close()
+    route_cache = get_route_cache()
+    warmed = route_cache.warm(frequent_combinations(lists, top))
+    route_cache.close()
+    click.echo(f"Planned {warmed} routes into {ROUTE_CACHE}")
+
+
 @cli.command()
 def create():
     create_shopping_card()
 
 
+@cli.command()
+@click.option(
+    "--size",
+    "sizes",
+    multiple=True,
+    type=int,
+    default=[1000, 10000, 100000],
+    show_default=True,
+    help="Number of items in a synthetic corpus, can be repeated",
+)
+@click.option("--repeat", default=3, show_default=True)
+@click.option(
+    "--output", "-o", type=click.Path(dir_okay=False), default="benchmarks.json"
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="A previous report to flag regressions against",
+)
+@click.option(
+    "--threshold",
+    default=0.1,
+    show_default=True,
+    help="Allowed slow down over the baseline, as a fraction",
+)
+def benchmark(sizes, repeat, output, baseline, threshold):
+    """
+    Time each stage of the categorization pipeline and save a JSON report.
+    """
+    from hyper_shopping.bench import (
+        card_item_names,
+        find_regressions,
+        load_report,
+        run_benchmarks,
+        save_report,
+    )
+    from hyper_shopping.trello_helpers import sort_checklist
+
+    base_items = dummy_words + card_item_names(Path("./shopping.json"))
+    report = run_benchmarks(
+        base_items,
+        sizes,
+        get_hypernims,
+        repeat=repeat,
+        spelling_index=get_spelling_index(),
+        sort_checklist=sort_checklist,
+        route=SHOP_ROUTES["smart"],
+    )
+    save_report(report, Path(output))
+    for name, timing in report["results"].items():
+        click.echo(
+            f"{name:32} {timing['best'] * 1000:10.2f} ms"
+            f" {timing['per_item'] * 1e6:10.2f} us/item"
+        )
+
+    if baseline:
+        regressions = find_regressions(load_report(baseline), report, threshold)
+        for regression in regressions:
+            click.echo(
+                f"REGRESSION {regression['name']}: "
+                f"{regression['baseline'] * 1000:.2f} ms -> "
+                f"{regression['current'] * 1000:.2f} ms "
+                f"(x{regression['ratio']:.2f})",
+                err=True,
+            )
+        if regressions:
+            raise SystemExit(1)
+
+
+@cli.command()
+def migrate_storage():
+    """
+    Copy the shelve data into a SQLite store, used from then on.
+    """
+    storage = get_storage()
+    if not isinstance(storage.backend, ShelveBackend):
+        click.echo(f"Already using {SQLITE_STORAGE}")
+        return
+    backend = SQLiteBackend(SQLITE_STORAGE)
+    migrate_shelf(storage.backend.data, backend)
+    backend.close()
+    click.echo(f"Migrated {SHELVE_STORAGE} into {SQLITE_STORAGE}")
+
+
+@cli.command()
+@click.option("--socket", "path", type=click.Path(), default=str(SERVICE_SOCKET))
+@click.option(
+    "--max-delay",
+    default=2.0,
+    show_default=True,
+    help="Milliseconds a request waits for others to batch with",
+)
+@click.option("--max-batch", default=1000, show_default=True)
+def serve(path, max_delay, max_batch):
+    """
+    Keep the store, indexes and caches loaded, and categorize or sort
+    items for clients (see hyper_shopping.client) on a Unix socket.
+
+    Needs the SQLite store (see ``migrate-storage``), which other commands
+    can write while the service runs, unlike the shelve one.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from hyper_shopping.service import AlreadyServing, CategorizationService
+
+    def categorize_items(items):
+        index = get_trigram_index()
+        with get_storage().batch(size=len(items)):
+            results = list(
+                categorize_batch(
+                    items,
+                    get_resolver(),
+                    review_queue=get_review_queue(),
+                    chunk_size=max(len(items), 1),
+                    classify=get_classify(),
+                    catalog=get_catalog(),
+                    fuzzy=index.classify,
+                )
+            )
+        # match later items to the ones just categorized, as a restart would
+        index.update(
+            {
+                result["item"]: result["category"]
+                for result in results
+                if result["source"] in RECORDED
+            }
+        )
+        return results
+
+    def lookup_items(items):
+        # sorting a card only reads the store, nothing is recorded or queued
+        return list(
+            categorize_batch(
+                items,
+                get_resolver(),
+                chunk_size=max(len(items), 1),
+                classify=get_classify(),
+                catalog=get_catalog(),
+                fuzzy=get_trigram_index().classify,
+                record=False,
+            )
+        )
+
+    def load():
+        if not isinstance(get_storage().backend, SQLiteBackend):
+            raise click.ClickException(
+                "Serving needs the SQLite store, run 'migrate-storage' first"
+            )
+        # load everything now, rather than on the first request
+        get_hypernims("food")
+        get_trigram_index()
+        get_classifier()
+        return get_route_sorter(read_only=True)
+
+    # the batches run in this one thread, which owns the SQLite connections
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        sorter = executor.submit(load).result()
+        service = CategorizationService(
+            categorize_items,
+            lookup_items,
+            sorter,
+            max_delay / 1000,
+            max_batch,
+            executor,
+        )
+        asyncio.run(
+            service.serve(
+                Path(path), lambda: click.echo(f"Serving on {path}", err=True)
+            )
+        )
+    except AlreadyServing as error:
+        raise click.ClickException(str(error))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=False)
+
+
+@cli.command()
+def build_index():
+    """
+    Walk WordNet once and write the hypernym lexicon used by all lookups.
+    """
+    index = build_hypernym_index(get_wordnet())
+    write_lexicon(index, HYPERNYM_INDEX)
+    click.echo(f"Indexed {len(index)} lemmas into {HYPERNYM_INDEX}")
+
+
+@cli.command()
+def build_trigrams():
+    """
+    Rebuild the trigram index of catalog products and categorized items,
+    dropping the names that are gone.
+    """
+    index = TrigramIndex.build(trigram_entries())
+    index.stamp = trigram_stamp()
+    index.save(TRIGRAM_INDEX)
+    click.echo(f"Indexed {len(index)} names into {TRIGRAM_INDEX}")
+
+
+@cli.command()
+@click.argument("vectors", type=click.File("r"))
+@click.option(
+    "--limit",
+    type=int,
+    default=200000,
+    show_default=True,
+    help="Number of (most frequent) words to keep",
+)
+def build_vectors(vectors, limit):
+    """
+    Convert a GloVe or word2vec text file of word vectors into the
+    memory-mapped vectors used to categorize items WordNet doesn't know.
+    """
+    from hyper_shopping.embeddings import convert_vectors
+
+    try:
+        count = convert_vectors(vectors, WORD_VECTORS, limit)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    click.echo(f"Converted {count} word vectors into {WORD_VECTORS}")
+
+
 if __name__ == "__main__":
+    from click_repl import register_repl
+
     register_repl(cli)
     cli()
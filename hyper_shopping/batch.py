@@ -0,0 +1,372 @@
+"""
+Headless, bulk categorization of shopping items.
+
+Items are resolved in chunks: each chunk is normalized and deduplicated, the
+hypernims of every distinct item are looked up once, and matched against the
+known categories. Real store products found in the local catalog keep their
+store department (in ``department``), and take the category it maps to (see
+``department_categories``) without any hypernym walk. Anything that can't be
+decided without a human (no category, or more than one) is appended to a
+review queue instead of opening a dialog, so the whole run never blocks.
+"""
+import json
+import os
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from mypy_extensions import TypedDict
+
+from .catalog import Catalog
+from .categorize import (
+    CategoryIndex,
+    CategoryResolver,
+    HypernimLookup,
+    item_key,
+)
+from .datastore import Storage
+from .phrases import PhraseResolver
+
+Result = TypedDict(
+    "Result",
+    {
+        "item": str,
+        "category": Optional[str],
+        "source": str,
+        "candidates": List[str],
+        # the store department of a catalog product, not a category
+        "department": Optional[str],
+    },
+)
+
+# result sources
+STORED = "stored"
+CATALOG = "catalog"
+HYPERNIMS = "hypernims"
+EMBEDDING = "embedding"
+FUZZY = "fuzzy"
+UNRESOLVED = "unresolved"
+# the sources of the categories saved to the storage
+RECORDED = (HYPERNIMS,)
+# the sources of guesses, deferred to the review queue with the guessed
+# category as their candidate, as are unresolved items
+GUESSED = (FUZZY, EMBEDDING)
+
+# returns the category of each item, or None, e.g. from word vectors or
+# the closest known name
+Classifier = Callable[[List[str]], List[Optional[str]]]
+
+
+class ReviewQueue:
+    """
+    An append-only JSON lines file of items deferred for a human decision.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def add(self, result: Result):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(result) + "\n")
+
+    def read(self) -> List[Result]:
+        if not self.path.exists():
+            return []
+        with open(self.path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+    def replace(self, results: List[Result]):
+        """
+        Rewrite the queue with only the given results
+        """
+        if not results:
+            self.clear()
+            return
+        partial = Path(f"{self.path}.partial")
+        with open(partial, "w") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+        os.replace(partial, self.path)
+
+
+def read_items(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the non-blank, stripped item names of a file or stream
+    """
+    for line in lines:
+        item = line.strip()
+        if item:
+            yield item
+
+
+def match_categories(
+    words: Iterable[str],
+    hypernims_of: HypernimLookup,
+    index: CategoryIndex,
+    phrases: Optional[PhraseResolver] = None,
+) -> Dict[str, List[str]]:
+    """
+    Map each normalized word to its distinct candidate categories, words
+    that aren't lemmas are matched by their phrases (in one batch)
+    """
+    hypernims = {word: hypernims_of(word) for word in words}
+    if phrases is not None:
+        missing = [word for word, found in hypernims.items() if not found]
+        for word, match in phrases.resolve_many(missing, index.match).items():
+            if match is not None:
+                hypernims[word] = match.hypernims
+    return {word: index.match(found) for word, found in hypernims.items()}
+
+
+def department_categories(
+    departments: Iterable[str], resolver: CategoryResolver
+) -> Dict[str, str]:
+    """
+    Map store departments onto the known categories: a department is in
+    the category its canonical name is, or is a synonym of, or else the
+    one its name resolves to. Departments matching none, or more than one
+    category, aren't mapped.
+    """
+    index = resolver.storage.category_index
+    keys = {department: item_key(department) for department in departments}
+    matches = {key: index.match([key]) for key in keys.values()}
+    resolutions = resolver.resolve_keys(
+        key for key, categories in matches.items() if not categories
+    )
+    mapped = {}
+    for department, key in keys.items():
+        categories = matches[key] or resolutions[key].categories
+        if len(categories) == 1:
+            mapped[department] = categories[0]
+    return mapped
+
+
+def catalog_departments(
+    items: Iterable[str], resolver: CategoryResolver, catalog: Optional[Catalog]
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Return the catalog department of each item found in the catalog (when
+    given), and the category of each of those departments that maps to one
+    """
+    departments = catalog.departments(items) if catalog is not None else {}
+    return departments, department_categories(set(departments.values()), resolver)
+
+
+def make_results(
+    items: List[str],
+    stored: Mapping[str, Optional[str]],
+    normalized: Mapping[str, str],
+    candidates: Mapping[str, List[str]],
+    departments: Optional[Mapping[str, str]] = None,
+    mapped: Optional[Mapping[str, str]] = None,
+) -> List[Result]:
+    """
+    Build the result of each item, in order, from its stored category, the
+    category its catalog department maps to or its candidate categories.
+
+    :param departments: the catalog department of each item
+    :param mapped: the category of each department
+    """
+    departments = {} if departments is None else departments
+    mapped = {} if mapped is None else mapped
+    results: List[Result] = []
+    for item in items:
+        department = departments.get(item)
+        category = stored[item]
+        if category:
+            results.append(
+                Result(
+                    item=item,
+                    category=category,
+                    source=STORED,
+                    candidates=[],
+                    department=department,
+                )
+            )
+            continue
+
+        if department is not None and department in mapped:
+            results.append(
+                Result(
+                    item=item,
+                    category=mapped[department],
+                    source=CATALOG,
+                    candidates=[],
+                    department=department,
+                )
+            )
+            continue
+
+        matches = candidates[normalized[item]]
+        if len(matches) == 1:
+            results.append(
+                Result(
+                    item=item,
+                    category=matches[0],
+                    source=HYPERNIMS,
+                    candidates=matches,
+                    department=department,
+                )
+            )
+        else:
+            results.append(
+                Result(
+                    item=item,
+                    category=None,
+                    source=UNRESOLVED,
+                    candidates=matches,
+                    department=department,
+                )
+            )
+    return results
+
+
+def unresolved_words(
+    items: List[str], storage: Storage
+) -> Tuple[Dict[str, Optional[str]], Dict[str, str]]:
+    """
+    Return the stored category of each distinct item, and the canonical
+    form (see ``item_key``) of the items that have none.
+    """
+    stored = storage.get_many_item_categories(dict.fromkeys(items))
+    normalized = {item: item_key(item) for item in stored if not stored[item]}
+    return stored, normalized
+
+
+def record_results(
+    results: List[Result],
+    storage: Storage,
+    review_queue: Optional[ReviewQueue] = None,
+    queued: Optional[Set[str]] = None,
+):
+    """
+    Save newly resolved categories in a single storage write, and defer
+    guessed and unresolved items (once each) to the review queue.
+    """
+    queued = set() if queued is None else queued
+    resolved = {}
+    for result in results:
+        item = result["item"]
+        if result["source"] in RECORDED:
+            resolved[item] = result["category"]
+        elif result["source"] in (UNRESOLVED, *GUESSED) and item not in queued:
+            queued.add(item)
+            if review_queue is not None:
+                review_queue.add(result)
+    if resolved:
+        storage.set_item_categories(resolved)
+
+
+def resolve_chunk(
+    items: List[str], resolver: CategoryResolver, catalog: Optional[Catalog] = None
+) -> List[Result]:
+    """
+    Resolve one chunk of items, looking up each distinct item only once,
+    in the catalog (when given) before WordNet.
+    """
+    stored, normalized = unresolved_words(items, resolver.storage)
+    departments, mapped = catalog_departments(normalized, resolver, catalog)
+    resolutions = resolver.resolve_keys(
+        key
+        for item, key in normalized.items()
+        if departments.get(item) not in mapped
+    )
+    candidates = {
+        key: resolution.categories for key, resolution in resolutions.items()
+    }
+    return make_results(items, stored, normalized, candidates, departments, mapped)
+
+
+def classify_unmatched(
+    results: List[Result], classify: Classifier, source: str = EMBEDDING
+):
+    """
+    Categorize the unresolved results without any candidate category
+    with the classifier, all in one call. The guessed category becomes
+    the result's candidate, for the review.
+    """
+    unmatched = [
+        result
+        for result in results
+        if result["source"] == UNRESOLVED and not result["candidates"]
+    ]
+    if not unmatched:
+        return
+    categories = classify([result["item"] for result in unmatched])
+    for result, category in zip(unmatched, categories):
+        if category:
+            result["category"] = category
+            result["source"] = source
+            result["candidates"] = [category]
+
+
+def guess_unmatched(
+    results: List[Result],
+    classify: Optional[Classifier] = None,
+    fuzzy: Optional[Classifier] = None,
+):
+    """
+    Guess the category of the unresolved results without any candidate,
+    by fuzzy matching known names first, then with the classifier
+    """
+    if fuzzy is not None:
+        classify_unmatched(results, fuzzy, FUZZY)
+    if classify is not None:
+        classify_unmatched(results, classify)
+
+
+def categorize_batch(
+    items: Iterable[str],
+    resolver: CategoryResolver,
+    review_queue: Optional[ReviewQueue] = None,
+    chunk_size: int = 1000,
+    classify: Optional[Classifier] = None,
+    catalog: Optional[Catalog] = None,
+    fuzzy: Optional[Classifier] = None,
+    record: bool = True,
+) -> Iterator[Result]:
+    """
+    Categorize a stream of items without any user interaction.
+
+    Results are yielded in input order as each chunk is resolved. Newly
+    resolved categories are saved to the storage, guessed and unresolved
+    items are added to the review queue (when given).
+
+    :param items: the item names, e.g. lines of a file
+    :param resolver: resolves (and caches) the candidates of each item
+    :param chunk_size: the number of items resolved in a single pass
+    :param classify: a fallback for the items without any hypernim match,
+        its categories aren't saved
+    :param catalog: the store products, the categories their departments
+        map to aren't saved to the storage
+    :param fuzzy: matches the items without any hypernim match to known
+        names, before ``classify``, e.g. ``TrigramIndex.classify``; its
+        categories aren't saved either
+    :param record: save the new categories and queue the rest for review,
+        a lookup leaves the storage and the review queue unchanged otherwise
+    """
+    items = iter(items)
+    queued: Set[str] = set()
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        results = resolve_chunk(chunk, resolver, catalog)
+        guess_unmatched(results, classify, fuzzy)
+        if record:
+            record_results(results, resolver.storage, review_queue, queued)
+        yield from results
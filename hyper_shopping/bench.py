@@ -0,0 +1,245 @@
+"""
+Benchmarks for the categorization pipeline, with regression tracking.
+
+Each benchmark runs over a synthetic corpus of distinct shopping items,
+built from a few real items by varying their case, quantities and
+spelling, and categories are matched against a store seeded from the
+corpus. Results are saved as JSON, and can be compared against a previous
+run to flag any benchmark that became slower than a threshold.
+"""
+import json
+import platform
+import random
+import shelve
+import tempfile
+import time
+from itertools import count
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from mypy_extensions import TypedDict
+
+from .categorize import CategoryIndex, item_key, normalize_word
+from .datastore import SQLiteBackend, Storage
+
+Timing = TypedDict(
+    "Timing", {"best": float, "mean": float, "size": int, "per_item": float}
+)
+Regression = TypedDict(
+    "Regression",
+    {"name": str, "baseline": float, "current": float, "ratio": float},
+)
+Benchmark = Callable[[], object]
+
+
+def synthetic_items(base_items: List[str], size: int, seed: int = 0) -> List[str]:
+    """
+    Return ``size`` distinct item names made from variations of the base
+    items, with a pack size once the other variations are used up
+    """
+    rng = random.Random(seed)
+    items: Dict[str, None] = {}
+    while len(items) < size:
+        item = rng.choice(base_items)
+        variation = rng.random()
+        if variation < 0.2:
+            item = item.upper()
+        elif variation < 0.4:
+            item = f"{item} *{rng.randint(2, 6)}"
+        elif variation < 0.5 and len(item) > 3:
+            # a typo, dropping one character
+            position = rng.randrange(len(item))
+            item = item[:position] + item[position + 1 :]
+        while item in items:
+            item = f"{item} {rng.randint(1, 999)}g"
+        items[item] = None
+    return list(items)
+
+
+def seeded_index(
+    hypernims: List[List[str]], share: float = 0.3, seed: int = 0
+) -> CategoryIndex:
+    """
+    Return the category index of a store with the default categories, and
+    categories and synonyms taken from a share of the corpus hypernims
+    """
+    rng = random.Random(seed)
+    storage = Storage({})
+    names = sorted({name for found in hypernims for name in found})
+    with storage.batch():
+        for name in names:
+            if rng.random() >= share:
+                continue
+            if rng.random() < 0.2:
+                storage.add_to_known_categories(name)
+            else:
+                category = rng.choice(sorted(storage.get_known_categories()))
+                storage.add_category_synonym(name, category)
+    return storage.category_index
+
+
+def card_item_names(card_path: Path) -> List[str]:
+    """
+    Return the names of all check items of an exported Trello card
+    """
+    with open(card_path) as file:
+        card = json.load(file)
+    return [
+        check_item["name"]
+        for checklist in card["checklists"]
+        for check_item in checklist["checkItems"]
+    ]
+
+
+def time_benchmark(benchmark: Benchmark, size: int, repeat: int = 3) -> Timing:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return Timing(
+        best=best,
+        mean=sum(timings) / len(timings),
+        size=size,
+        per_item=best / size if size else 0.0,
+    )
+
+
+def pipeline_benchmarks(
+    items: List[str],
+    hypernims_of: Callable[[str], List[str]],
+    spelling_index=None,
+    sort_checklist=None,
+    route: Optional[List[str]] = None,
+    index: Optional[CategoryIndex] = None,
+) -> Dict[str, Benchmark]:
+    """
+    Return the benchmarks of each pipeline stage over the given items.
+
+    :param hypernims_of: the hypernim lookup to measure
+    :param spelling_index: a ``SpellingIndex`` to measure candidates with
+    :param sort_checklist: the checklist sort to measure, if available
+    :param route: the departments of a shop route (see ``SHOP_ROUTES``) to
+        sort the items by, each item is in one of them
+    :param index: the category index to match with, e.g. the real store's,
+        by default one seeded from the corpus (see ``seeded_index``)
+    """
+    keys = [item_key(item) for item in items]
+    hypernims = [hypernims_of(key) for key in keys]
+    category_index = seeded_index(hypernims) if index is None else index
+    benchmarks: Dict[str, Benchmark] = {
+        "normalize_word": lambda: [normalize_word(item) for item in items],
+        "get_hypernims": lambda: [hypernims_of(key) for key in keys],
+        "get_valid_categories": lambda: [
+            category_index.match(h) for h in hypernims
+        ],
+    }
+    if spelling_index is not None:
+        words = [word for item in items for word in item.split()]
+        benchmarks["test_typos"] = lambda: [
+            spelling_index.candidates(word) for word in words
+        ]
+    if sort_checklist is not None and route:
+        checklist = [
+            dict(id=str(i), name=item, pos=str(i)) for i, item in enumerate(items)
+        ]
+        departments = {item: route[i % len(route)] for i, item in enumerate(items)}
+        benchmarks["sort_checklist"] = lambda: sort_checklist(
+            checklist, route, departments.get
+        )
+    return benchmarks
+
+
+def storage_benchmarks(items: List[str], directory: Path) -> Dict[str, Benchmark]:
+    """
+    Return benchmarks writing then reading the item categories, for each
+    storage backend, in a fresh store under ``directory`` on every run.
+    """
+    categories = {item: f"category_{i % 20}" for i, item in enumerate(items)}
+    runs = count()
+
+    def write_read(open_storage: Callable[[Path], Storage]) -> Benchmark:
+        def benchmark():
+            storage = open_storage(directory / f"run{next(runs)}")
+            with storage.batch():
+                for item, category in categories.items():
+                    storage.set_item_category(item, category)
+            for item in categories:
+                storage.get_item_category(item)
+            storage.close()
+
+        return benchmark
+
+    return {
+        "storage_shelve": write_read(lambda path: Storage(shelve.open(str(path)))),
+        "storage_sqlite": write_read(lambda path: Storage(SQLiteBackend(path))),
+    }
+
+
+def run_benchmarks(
+    base_items: List[str],
+    sizes: Iterable[int],
+    hypernims_of: Callable[[str], List[str]],
+    repeat: int = 3,
+    **kwargs,
+) -> Dict:
+    """
+    Run all benchmarks for each corpus size, returning the JSON report.
+
+    Extra keyword arguments are passed to ``pipeline_benchmarks``.
+    """
+    results: Dict[str, Timing] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            items = synthetic_items(base_items, size)
+            benchmarks = pipeline_benchmarks(items, hypernims_of, **kwargs)
+            benchmarks.update(storage_benchmarks(items, Path(directory)))
+            for name, benchmark in benchmarks.items():
+                results[f"{name}[{size}]"] = time_benchmark(
+                    benchmark, size, repeat
+                )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.time(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def save_report(report: Dict, path: Path):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def load_report(path: Path) -> Dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def find_regressions(
+    baseline: Mapping, current: Mapping, threshold: float = 0.1
+) -> List[Regression]:
+    """
+    Return the benchmarks whose best time grew by more than ``threshold``
+    (a fraction) compared to the baseline report.
+    """
+    regressions = []
+    for name, timing in sorted(current["results"].items()):
+        base_timing: Optional[Mapping] = baseline["results"].get(name)
+        if not base_timing or not base_timing["best"]:
+            continue
+        ratio = timing["best"] / base_timing["best"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                Regression(
+                    name=name,
+                    baseline=base_timing["best"],
+                    current=timing["best"],
+                    ratio=ratio,
+                )
+            )
+    return regressions
@@ -0,0 +1,75 @@
+"""
+A compact, on-disk set of seen keys.
+
+A Bloom filter answers "seen before?" with no false negatives, and false
+positives at (about) the error rate it was sized for, in a fixed number of
+bits however many keys are added. The bits live in a memory-mapped file,
+so a filter of millions of keys takes a few megabytes of page cache rather
+than Python objects, and survives restarts (e.g. a paused crawl).
+"""
+import hashlib
+import math
+import mmap
+from pathlib import Path
+from typing import List, Tuple
+
+
+def filter_size(capacity: int, error_rate: float) -> Tuple[int, int]:
+    """
+    Return the number of bits and of hash functions of a filter holding
+    capacity keys at the given false positive rate
+    """
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    """
+    :param path: the file of the filter's bits, reused when it exists and
+        was sized for the same capacity and error rate
+    :param capacity: the number of keys expected, adding more raises the
+        false positive rate
+    """
+
+    def __init__(self, path: Path, capacity: int = 1000000, error_rate: float = 1e-6):
+        self.path = Path(path)
+        self.bits, self.hashes = filter_size(capacity, error_rate)
+        size = (self.bits + 7) // 8
+        if not self.path.exists() or self.path.stat().st_size != size:
+            with open(self.path, "wb") as file:
+                file.truncate(size)
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def positions(self, key: str) -> List[int]:
+        # double hashing, k positions from two independent 64 bit hashes
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, str):
+            return False
+        return all(
+            self.map[position >> 3] & (1 << (position & 7))
+            for position in self.positions(key)
+        )
+
+    def add(self, key: str) -> bool:
+        """
+        Add key, returning whether it is new (False if possibly seen)
+        """
+        new = False
+        for position in self.positions(key):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self.map[byte] & bit:
+                self.map[byte] |= bit
+                new = True
+        return new
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
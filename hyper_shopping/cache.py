@@ -0,0 +1,88 @@
+"""
+A bounded, least recently used cache with hit/miss/eviction counters.
+"""
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from mypy_extensions import TypedDict
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+CacheStats = TypedDict(
+    "CacheStats",
+    {"hits": int, "misses": int, "evictions": int, "size": int, "maxsize": int},
+)
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Keep up to ``maxsize`` entries, evicting the least recently used.
+
+    :param maxsize: the number of entries kept, 0 disables caching
+    :param on_evict: called with ``(key, value)`` of each evicted entry
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        on_evict: Optional[Callable[[K, V], None]] = None,
+    ):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[K, V]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Return the cached value (marking it recently used), or None
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: K, value: V):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def get_or_compute(self, key: K, compute: Callable[[K], V]) -> V:
+        value = self.get(key)
+        if value is None:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+        Drop all entries, counters are kept
+        """
+        self._entries.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._entries),
+            maxsize=self.maxsize,
+        )
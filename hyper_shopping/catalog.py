@@ -0,0 +1,209 @@
+"""
+A local catalog of a store's products and the departments they are in.
+
+Products scraped from a store's website (see the ``greens`` spider) are
+bulk-loaded into SQLite, with the canonical form of each name (without its
+sizes) indexed for exact lookups and a full-text index for searches. Store
+departments of real products are both faster to find and more accurate
+than hypernym walks, but only for the product itself: searches match any
+name with the same words, "butter" is in "Peanut Butter".
+"""
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from mypy_extensions import TypedDict
+
+from .categorize import item_key
+
+Product = TypedDict(
+    "Product",
+    {
+        "product_id": str,
+        "name": str,
+        "department": str,
+        "aisle": Optional[str],
+        "url": Optional[str],
+    },
+)
+
+# the most host parameters SQLite accepts in a single statement
+MAX_PARAMETERS = 999
+
+
+def product_key(name: str) -> str:
+    """
+    Return the canonical form (see ``item_key``) of a product name or item,
+    without the words with digits, so "Kinnie 1.5L" is found as "kinnie"
+    """
+    return "_".join(
+        word
+        for word in item_key(name).split("_")
+        if word and not any(char.isdigit() for char in word)
+    )
+
+
+class Catalog:
+    """
+    Products in a SQLite database, with an FTS5 index on their names.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS products (
+            product_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            department TEXT NOT NULL,
+            aisle TEXT,
+            url TEXT
+        );
+        CREATE INDEX IF NOT EXISTS products_key ON products (key);
+        -- an external content index, kept in sync by the triggers below
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, content='products', content_rowid='rowid'
+        );
+        CREATE TRIGGER IF NOT EXISTS products_insert
+        AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name) VALUES (new.rowid, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS products_delete
+        AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name)
+            VALUES ('delete', old.rowid, old.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS products_update
+        AFTER UPDATE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name)
+            VALUES ('delete', old.rowid, old.name);
+            INSERT INTO products_fts (rowid, name) VALUES (new.rowid, new.name);
+        END;
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        # autocommit, bulk loads are explicit transactions
+        self.connection = sqlite3.connect(str(self.path), isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        (count,) = self.connection.execute(
+            "SELECT count(*) FROM products"
+        ).fetchone()
+        return count
+
+    @property
+    def version(self) -> int:
+        """
+        Bumped by each ``add_products``, so that data derived from the
+        products (e.g. the trigram index) can tell when it's out of date
+        """
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        return version
+
+    def add_products(self, products: Iterable[Product]):
+        """
+        Insert or update many products, in a single transaction
+        """
+        rows = [
+            (
+                product["product_id"],
+                product["name"],
+                product_key(product["name"]),
+                product["department"],
+                product.get("aisle"),
+                product.get("url"),
+            )
+            for product in products
+        ]
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.executemany(
+                """
+                INSERT INTO products (product_id, name, key, department, aisle, url)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (product_id) DO UPDATE SET
+                    name = excluded.name,
+                    key = excluded.key,
+                    department = excluded.department,
+                    aisle = excluded.aisle,
+                    url = excluded.url
+                """,
+                rows,
+            )
+            # pragmas don't take parameters
+            self.connection.execute(f"PRAGMA user_version = {self.version + 1}")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def products(self) -> Iterator[Product]:
+        rows = self.connection.execute(
+            "SELECT product_id, name, department, aisle, url FROM products"
+        )
+        for product_id, name, department, aisle, url in rows:
+            yield Product(
+                product_id=product_id,
+                name=name,
+                department=department,
+                aisle=aisle,
+                url=url,
+            )
+
+    def search(self, query: str, limit: int = 5) -> List[Product]:
+        """
+        Return the products best matching all the words of query
+        """
+        words = [word for word in item_key(query).split("_") if word]
+        if not words:
+            return []
+        # quoted, so words are never read as FTS operators
+        match = " ".join(f'"{word}"' for word in words)
+        rows = self.connection.execute(
+            """
+            SELECT product_id, products.name, department, aisle, url
+            FROM products_fts JOIN products ON products.rowid = products_fts.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY bm25(products_fts), length(products.name)
+            LIMIT ?
+            """,
+            (match, limit),
+        )
+        return [
+            Product(
+                product_id=product_id,
+                name=name,
+                department=department,
+                aisle=aisle,
+                url=url,
+            )
+            for product_id, name, department, aisle, url in rows
+        ]
+
+    def departments(self, items: Iterable[str]) -> Dict[str, str]:
+        """
+        Return the department of each item found in the catalog, matching
+        canonical names (see ``product_key``) exactly, in batches
+        """
+        keys = {item: product_key(item) for item in items}
+        distinct = [key for key in dict.fromkeys(keys.values()) if key]
+        by_key: Dict[str, str] = {}
+        for start in range(0, len(distinct), MAX_PARAMETERS):
+            chunk = distinct[start : start + MAX_PARAMETERS]
+            placeholders = ", ".join("?" * len(chunk))
+            by_key.update(
+                self.connection.execute(
+                    f"SELECT key, department FROM products"
+                    f" WHERE key IN ({placeholders})",
+                    chunk,
+                )
+            )
+
+        return {item: by_key[key] for item, key in keys.items() if key in by_key}
+
+    def department_of(self, item: str) -> Optional[str]:
+        return self.departments([item]).get(item)
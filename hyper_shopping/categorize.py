@@ -0,0 +1,185 @@
+"""
+The non-interactive parts of item categorization, shared by the CLI
+prompts and the batch engine.
+"""
+import re
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .cache import CacheStats, LRUCache
+
+if TYPE_CHECKING:
+    from .phrases import PhraseResolver
+
+HypernimLookup = Callable[[str], List[str]]
+
+re_non_word = re.compile(r"[^\w]+")
+# quantity markers like "*3", "x2" or "2x"
+re_quantity = re.compile(
+    r"(?:\*\s*\d+|(?<!\w)x\s*\d+|(?<!\w)\d+\s*[*x])(?!\w)", re.IGNORECASE
+)
+
+
+def normalize_word(item: str) -> str:
+    """
+    Replace all non-word runs with '_' so multi-word items match lemmas
+    """
+    return re.sub(re_non_word, "_", item)
+
+
+def item_key(item: str) -> str:
+    """
+    Return the canonical form of an item, so "Milk *3", "milk" and "MILK"
+    all share one key.
+    """
+    return normalize_word(re_quantity.sub(" ", item).lower()).strip("_")
+
+
+# match kinds, direct category matches rank before synonym matches
+DIRECT = 0
+SYNONYM = 1
+
+
+class CategoryIndex:
+    """
+    An inverted index from hypernim lemma to the categories it implies,
+    either by being a known category, or a synonym of one.
+
+    Matching a list of hypernims is a single pass over it; the index is
+    kept up to date by adding categories and synonyms as they're learnt.
+    """
+
+    def __init__(
+        self,
+        known_categories: Iterable[str] = (),
+        synonyms: Optional[Mapping[str, str]] = None,
+    ):
+        self.entries: Dict[str, List[Tuple[int, str]]] = {}
+        self.synonyms: Dict[str, str] = {}
+        for category in known_categories:
+            self.add_category(category)
+        for synonym, category in (synonyms or {}).items():
+            self.add_synonym(synonym, category)
+
+    def add_category(self, category: str):
+        entries = self.entries.setdefault(category, [])
+        if (DIRECT, category) not in entries:
+            entries.append((DIRECT, category))
+
+    def add_synonym(self, synonym: str, category: str):
+        previous = self.synonyms.get(synonym)
+        if previous == category:
+            return
+        entries = self.entries.setdefault(synonym, [])
+        if previous is not None:
+            entries.remove((SYNONYM, previous))
+        entries.append((SYNONYM, category))
+        self.synonyms[synonym] = category
+
+    def match(self, hypernims: List[str]) -> List[str]:
+        """
+        Return the distinct categories matching any of the hypernims:
+        known categories first, then categories of synonyms, each in
+        hypernim order.
+        """
+        matches = [
+            (kind, rank, category)
+            for rank, hypernim in enumerate(hypernims)
+            for kind, category in self.entries.get(hypernim, ())
+        ]
+        matches.sort()
+        return list(dict.fromkeys(category for _, _, category in matches))
+
+
+class Resolution(NamedTuple):
+    key: str
+    hypernims: List[str]
+    categories: List[str]
+
+
+class CategoryResolver:
+    """
+    Resolve items to their hypernims and candidate categories, behind an
+    LRU cache keyed on the canonical item form.
+
+    The cache is dropped whenever the storage's categories or synonyms
+    change, as those decide the candidate categories.
+
+    :param hypernims_of: returns the hypernims of a normalized item
+    :param cache_size: the number of items kept, 0 disables the cache
+    :param phrases: resolves the items that are not lemmas to the phrase
+        (within them) that is; the resolution key is then that phrase
+    """
+
+    def __init__(
+        self,
+        storage,
+        hypernims_of: HypernimLookup,
+        cache_size: int = 4096,
+        on_evict: Optional[Callable[[str, Resolution], None]] = None,
+        phrases: Optional["PhraseResolver"] = None,
+    ):
+        self.storage = storage
+        self.hypernims_of = hypernims_of
+        self.phrases = phrases
+        self.cache: LRUCache[str, Resolution] = LRUCache(cache_size, on_evict)
+        self._generation = storage.generation
+
+    def _resolution(self, key: str, hypernims: List[str]) -> Resolution:
+        categories = self.storage.category_index.match(hypernims)
+        return Resolution(key, hypernims, categories)
+
+    def _check_generation(self):
+        if self._generation != self.storage.generation:
+            self.cache.clear()
+            self._generation = self.storage.generation
+
+    def resolve_key(self, key: str) -> Resolution:
+        return self.resolve_keys([key])[key]
+
+    def resolve_keys(self, keys: Iterable[str]) -> Dict[str, Resolution]:
+        """
+        Resolve many canonical item forms, the ones that aren't lemmas
+        going through the phrase resolver in a single batch
+        """
+        self._check_generation()
+        resolutions: Dict[str, Resolution] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            resolution = self.cache.get(key)
+            if resolution is not None:
+                resolutions[key] = resolution
+                continue
+            hypernims = self.hypernims_of(key)
+            if hypernims or self.phrases is None:
+                resolutions[key] = self._resolution(key, hypernims)
+                self.cache.put(key, resolutions[key])
+            else:
+                missing.append(key)
+
+        if missing and self.phrases is not None:
+            found = self.phrases.resolve_many(
+                missing, self.storage.category_index.match
+            )
+            for key, match in found.items():
+                if match is None:
+                    resolutions[key] = self._resolution(key, [])
+                else:
+                    resolutions[key] = self._resolution(*match)
+                self.cache.put(key, resolutions[key])
+        return resolutions
+
+    def resolve(self, item: str) -> Resolution:
+        return self.resolve_key(item_key(item))
+
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
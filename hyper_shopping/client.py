@@ -0,0 +1,193 @@
+"""
+A thin, blocking client of the categorization service (see ``serve``).
+
+It only needs the standard library, so jobs calling it start in
+milliseconds instead of loading WordNet, the spelling index and the store
+themselves::
+
+    python -m hyper_shopping.client categorize "Milk" "Pop tards"
+
+``cli.py categorize`` goes through ``delegate`` before importing anything
+else, so it's just as quick while a service is running.
+
+Requests and responses are JSON objects, one per line, over a Unix socket.
+"""
+import argparse
+import json
+import socket
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+SERVICE_SOCKET = Path("./.service.sock")
+
+
+class ServiceError(Exception):
+    pass
+
+
+class ServiceClient:
+    """
+    Use as a context manager, or ``close`` it; connects on first request.
+
+    :param timeout: seconds to wait for a response
+    """
+
+    def __init__(self, path: Path = SERVICE_SOCKET, timeout: float = 30.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.socket: Optional[socket.socket] = None
+        self.file: Any = None
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(str(self.path))
+        except OSError:
+            connection.close()
+            raise
+        self.socket = connection
+        self.file = connection.makefile("rwb")
+
+    def close(self):
+        if self.socket is not None:
+            self.file.close()
+            self.socket.close()
+            self.socket = None
+
+    def request(self, op: str, **params) -> Any:
+        """
+        Send a request and return its result, raising ``ServiceError`` with
+        the service's error message if it failed
+        """
+        if self.socket is None:
+            self.connect()
+        self.file.write(json.dumps(dict(params, op=op)).encode() + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            self.close()
+            raise ServiceError("The service closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise ServiceError(response["error"])
+        return response["result"]
+
+    def categorize(self, items: List[str]) -> List[Dict[str, Any]]:
+        """
+        Return the result (see ``batch.Result``) of each item, in order
+        """
+        return self.request("categorize", items=items)
+
+    def categorize_many(
+        self, items: Iterable[str], chunk_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the result of each item, in order, sending ``chunk_size``
+        items per request
+        """
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return
+            yield from self.categorize(chunk)
+
+    def sort(
+        self, checklist: List[Dict[str, Any]], shop: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the check items sorted by the route through shop
+        """
+        return self.request("sort", items=checklist, shop=shop)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.request("stats")
+
+
+def service_available(path: Path = SERVICE_SOCKET) -> bool:
+    """
+    Return whether a service is listening on the socket
+    """
+    if not Path(path).exists():
+        return False
+    try:
+        with ServiceClient(path, timeout=1.0) as client:
+            client.request("ping")
+    except (OSError, ServiceError):
+        return False
+    return True
+
+
+class ArgumentError(Exception):
+    pass
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise ArgumentError(message)
+
+
+def delegate(argv: List[str], path: Path = SERVICE_SOCKET) -> bool:
+    """
+    Run a ``cli.py categorize`` command line through the running service.
+
+    Returns False, having done nothing, for any other command line, or one
+    the service can't run (``--local``, more workers, ``--help``...), and
+    when there is no service: the full CLI runs it instead.
+    """
+    parser = ArgumentParser(add_help=False)
+    parser.add_argument("command", choices=["categorize"])
+    parser.add_argument("items", nargs="?", default="-")
+    parser.add_argument("--output", "-o", default="-")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--local", action="store_true")
+    try:
+        args = parser.parse_args(argv)
+    except ArgumentError:
+        return False
+    if args.local or args.workers != 1 or not service_available(path):
+        return False
+
+    try:
+        items = sys.stdin if args.items == "-" else open(args.items)
+        output = sys.stdout if args.output == "-" else open(args.output, "w")
+    except OSError:
+        return False  # reported by the CLI
+    try:
+        names = (line.strip() for line in items if line.strip())
+        with ServiceClient(path) as client:
+            for result in client.categorize_many(names, args.chunk_size):
+                output.write(json.dumps(result) + "\n")
+    finally:
+        for file in (items, output):
+            if file not in (sys.stdin, sys.stdout):
+                file.close()
+    return True
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] not in ("categorize", "stats"):
+        print("usage: client categorize [ITEM...] | client stats", file=sys.stderr)
+        return 2
+    with ServiceClient() as client:
+        if argv[0] == "stats":
+            print(json.dumps(client.stats()))
+            return 0
+        items = argv[1:] or [line.strip() for line in sys.stdin if line.strip()]
+        for result in client.categorize(items):
+            print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,13 +1,24 @@
-from typing import List, Set, Dict, Mapping
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
 from mypy_extensions import TypedDict
-import shelve
+
+from .categorize import CategoryIndex
 
 
 KnownCategories = Set[str]
 ItemCategories = Dict[str, str]
+CategorySynonyms = Dict[str, str]
 Store = TypedDict(
     "Store",
-    {"known_categories": KnownCategories, "item_categories": ItemCategories},
+    {
+        "known_categories": KnownCategories,
+        "item_categories": ItemCategories,
+        "category_synonyms": CategorySynonyms,
+    },
 )
 DEFAULT_CATEGORIES = {
     "baked_goods",
@@ -29,52 +40,424 @@ DEFAULT_CATEGORY_SYNONYMS = {
     "pastry": "snacks",
     "picnic": "house_hold",
     "plant": "vegetable",
+    "vegetables": "vegetable",
 }
 
 
-class Storage:
+class StorageBackend:
+    """
+    The persistence operations ``Storage`` needs from a backend.
+    """
+
+    def get_known_categories(self) -> KnownCategories:
+        raise NotImplementedError
+
+    def add_known_categories(self, categories: Iterable[str]):
+        raise NotImplementedError
+
+    def get_category_synonyms(self) -> CategorySynonyms:
+        raise NotImplementedError
+
+    def add_category_synonyms(self, synonyms: Mapping[str, str]):
+        raise NotImplementedError
+
+    def get_item_category(self, item: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def get_item_categories(self) -> ItemCategories:
+        raise NotImplementedError
+
+    def get_many_item_categories(
+        self, items: Iterable[str]
+    ) -> Dict[str, Optional[str]]:
+        return {item: self.get_item_category(item) for item in items}
+
+    def count_item_categories(self) -> int:
+        return len(self.get_item_categories())
+
+    def set_item_categories(self, item_categories: Mapping[str, str]):
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes so they're applied together, or not at all
+        """
+        yield
+
+    def close(self):
+        pass
+
+
+class ShelveBackend(StorageBackend):
+    """
+    Keeps each collection as a single value of a shelf (or any mapping).
+
+    Every write re-pickles the whole collection it changes, and every read
+    unpickles it, so items are best looked up many at a time. Nothing is
+    kept in memory between calls, as other processes may write the shelf.
+    """
+
     data: Store
 
     def __init__(self, shelf):
         self.data = shelf
+        if "known_categories" not in self.data:
+            self.data["known_categories"] = set()
+        if "category_synonyms" not in self.data:
+            self.data["category_synonyms"] = {}
+        if "item_categories" not in self.data:
+            self.data["item_categories"] = {}
+
+    def get_known_categories(self):
+        return self.data["known_categories"]
+
+    def add_known_categories(self, categories):
+        known_categories = self.data["known_categories"]
+        known_categories.update(categories)
+        self.data["known_categories"] = known_categories
+
+    def get_category_synonyms(self):
+        return self.data["category_synonyms"]
+
+    def add_category_synonyms(self, synonyms):
+        category_synonyms = self.data["category_synonyms"]
+        category_synonyms.update(synonyms)
+        self.data["category_synonyms"] = category_synonyms
+
+    def get_item_category(self, item):
+        return self.get_item_categories().get(item)
+
+    def get_item_categories(self):
+        return self.data["item_categories"]
+
+    def get_many_item_categories(self, items):
+        stored = self.get_item_categories()
+        return {item: stored.get(item) for item in items}
+
+    def set_item_categories(self, item_categories):
+        stored = self.get_item_categories()
+        stored.update(item_categories)
+        self.data["item_categories"] = stored
+
+    def close(self):
+        if hasattr(self.data, "close"):
+            self.data.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    One row per category, synonym and item, in a SQLite database.
+
+    The database runs in WAL mode, so several processes can read while one
+    writes, and writes inside ``transaction()`` are committed together.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS known_categories (
+            category TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS category_synonyms (
+            synonym TEXT PRIMARY KEY,
+            category TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS item_categories (
+            item TEXT PRIMARY KEY,
+            category TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS item_categories_category
+            ON item_categories (category);
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        # autocommit, transactions are explicit (see ``transaction``)
+        self.connection = sqlite3.connect(str(self.path), isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self):
+        if self._depth:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        self._depth = 1
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        else:
+            self.connection.execute("COMMIT")
+        finally:
+            self._depth = 0
+
+    def get_known_categories(self):
+        rows = self.connection.execute("SELECT category FROM known_categories")
+        return {category for (category,) in rows}
+
+    def add_known_categories(self, categories):
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO known_categories VALUES (?)",
+                ((category,) for category in categories),
+            )
+
+    def get_category_synonyms(self):
+        rows = self.connection.execute(
+            "SELECT synonym, category FROM category_synonyms"
+        )
+        return dict(rows)
+
+    def add_category_synonyms(self, synonyms):
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO category_synonyms VALUES (?, ?)",
+                synonyms.items(),
+            )
+
+    def get_item_category(self, item):
+        row = self.connection.execute(
+            "SELECT category FROM item_categories WHERE item = ?", (item,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_item_categories(self):
+        rows = self.connection.execute(
+            "SELECT item, category FROM item_categories"
+        )
+        return dict(rows)
+
+    def count_item_categories(self):
+        (count,) = self.connection.execute(
+            "SELECT count(*) FROM item_categories"
+        ).fetchone()
+        return count
+
+    def set_item_categories(self, item_categories):
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO item_categories VALUES (?, ?)",
+                item_categories.items(),
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+def migrate_shelf(shelf, backend: StorageBackend):
+    """
+    Copy all the data of an existing ``.data`` shelf into another backend
+    """
+    source = ShelveBackend(shelf)
+    with backend.transaction():
+        backend.add_known_categories(source.get_known_categories())
+        backend.add_category_synonyms(source.get_category_synonyms())
+        backend.set_item_categories(source.get_item_categories())
+
+
+class Storage:
+    """
+    The categories store, with write-behind batching over its backend.
+
+    Writes that don't change anything are dropped, the rest are kept in
+    memory (dirty) and written to the backend together by ``flush``: when
+    ``flush_size`` writes are pending, or a ``batch`` ends. There's no
+    timer, ``flush_interval`` is checked on write: the first write coming
+    ``flush_interval`` seconds after the last flush flushes. The default
+    ``flush_size`` of 1 writes straight through.
+    """
+
+    backend: StorageBackend
+
+    def __init__(
+        self,
+        backend,
+        flush_size: int = 1,
+        flush_interval: Optional[float] = None,
+    ):
+        """
+        :param backend: a ``StorageBackend``, or a shelf to keep data in
+        :param flush_size: number of pending writes that triggers a flush
+        :param flush_interval: seconds after which the next write flushes
+        """
+        if not isinstance(backend, StorageBackend):
+            backend = ShelveBackend(backend)
+        self.backend = backend
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._batch_sizes: List[Optional[int]] = []
+        self._last_flush = time.monotonic()
+        self._dirty_items: ItemCategories = {}
+        self._dirty_categories: KnownCategories = set()
+        self._dirty_synonyms: CategorySynonyms = {}
+        # bumped whenever known categories or synonyms change
+        self.generation = 0
+        self._known_categories = set(self.backend.get_known_categories())
+        self._category_synonyms = dict(self.backend.get_category_synonyms())
+        self.category_index = CategoryIndex(
+            self._known_categories, self._category_synonyms
+        )
         self.update_defaults()
 
     def update_defaults(self):
-        categories = self.data.get("known_categories") or set()
-        categories.update(DEFAULT_CATEGORIES)
-        self.data["known_categories"] = categories
+        with self.batch():
+            self.update_known_categories(DEFAULT_CATEGORIES)
+            for synonym, category in DEFAULT_CATEGORY_SYNONYMS.items():
+                self.add_category_synonym(synonym, category)
 
-        category_synonyms = self.data.get("category_synonyms") or {}
-        category_synonyms.update(DEFAULT_CATEGORY_SYNONYMS)
-        self.data["category_synonyms"] = category_synonyms
+    @property
+    def pending(self) -> int:
+        """
+        The number of writes not yet flushed to the backend
+        """
+        return (
+            len(self._dirty_items)
+            + len(self._dirty_categories)
+            + len(self._dirty_synonyms)
+        )
 
-        if "item_categories" not in self.data:
-            self.data["item_categories"] = {}
+    def flush(self):
+        """
+        Write all pending changes to the backend, in a single transaction
+        """
+        if self.pending:
+            with self.backend.transaction():
+                if self._dirty_categories:
+                    self.backend.add_known_categories(self._dirty_categories)
+                if self._dirty_synonyms:
+                    self.backend.add_category_synonyms(self._dirty_synonyms)
+                if self._dirty_items:
+                    self.backend.set_item_categories(self._dirty_items)
+            self._dirty_items = {}
+            self._dirty_categories = set()
+            self._dirty_synonyms = {}
+        self._last_flush = time.monotonic()
+
+    @contextmanager
+    def batch(self, size: Optional[int] = None):
+        """
+        Hold writes in memory until the (outermost) batch ends.
+
+        :param size: flush early once this many writes are pending,
+            instead of the storage's ``flush_size``
+        """
+        self._batch_sizes.append(size)
+        try:
+            yield self
+        finally:
+            self._batch_sizes.pop()
+            if not self._batch_sizes:
+                self.flush()
+
+    def _written(self):
+        """
+        Flush if a size or time threshold was reached
+        """
+        if self._batch_sizes:
+            size = self._batch_sizes[-1]
+        else:
+            size = self.flush_size
+        if size is not None and self.pending >= size:
+            self.flush()
+        elif (
+            self.flush_interval is not None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self.backend.close()
 
     def get_known_categories(self,):
-        return self.data["known_categories"]
+        return self._known_categories
+
+    def _add_categories(self, categories) -> bool:
+        new_categories = set(categories) - self._known_categories
+        if new_categories:
+            self.generation += 1
+        for category in new_categories:
+            self.category_index.add_category(category)
+        self._known_categories.update(new_categories)
+        self._dirty_categories.update(new_categories)
+        return bool(new_categories)
 
     def update_known_categories(self, categories):
-        self.data["known_categories"] = categories
+        if self._add_categories(categories):
+            self._written()
 
     def add_to_known_categories(self, category):
-        categories = self.get_known_categories()
-        categories.add(category)
-        self.update_known_categories(categories)
+        self.update_known_categories({category})
 
     def get_item_category(self, item):
-        return self.data["item_categories"].get(item)
+        if item in self._dirty_items:
+            return self._dirty_items[item]
+        return self.backend.get_item_category(item)
+
+    def get_item_categories(self):
+        item_categories = dict(self.backend.get_item_categories())
+        item_categories.update(self._dirty_items)
+        return item_categories
+
+    def get_many_item_categories(self, items):
+        """
+        Return the category of each of many items (None when unknown), with
+        a single backend read for the shelve backend
+        """
+        items = list(items)
+        found = self.backend.get_many_item_categories(
+            item for item in items if item not in self._dirty_items
+        )
+        return {
+            item: self._dirty_items[item] if item in self._dirty_items else found[item]
+            for item in items
+        }
+
+    def count_item_categories(self) -> int:
+        """
+        Return the number of categorized items, without reading them all
+        from backends that can count them
+        """
+        stored = self.backend.get_many_item_categories(self._dirty_items)
+        new = sum(category is None for category in stored.values())
+        return self.backend.count_item_categories() + new
 
     def set_item_category(self, item, category):
-        self.add_to_known_categories(category)
-        categories = self.data["item_categories"]
-        categories[item] = category
-        self.data["item_categories"] = categories
+        self.set_item_categories({item: category})
+
+    def set_item_categories(self, item_categories):
+        """
+        Save many item categories at once, skipping unchanged ones
+        """
+        stored = self.get_many_item_categories(item_categories)
+        changed = {
+            item: category
+            for item, category in item_categories.items()
+            if stored[item] != category
+        }
+        if not changed:
+            return
+        self._add_categories(changed.values())
+        self._dirty_items.update(changed)
+        self._written()
 
     def get_category_synonyms(self):
-        return self.data["category_synonyms"]
+        return self._category_synonyms
 
     def add_category_synonym(self, synonym, category):
-        category_synonyms = self.get_category_synonyms()
-        category_synonyms["synonym"] = category
-        self.data["category_synonyms"] = category_synonyms
+        if self._category_synonyms.get(synonym) == category:
+            return
+        self.generation += 1
+        self.category_index.add_synonym(synonym, category)
+        self._category_synonyms[synonym] = category
+        self._dirty_synonyms[synonym] = category
+        self._written()
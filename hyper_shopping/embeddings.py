@@ -0,0 +1,159 @@
+"""
+An offline, word vector based category fallback.
+
+Items WordNet knows nothing about ("pastizzi", "gogosari") are embedded as
+the average of their word vectors and given the category whose centroid is
+the most similar. Vectors are stored as a NumPy ``.npy`` matrix of unit
+rows, memory-mapped so only the rows of words actually used are read, next
+to a ``.vocab`` file of one word per row. Many items are classified at
+once, with a single matrix multiply against all category centroids.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, TextIO
+
+import numpy as np
+
+from .categorize import item_key
+
+
+def tokens(item: str) -> List[str]:
+    return [token for token in item_key(item).split("_") if token]
+
+
+def normalized(matrix: np.ndarray) -> np.ndarray:
+    """
+    Return the matrix with rows scaled to unit length (zero rows stay zero)
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def convert_vectors(
+    text_file: TextIO, path: Path, limit: Optional[int] = None
+) -> int:
+    """
+    Convert word vectors from the text format of GloVe and word2vec (a word
+    then its values, per line) to ``path`` (``.npy``) and its vocabulary
+    file. Returns the number of words converted.
+
+    :param limit: only keep this many words, the most frequent ones come
+        first in these files
+    :raises ValueError: when the file has no word vectors
+    """
+    words: List[str] = []
+    rows: List[np.ndarray] = []
+    for line in text_file:
+        parts = line.rstrip().split(" ")
+        if len(parts) <= 2:
+            continue  # the word2vec header of word count and dimensions
+        words.append(parts[0])
+        rows.append(np.asarray(parts[1:], dtype=np.float32))
+        if limit is not None and len(words) >= limit:
+            break
+    if not rows:
+        raise ValueError("no word vectors to convert")
+    np.save(path, normalized(np.vstack(rows)))
+    path.with_suffix(".vocab").write_text("\n".join(words) + "\n")
+    return len(words)
+
+
+class WordVectors:
+    """
+    Memory-mapped unit word vectors, written by ``convert_vectors``.
+    """
+
+    def __init__(self, path: Path):
+        self.vectors = np.load(path, mmap_mode="r")
+        vocab = Path(path).with_suffix(".vocab").read_text().splitlines()
+        self.rows: Dict[str, int] = {word: row for row, word in enumerate(vocab)}
+        self.dimensions = self.vectors.shape[1]
+
+    def __contains__(self, word: object) -> bool:
+        return word in self.rows
+
+    def embed(self, items: Sequence[str]) -> np.ndarray:
+        """
+        Return the unit average vector of each item's known words, as the
+        rows of a matrix; rows of items with no known word are zero
+        """
+        rows: List[int] = []
+        starts: List[int] = []
+        embedded: List[int] = []
+        for i, item in enumerate(items):
+            item_rows = [self.rows[t] for t in tokens(item) if t in self.rows]
+            if item_rows:
+                starts.append(len(rows))
+                embedded.append(i)
+                rows.extend(item_rows)
+
+        matrix = np.zeros((len(items), self.dimensions), dtype=np.float32)
+        if rows:
+            # one gather of all word vectors, summed per item
+            sums = np.add.reduceat(self.vectors[rows], starts, axis=0)
+            matrix[embedded] = normalized(sums)
+        return matrix
+
+
+class EmbeddingClassifier:
+    """
+    Nearest category centroid classifier over word vectors.
+
+    :param examples: the item names known for each category, a category's
+        own name is always one of its examples
+    :param min_similarity: the cosine similarity below which an item is
+        left unclassified
+    """
+
+    def __init__(
+        self,
+        vectors: WordVectors,
+        examples: Mapping[str, Iterable[str]],
+        min_similarity: float = 0.3,
+    ):
+        self.vectors = vectors
+        self.min_similarity = min_similarity
+        self.categories: List[str] = []
+        centroids = []
+        for category, names in examples.items():
+            embedded = vectors.embed([category.replace("_", " "), *names])
+            centroid = embedded.sum(axis=0)
+            if centroid.any():
+                self.categories.append(category)
+                centroids.append(centroid)
+        self.centroids = normalized(
+            np.vstack(centroids)
+            if centroids
+            else np.zeros((0, vectors.dimensions), dtype=np.float32)
+        )
+
+    def similarities(self, items: Sequence[str]) -> np.ndarray:
+        """
+        Return the cosine similarity of each item (row) to each category
+        """
+        return self.vectors.embed(items) @ self.centroids.T
+
+    def classify(self, items: Sequence[str]) -> List[Optional[str]]:
+        """
+        Return the most similar category of each item, or None
+        """
+        if not self.categories or not items:
+            return [None] * len(items)
+        similarities = self.similarities(items)
+        best = similarities.argmax(axis=1)
+        scores = similarities[np.arange(len(items)), best]
+        return [
+            self.categories[index] if score >= self.min_similarity else None
+            for index, score in zip(best.tolist(), scores.tolist())
+        ]
+
+
+def category_examples(
+    item_categories: Mapping[str, str], categories: Iterable[str] = ()
+) -> Dict[str, List[str]]:
+    """
+    Group the categorized items by category, for ``EmbeddingClassifier``
+    """
+    examples: Dict[str, List[str]] = {category: [] for category in categories}
+    for item, category in item_categories.items():
+        examples.setdefault(category, []).append(item)
+    return examples
@@ -0,0 +1,130 @@
+"""
+A precomputed index of WordNet hypernyms.
+
+Walking ``synset.hypernym_paths()`` for every lookup visits the same upper
+synsets (``entity``, ``physical_entity``, ``food``...) again and again, so
+instead we walk WordNet once, and store for each lemma the deduplicated list
+of hypernym lemma names, in the order the paths would have yielded them.
+"""
+from typing import Dict, Iterable, List
+
+HypernymIndex = Dict[str, List[str]]
+
+# WordNet's own noun detachment rules (see ``nltk`` ``morphy``), so plural
+# items like "Cherries" find the "cherry" lemma without loading WordNet.
+# The last rule stands in for the "-oes" plurals WordNet lists as exceptions,
+# irregular forms ("leaves") are folded into the index from its exception
+# lists instead
+NOUN_SUBSTITUTIONS = [
+    ("s", ""),
+    ("ses", "s"),
+    ("xes", "x"),
+    ("zes", "z"),
+    ("ches", "ch"),
+    ("shes", "sh"),
+    ("men", "man"),
+    ("ies", "y"),
+    ("oes", "o"),
+]
+
+
+def dedupe(names: Iterable[str]) -> List[str]:
+    """
+    Return the given names without repetitions, keeping first-seen order
+    """
+    return list(dict.fromkeys(names))
+
+
+def walk_hypernims(synsets) -> List[str]:
+    """
+    Unpack a list of synsets into a deduplicated list of lemma names
+    pertaining to each matched hypernim, ordered root first.
+
+    :param synsets: a list of nltk.corpus.reader.wordnet.Synset
+    """
+    return dedupe(
+        name
+        for synset in synsets
+        for path in synset.hypernym_paths()
+        for hypernim in path
+        for name in hypernim.lemma_names()
+    )
+
+
+def build_hypernym_index(wordnet) -> HypernymIndex:
+    """
+    Walk all of WordNet once and map each lemma to its hypernym lemmas.
+
+    Hypernym lists are memoized per synset, so the shared upper levels
+    of the hierarchy are only ever walked once per synset.
+
+    :param wordnet: the ``nltk.corpus.wordnet`` corpus reader
+    """
+    synset_hypernims: Dict[str, List[str]] = {}
+
+    def hypernims_of(synset) -> List[str]:
+        name = synset.name()
+        if name not in synset_hypernims:
+            synset_hypernims[name] = walk_hypernims([synset])
+        return synset_hypernims[name]
+
+    index: HypernymIndex = {}
+    for lemma in wordnet.all_lemma_names():
+        index[lemma] = dedupe(
+            name
+            for synset in wordnet.synsets(lemma)
+            for name in hypernims_of(synset)
+        )
+
+    # the irregular forms of every part of speech (noun.exc, verb.exc...),
+    # which morphy maps to their base lemmas before any detachment rule
+    for exceptions in getattr(wordnet, "_exception_map", {}).values():
+        for form, bases in exceptions.items():
+            hypernims = [name for base in bases for name in index.get(base, [])]
+            if hypernims:
+                index[form] = dedupe([*index.get(form, []), *hypernims])
+    return index
+
+
+def base_forms(word: str) -> List[str]:
+    """
+    Return the candidate lemma forms of ``word``: itself, followed by every
+    form produced by the noun detachment rules.
+    """
+    word = word.lower()
+    forms = [word]
+    for suffix, ending in NOUN_SUBSTITUTIONS:
+        if word.endswith(suffix) and len(word) > len(suffix):
+            forms.append(word[: -len(suffix)] + ending)
+    return dedupe(forms)
+
+
+def lookup_hypernims(index, item: str) -> List[str]:
+    """
+    Return the hypernims of ``item`` from a precomputed index.
+
+    Like ``wn.synsets`` the lookup is case insensitive, and returns the
+    union of the hypernims of the item and of all its base forms.
+    """
+    return dedupe(
+        name for form in base_forms(item) if form in index for name in index[form]
+    )
+
+
+def lookup_many_hypernims(index, items: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Return the hypernims of each item like ``lookup_hypernims``, looking up
+    all their base forms at once when the index supports ``get_many``
+    """
+    forms = {item: base_forms(item) for item in items}
+    all_forms = [form for item_forms in forms.values() for form in item_forms]
+    if hasattr(index, "get_many"):
+        found = index.get_many(all_forms)
+    else:
+        found = {form: index[form] for form in all_forms if form in index}
+    return {
+        item: dedupe(
+            name for form in item_forms if form in found for name in found[form]
+        )
+        for item, item_forms in forms.items()
+    }
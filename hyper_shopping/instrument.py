@@ -0,0 +1,175 @@
+"""
+Opt-in timers and counters for the hot paths of the pipeline.
+
+Nothing is measured unless a ``Recorder`` patches the functions and methods
+to measure, so when instrumentation is off they run unchanged, at no cost.
+A run ends with a summary table, and optionally a JSON file in the Chrome
+trace event format (open it in ``chrome://tracing`` or Perfetto), with the
+summary under its own key. ``start_profile`` captures a whole run with
+cProfile instead.
+"""
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from mypy_extensions import TypedDict
+
+Stat = TypedDict(
+    "Stat", {"calls": int, "total": float, "max": float, "mean": float}
+)
+
+# the trace keeps at most this many events, the summary counts them all
+MAX_EVENTS = 200000
+
+
+class Recorder:
+    """
+    Collects the duration of every measured call, and named counters.
+    """
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self.max_events = max_events
+        self.calls: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+        self.maxima: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.origin = time.perf_counter()
+        self._patched: List[Tuple[Any, str, Any]] = []
+
+    def record(self, name: str, start: float, duration: float):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+        if duration > self.maxima.get(name, 0.0):
+            self.maxima[name] = duration
+        if len(self.events) < self.max_events:
+            self.events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+            )
+
+    def count(self, name: str, increment: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + increment
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start)
+
+    def wrap(self, func: Callable, name: str) -> Callable:
+        """
+        Return func measured under name, coroutine functions included
+        """
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def measured_coroutine(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter() - start)
+
+            return measured_coroutine
+
+        @functools.wraps(func)
+        def measured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, start, time.perf_counter() - start)
+
+        return measured
+
+    def patch(self, target: Any, names: Iterable[str], prefix: str = ""):
+        """
+        Replace the named functions of a module (or methods of a class)
+        with measured ones, until ``unpatch``
+        """
+        for name in names:
+            original = inspect.getattr_static(target, name)
+            setattr(target, name, self.wrap(original, f"{prefix}{name}"))
+            self._patched.append((target, name, original))
+
+    def unpatch(self):
+        while self._patched:
+            target, name, original = self._patched.pop()
+            setattr(target, name, original)
+
+    def stats(self) -> Dict[str, Stat]:
+        return {
+            name: Stat(
+                calls=calls,
+                total=self.totals[name],
+                max=self.maxima[name],
+                mean=self.totals[name] / calls,
+            )
+            for name, calls in self.calls.items()
+        }
+
+    def summary(self) -> str:
+        """
+        Return a table of the measured calls, the slowest in total first
+        """
+        lines = [
+            f"{'name':40} {'calls':>8} {'total ms':>10} {'mean us':>10}"
+            f" {'max ms':>9}"
+        ]
+        by_total = sorted(
+            self.stats().items(), key=lambda item: item[1]["total"], reverse=True
+        )
+        for name, stat in by_total:
+            lines.append(
+                f"{name:40} {stat['calls']:8} {stat['total'] * 1e3:10.2f}"
+                f" {stat['mean'] * 1e6:10.1f} {stat['max'] * 1e3:9.2f}"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:40} {value:8}")
+        return "\n".join(lines)
+
+    def save(self, path: Path):
+        """
+        Write the trace events, with the summary and counters alongside
+        """
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "traceEvents": self.events,
+                    "displayTimeUnit": "ms",
+                    "summary": self.stats(),
+                    "counters": self.counters,
+                },
+                file,
+            )
+
+
+def start_profile(path: Path) -> Callable[[], None]:
+    """
+    Start profiling with cProfile, returning the function that stops it
+    and writes the stats (to read with ``pstats`` or snakeviz)
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop():
+        profiler.disable()
+        profiler.dump_stats(str(path))
+
+    return stop
@@ -0,0 +1,280 @@
+"""
+Shop layouts as weighted aisle graphs, with shortest walking routes.
+
+Departments are nodes and aisles are weighted edges (walking time). Given
+the departments a shopping list actually needs, the planner finds the
+shortest walk from the entrance to the checkout visiting all of them: an
+exact Held-Karp dynamic program for a few departments, nearest neighbour
+plus 2-opt for more. ``RouteCache`` keeps the planned routes of many
+shops, in memory and on disk.
+"""
+import hashlib
+import heapq
+from collections import Counter
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .cache import CacheStats, LRUCache
+
+ENTRANCE = "entrance"
+CHECKOUT = "checkout"
+# Held-Karp is O(2^n n^2), fast enough up to about this many departments
+EXACT_LIMIT = 10
+
+Aisle = Tuple[str, str]
+Route = Tuple[str, ...]
+
+
+class ShopLayout:
+    """
+    An undirected graph of departments, with an entrance and a checkout.
+
+    :param aisles: the walking time of each aisle between two departments
+    """
+
+    def __init__(
+        self,
+        aisles: Mapping[Aisle, float],
+        entrance: str = ENTRANCE,
+        checkout: str = CHECKOUT,
+    ):
+        self.entrance = entrance
+        self.checkout = checkout
+        self.graph: Dict[str, Dict[str, float]] = {entrance: {}, checkout: {}}
+        for (a, b), weight in aisles.items():
+            for source, target in ((a, b), (b, a)):
+                neighbours = self.graph.setdefault(source, {})
+                neighbours[target] = min(weight, neighbours.get(target, weight))
+        self.distances = {node: self._shortest_paths(node) for node in self.graph}
+        # identifies the layout, so that routes planned on a previous
+        # version of it are not reused
+        self.fingerprint = hashlib.sha1(
+            repr((entrance, checkout, sorted(aisles.items()))).encode()
+        ).hexdigest()
+
+    @classmethod
+    def linear(cls, route: Sequence[str], **kwargs) -> "ShopLayout":
+        """
+        A layout of a single aisle, visiting the departments in order
+        """
+        nodes = [kwargs.get("entrance", ENTRANCE), *route]
+        nodes.append(kwargs.get("checkout", CHECKOUT))
+        return cls({(a, b): 1.0 for a, b in zip(nodes, nodes[1:])}, **kwargs)
+
+    def _shortest_paths(self, source: str) -> Dict[str, float]:
+        """
+        Dijkstra, returning the distance of every reachable node
+        """
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            for neighbour, weight in self.graph[node].items():
+                candidate = distance + weight
+                if candidate < distances.get(neighbour, float("inf")):
+                    distances[neighbour] = candidate
+                    heapq.heappush(queue, (candidate, neighbour))
+        return distances
+
+    def distance(self, source: str, target: str) -> float:
+        return self.distances[source].get(target, float("inf"))
+
+    def walk_length(self, route: Sequence[str]) -> float:
+        """
+        Return the length of a walk from the entrance, through the route's
+        departments, to the checkout
+        """
+        nodes = [self.entrance, *route, self.checkout]
+        return sum(self.distance(a, b) for a, b in zip(nodes, nodes[1:]))
+
+    def visitable(self, departments: Iterable[str]) -> FrozenSet[str]:
+        """
+        Return the departments that are reachable in this shop
+        """
+        reachable = self.distances[self.entrance]
+        ends = (self.entrance, self.checkout)
+        return frozenset(d for d in departments if d in reachable and d not in ends)
+
+    def plan(self, departments: Iterable[str]) -> Route:
+        """
+        Return the shortest order to visit the given departments in.
+        Departments that are not reachable in this shop are left out.
+        """
+        # sorted, so that equally short routes are chosen consistently
+        nodes = sorted(self.visitable(departments))
+        if len(nodes) <= EXACT_LIMIT:
+            return tuple(self._held_karp(nodes))
+        return tuple(self._two_opt(self._nearest_neighbour(nodes)))
+
+    def _held_karp(self, nodes: List[str]) -> List[str]:
+        """
+        The exact shortest path from entrance to checkout through all nodes
+        """
+        if not nodes:
+            return []
+        count = len(nodes)
+        start = [self.distance(self.entrance, node) for node in nodes]
+        between = [[self.distance(a, b) for b in nodes] for a in nodes]
+        # cost[mask][last], the shortest walk through mask ending at last
+        cost = [[float("inf")] * count for _ in range(1 << count)]
+        parent = [[-1] * count for _ in range(1 << count)]
+        for i in range(count):
+            cost[1 << i][i] = start[i]
+        for mask in range(1, 1 << count):
+            row = cost[mask]
+            for last in range(count):
+                last_cost = row[last]
+                if last_cost == float("inf") or not mask & (1 << last):
+                    continue
+                distances = between[last]
+                for following in range(count):
+                    if mask & (1 << following):
+                        continue
+                    extended = mask | (1 << following)
+                    candidate = last_cost + distances[following]
+                    if candidate < cost[extended][following]:
+                        cost[extended][following] = candidate
+                        parent[extended][following] = last
+
+        full = (1 << count) - 1
+        last = min(
+            range(count),
+            key=lambda i: cost[full][i] + self.distance(nodes[i], self.checkout),
+        )
+        order = []
+        mask = full
+        while last != -1:
+            order.append(nodes[last])
+            mask, last = mask & ~(1 << last), parent[mask][last]
+        return order[::-1]
+
+    def _nearest_neighbour(self, nodes: List[str]) -> List[str]:
+        order = []
+        remaining = set(nodes)
+        current = self.entrance
+        while remaining:
+            current = min(
+                sorted(remaining), key=lambda node: self.distance(current, node)
+            )
+            remaining.remove(current)
+            order.append(current)
+        return order
+
+    def _two_opt(self, order: List[str]) -> List[str]:
+        """
+        Reverse segments of the route while that makes the walk shorter
+        """
+        nodes = [self.entrance, *order, self.checkout]
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(nodes) - 2):
+                for j in range(i + 1, len(nodes) - 1):
+                    a, b = nodes[i - 1], nodes[i]
+                    c, d = nodes[j], nodes[j + 1]
+                    delta = (
+                        self.distance(a, c)
+                        + self.distance(b, d)
+                        - self.distance(a, b)
+                        - self.distance(c, d)
+                    )
+                    if delta < -1e-9:
+                        nodes[i : j + 1] = nodes[i : j + 1][::-1]
+                        improved = True
+        return nodes[1:-1]
+
+
+class RouteCache:
+    """
+    Planned routes keyed on (shop, departments), kept in a bounded LRU
+    cache backed by an optional shelf, so that they survive restarts.
+
+    :param layouts: the layout of each shop
+    :param shelf: where routes are persisted, e.g. a ``shelve`` file
+    :param cache_size: the number of routes kept in memory
+    """
+
+    def __init__(
+        self,
+        layouts: Mapping[str, ShopLayout],
+        shelf=None,
+        cache_size: int = 4096,
+    ):
+        self.layouts = layouts
+        self.shelf = shelf
+        self.cache: LRUCache[Tuple[str, FrozenSet[str]], Route] = LRUCache(
+            cache_size
+        )
+
+    @staticmethod
+    def _shelf_key(shop: str, departments: FrozenSet[str]) -> str:
+        return "\t".join([shop, *sorted(departments)])
+
+    def route(self, shop: str, departments: Iterable[str]) -> Route:
+        """
+        Return the shortest route through the departments of a shop,
+        planning it only when neither in memory nor on disk
+        """
+        layout = self.layouts[shop]
+        key = (shop, layout.visitable(departments))
+        route = self.cache.get(key)
+        if route is not None:
+            return route
+
+        shelf_key = self._shelf_key(*key)
+        stored = self.shelf.get(shelf_key) if self.shelf is not None else None
+        if stored is not None and stored[0] == layout.fingerprint:
+            route = stored[1]
+        else:
+            route = layout.plan(key[1])
+            if self.shelf is not None:
+                self.shelf[shelf_key] = (layout.fingerprint, route)
+        self.cache.put(key, route)
+        return route
+
+    def warm(
+        self,
+        combinations: Iterable[FrozenSet[str]],
+        shops: Optional[Iterable[str]] = None,
+    ) -> int:
+        """
+        Plan the routes of each department combination in every shop (or
+        the given ones), returning the number of routes warmed
+        """
+        shops = list(self.layouts if shops is None else shops)
+        warmed = 0
+        for departments in combinations:
+            for shop in shops:
+                self.route(shop, departments)
+                warmed += 1
+        return warmed
+
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
+
+    def close(self):
+        if self.shelf is not None:
+            self.shelf.close()
+
+
+def frequent_combinations(
+    lists: Iterable[Iterable[Optional[str]]], top: int = 100
+) -> List[FrozenSet[str]]:
+    """
+    Return the ``top`` most frequent sets of departments across lists,
+    given the departments of each list's items (None when unknown)
+    """
+    counts = Counter(
+        frozenset(d for d in departments if d) for departments in lists
+    )
+    return [combination for combination, _ in counts.most_common(top)]
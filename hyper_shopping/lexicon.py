@@ -0,0 +1,156 @@
+"""
+A memory-mapped, read-only hypernym lexicon.
+
+The file starts with a small header, followed by a table of offsets into the
+entries, which are sorted by key. Lookups binary search the offset table
+directly on the memory map, so opening the lexicon costs next to nothing, and
+only the pages holding the entries a run actually touches are read from disk.
+
+Layout::
+
+    header:  magic, version, entry count
+    offsets: count + 1 unsigned ints, relative to the first entry
+    entries: b"lemma<TAB>hypernim hypernim ...\n", sorted by lemma bytes
+"""
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping
+
+from .hypernyms import HypernymIndex
+
+MAGIC = b"HSLX"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+OFFSET = struct.Struct("<I")
+
+
+def write_lexicon(index: HypernymIndex, path: Path):
+    """
+    Write a hypernym index (see ``build_hypernym_index``) as a lexicon file.
+
+    The file is written aside and moved into place, so lexicons that are
+    already mapped keep reading the previous version.
+    """
+    keys = sorted(key.encode() for key in index)
+    entries = [
+        key + b"\t" + " ".join(index[key.decode()]).encode() + b"\n"
+        for key in keys
+    ]
+    offsets = [0]
+    for entry in entries:
+        offsets.append(offsets[-1] + len(entry))
+
+    partial = Path(f"{path}.partial")
+    with open(partial, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for offset in offsets:
+            file.write(OFFSET.pack(offset))
+        for entry in entries:
+            file.write(entry)
+    os.replace(partial, path)
+
+
+class Lexicon(Mapping[str, List[str]]):
+    """
+    Read-only mapping of lemma to hypernims, backed by a memory-mapped file.
+
+    It can be used wherever a ``HypernymIndex`` dict is expected, e.g. with
+    ``lookup_hypernims``.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            magic, version, count = b"", 0, 0
+        else:
+            magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"'{self.path}' is not a hypernym lexicon file")
+        self._count = count
+        self._entries_start = HEADER.size + (count + 1) * OFFSET.size
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _offset(self, position: int) -> int:
+        (offset,) = OFFSET.unpack_from(
+            self._map, HEADER.size + position * OFFSET.size
+        )
+        return self._entries_start + offset
+
+    def _key(self, position: int) -> bytes:
+        start = self._offset(position)
+        return self._map[start : self._map.find(b"\t", start)]
+
+    def _value(self, position: int) -> List[str]:
+        start = self._map.find(b"\t", self._offset(position)) + 1
+        end = self._offset(position + 1) - 1  # drop the trailing newline
+        return self._map[start:end].decode().split()
+
+    def _bisect(self, needle: bytes, low: int = 0) -> int:
+        """
+        Binary search the offset table from ``low``, returning the position
+        of the first key that is not less than needle
+        """
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < needle:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _position(self, key: str) -> int:
+        """
+        Return the position of key, or -1 for missing keys
+        """
+        needle = key.encode()
+        position = self._bisect(needle)
+        if position < self._count and self._key(position) == needle:
+            return position
+        return -1
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Return the hypernims of each of the keys that are in the lexicon.
+
+        The keys are looked up in sorted order, each search starting where
+        the previous one ended, so a batch touches every page at most once.
+        """
+        found = {}
+        low = 0
+        for needle in sorted({key.encode() for key in keys}):
+            low = self._bisect(needle, low)
+            if low == self._count:
+                break
+            if self._key(low) == needle:
+                found[needle.decode()] = self._value(low)
+        return found
+
+    def __getitem__(self, key: str) -> List[str]:
+        position = self._position(key)
+        if position < 0:
+            raise KeyError(key)
+        return self._value(position)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._position(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self._count):
+            yield self._key(position).decode()
+
+    def __len__(self) -> int:
+        return self._count
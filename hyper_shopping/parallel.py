@@ -0,0 +1,118 @@
+"""
+Categorize large item lists across a pool of worker processes.
+
+Hypernim lookups and category matching are CPU bound, so the distinct
+normalized items are split into chunks and matched in parallel. Each worker
+opens the lexicon once, when it starts, and gets a snapshot of the category
+index; the parent process owns the storage and saves all new categories
+with a single write. The catalog departments, fuzzy matches and classifier
+are applied in the parent, as by ``categorize_batch``, so that the results
+are the same for any number of workers.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .batch import (
+    Classifier,
+    Result,
+    ReviewQueue,
+    catalog_departments,
+    guess_unmatched,
+    make_results,
+    match_categories,
+    record_results,
+    unresolved_words,
+)
+from .catalog import Catalog
+from .categorize import CategoryIndex, CategoryResolver
+from .datastore import Storage
+from .hypernyms import lookup_hypernims, lookup_many_hypernims
+from .lexicon import Lexicon
+from .phrases import PhraseResolver
+
+# per worker process state, set up once by ``init_worker``
+worker: Dict = {}
+
+
+def init_worker(lexicon_path: str, index: CategoryIndex):
+    worker["lexicon"] = Lexicon(Path(lexicon_path))
+    worker["index"] = index
+
+
+def match_chunk(words: List[str]) -> Dict[str, List[str]]:
+    lexicon = worker["lexicon"]
+    return match_categories(
+        words,
+        lambda word: lookup_hypernims(lexicon, word),
+        worker["index"],
+        PhraseResolver(lambda phrases: lookup_many_hypernims(lexicon, phrases)),
+    )
+
+
+def categorize_parallel(
+    items: Iterable[str],
+    storage: Storage,
+    lexicon_path: Path,
+    review_queue: Optional[ReviewQueue] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    classify: Optional[Classifier] = None,
+    catalog: Optional[Catalog] = None,
+    fuzzy: Optional[Classifier] = None,
+) -> List[Result]:
+    """
+    Categorize items without user interaction, using a process pool.
+
+    Results are returned in input order, regardless of the number of
+    workers or the order in which chunks complete.
+
+    :param lexicon_path: the lexicon file each worker maps once
+    :param workers: number of processes, defaults to one per core
+    :param chunk_size: number of distinct items sent to a worker at a time
+    :param classify: as for ``categorize_batch``
+    :param catalog: as for ``categorize_batch``
+    :param fuzzy: as for ``categorize_batch``
+    """
+    items = list(items)
+    stored, normalized = unresolved_words(items, storage)
+    departments: Dict[str, str] = {}
+    mapped: Dict[str, str] = {}
+    if catalog is not None:
+        with Lexicon(lexicon_path) as lexicon:
+            resolver = CategoryResolver(
+                storage,
+                lambda word: lookup_hypernims(lexicon, word),
+                phrases=PhraseResolver(
+                    lambda phrases: lookup_many_hypernims(lexicon, phrases)
+                ),
+            )
+            departments, mapped = catalog_departments(normalized, resolver, catalog)
+    words = list(
+        dict.fromkeys(
+            key
+            for item, key in normalized.items()
+            if departments.get(item) not in mapped
+        )
+    )
+    chunks = [
+        words[start : start + chunk_size]
+        for start in range(0, len(words), chunk_size)
+    ]
+
+    candidates: Dict[str, List[str]] = {}
+    if chunks:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(str(lexicon_path), storage.category_index),
+        ) as pool:
+            for chunk_candidates in pool.map(match_chunk, chunks):
+                candidates.update(chunk_candidates)
+
+    results = make_results(
+        items, stored, normalized, candidates, departments, mapped
+    )
+    guess_unmatched(results, classify, fuzzy)
+    record_results(results, storage, review_queue)
+    return results
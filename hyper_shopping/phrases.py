@@ -0,0 +1,117 @@
+"""
+Resolve multi-word items to the WordNet lemma they are about.
+
+Whole items like "Mozzarella a piece for grating for lasagna" are rarely
+lemmas. Their words, without quantities and stopwords, give candidate
+phrases: every run of up to ``MAX_PHRASE_LENGTH`` words, longest first (the
+most specific collocation, like "sour cream") and, for the same length,
+rightmost first, as the head noun of an English noun phrase comes last.
+The candidates of many items are looked up in one batch, and each item
+resolves to its first candidate that is a noun and has categories, or else
+to its first noun: the lexicon has adjectives and verbs too, and "fresh"
+in "Mint leaves fresh" isn't what the item is about.
+"""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from .categorize import item_key
+
+# WordNet collocations longer than this are very rare
+MAX_PHRASE_LENGTH = 4
+
+STOPWORDS = frozenset(
+    """
+    a an the of for and or with without in on to from at by some any
+    few more less very big small piece pieces bag bags pack packs box
+    boxes bottle bottles can cans jar jars time times kg g gr l ml
+    """.split()
+)
+
+# the root of every WordNet noun hierarchy, adjectives have no hypernyms
+# and verbs have their own roots
+NOUN_ROOT = "entity"
+
+# returns the hypernims of each phrase that has any
+BatchLookup = Callable[[List[str]], Dict[str, List[str]]]
+# returns the categories matching some hypernims
+CategoryMatch = Callable[[List[str]], List[str]]
+
+
+class PhraseMatch(NamedTuple):
+    phrase: str
+    hypernims: List[str]
+
+
+def phrase_tokens(item: str) -> List[str]:
+    """
+    Return the words of an item, without quantities, numbers and stopwords
+    """
+    return [
+        token
+        for token in item_key(item).split("_")
+        if token and not token.isdigit() and token not in STOPWORDS
+    ]
+
+
+def candidate_phrases(tokens: List[str]) -> List[str]:
+    """
+    Return the phrases made of consecutive tokens, longest then rightmost
+    first, as lemma names ('_' for spaces)
+    """
+    phrases = []
+    for length in range(min(len(tokens), MAX_PHRASE_LENGTH), 0, -1):
+        for start in range(len(tokens) - length, -1, -1):
+            phrases.append("_".join(tokens[start : start + length]))
+    return list(dict.fromkeys(phrases))
+
+
+class PhraseResolver:
+    """
+    :param lookup_many: returns the hypernims of the given phrases, e.g.
+        ``lookup_many_hypernims`` over the lexicon
+    """
+
+    def __init__(self, lookup_many: BatchLookup):
+        self.lookup_many = lookup_many
+
+    def resolve_many(
+        self, items: Iterable[str], categories_of: Optional[CategoryMatch] = None
+    ) -> Dict[str, Optional[PhraseMatch]]:
+        """
+        Return the best matching phrase of each item, or None, looking up
+        all the candidate phrases in a single batch
+
+        :param categories_of: e.g. ``CategoryIndex.match``, to prefer the
+            phrases that have categories
+        """
+        candidates = {
+            item: candidate_phrases(phrase_tokens(item))
+            for item in dict.fromkeys(items)
+        }
+        found = self.lookup_many(
+            list(
+                dict.fromkeys(
+                    phrase for phrases in candidates.values() for phrase in phrases
+                )
+            )
+        )
+        matches: Dict[str, Optional[PhraseMatch]] = {}
+        for item, phrases in candidates.items():
+            nouns = [
+                PhraseMatch(phrase, found[phrase])
+                for phrase in phrases
+                if NOUN_ROOT in found.get(phrase, ())
+            ]
+            matches[item] = next(
+                (
+                    match
+                    for match in nouns
+                    if categories_of is not None and categories_of(match.hypernims)
+                ),
+                nouns[0] if nouns else None,
+            )
+        return matches
+
+    def resolve(
+        self, item: str, categories_of: Optional[CategoryMatch] = None
+    ) -> Optional[PhraseMatch]:
+        return self.resolve_many([item], categories_of)[item]
@@ -0,0 +1,124 @@
+"""
+Write a sorted checklist back to Trello, moving as few items as possible.
+
+Trello orders check items by their numeric ``pos``, so a new order only
+needs the items that are out of place to get new positions. The largest
+set of items that is already in order (the longest increasing subsequence
+of current positions, taken in the new order) keeps its positions, and
+every other item gets a position between its new neighbours.
+"""
+import asyncio
+from bisect import bisect_left
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from .trello_async import AsyncTrello
+
+# the spacing Trello itself uses between new items
+POSITION_GAP = 16384.0
+# closer positions than this lose precision, so everything is renumbered
+MIN_GAP = 1e-6
+
+
+def longest_increasing_subsequence(values: Sequence[float]) -> List[int]:
+    """
+    Return the indices of a longest strictly increasing subsequence of
+    values, in O(n log n)
+    """
+    # tails[k] is the index of the smallest tail of an increasing
+    # subsequence of length k + 1
+    tails: List[int] = []
+    tail_values: List[float] = []
+    previous: List[Optional[int]] = []
+    for i, value in enumerate(values):
+        k = bisect_left(tail_values, value)
+        previous.append(tails[k - 1] if k else None)
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    subsequence: List[int] = []
+    index = tails[-1] if tails else None
+    while index is not None:
+        subsequence.append(index)
+        index = previous[index]
+    return subsequence[::-1]
+
+
+def _between(
+    low: Optional[float], high: Optional[float], count: int
+) -> Optional[List[float]]:
+    """
+    Return ``count`` evenly spaced positions between low and high (open
+    ended when None), or None when they would be too close together
+    """
+    start = low if low is not None else 0.0
+    if high is None:
+        return [start + POSITION_GAP * (k + 1) for k in range(count)]
+    step = (high - start) / (count + 1)
+    if step < MIN_GAP:
+        return None
+    return [start + step * (k + 1) for k in range(count)]
+
+
+def plan_positions(
+    positions: Mapping[str, float], order: Sequence[str]
+) -> Dict[str, float]:
+    """
+    Return the new positions of the items that have to move for the items
+    to be in the given order. All other items keep their position.
+
+    :param positions: the current position of each item, by item id
+    :param order: the item ids in their new order
+    """
+    current = [float(positions[item_id]) for item_id in order]
+    kept = set(longest_increasing_subsequence(current))
+
+    updates: Dict[str, float] = {}
+    moved: List[str] = []
+    low: Optional[float] = None
+    # each run of moved items goes between the kept items around it
+    for i, item_id in enumerate(order):
+        if i not in kept:
+            moved.append(item_id)
+            continue
+        if moved:
+            new_positions = _between(low, current[i], len(moved))
+            if new_positions is None:
+                return renumber(order)
+            updates.update(zip(moved, new_positions))
+            moved = []
+        low = current[i]
+    if moved:
+        updates.update(zip(moved, _between(low, None, len(moved)) or []))
+    return updates
+
+
+def renumber(order: Sequence[str]) -> Dict[str, float]:
+    """
+    Return evenly spaced positions for every item, in the given order
+    """
+    return {
+        item_id: POSITION_GAP * (i + 1) for i, item_id in enumerate(order)
+    }
+
+
+async def apply_positions(
+    trello: AsyncTrello, card_id: str, updates: Mapping[str, float]
+) -> int:
+    """
+    Move the check items of a card to their new positions, concurrently
+    (within the client's request limit, retrying when rate limited).
+    Returns the number of requests made.
+    """
+    await asyncio.gather(
+        *(
+            trello.request(
+                "PUT", f"/cards/{card_id}/checkItem/{item_id}", pos=repr(pos)
+            )
+            for item_id, pos in updates.items()
+        )
+    )
+    return len(updates)
@@ -0,0 +1,183 @@
+"""
+Sort checklist items along a shop's route through its departments.
+
+A shop's route is either a fixed list of departments, or planned on its
+layout (see ``ShopLayout``) for the departments on the list. Each route is
+compiled once into a department to rank dict, and each item's department
+is looked up once (in the category store), however many shops the items
+are sorted for. Department names are compared by their canonical category
+name, so a route may use a synonym such as "vegetables". Items with no
+department, or one that is not on the route, go to a last, unknown bucket
+instead of failing.
+"""
+from copy import copy
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from mypy_extensions import TypedDict
+
+from .layout import RouteCache, ShopLayout
+
+CheckItem = TypedDict("CheckItem", {"id": str, "name": str, "pos": str})
+DepartmentLookup = Callable[[str], Optional[str]]
+RouteRanks = Dict[str, int]
+ShopRoute = Union[Sequence[str], ShopLayout]
+
+# departments are item categories, as in the category store
+SHOP_ROUTES = {"smart": ["bbq", "drink", "diy", "vegetable", "dairy"]}
+# the aisles of each shop, routes through them are planned per list
+SHOP_LAYOUTS = {shop: ShopLayout.linear(route) for shop, route in SHOP_ROUTES.items()}
+
+
+def compile_route(route: Sequence[str]) -> RouteRanks:
+    """
+    Return the rank of each department on the route, the first visit wins
+    """
+    ranks: RouteRanks = {}
+    for rank, department in enumerate(route):
+        ranks.setdefault(department, rank)
+    return ranks
+
+
+def renumbered(items: Iterable[CheckItem]) -> List[CheckItem]:
+    """
+    Return copies of the items with positions reset to 1, 2, 3...
+
+    Only the item dicts are copied, not any nested payload.
+    """
+    result = []
+    for position, item in enumerate(items, 1):
+        item = copy(item)
+        item["pos"] = str(position)
+        result.append(item)
+    return result
+
+
+class RouteSorter:
+    """
+    Sorts checklists by the compiled routes of many shops.
+
+    :param routes: the ordered departments, or the layout, of each shop
+    :param department_of: returns the department (category) of an item
+        name, or None when it is unknown
+    :param route_cache: where routes planned on the layouts are cached,
+        an in-memory cache by default
+    :param synonyms: the canonical category of department names that
+        are synonyms, in the routes, the layouts or of the items
+    """
+
+    def __init__(
+        self,
+        routes: Mapping[str, ShopRoute],
+        department_of: DepartmentLookup,
+        route_cache: Optional[RouteCache] = None,
+        synonyms: Optional[Mapping[str, str]] = None,
+    ):
+        self.synonyms = synonyms or {}
+        self.routes: Dict[str, RouteRanks] = {}
+        layouts: Dict[str, ShopLayout] = {}
+        # the layout node of each canonical department name
+        self.nodes: Dict[str, Dict[str, str]] = {}
+        for shop, route in routes.items():
+            if isinstance(route, ShopLayout):
+                layouts[shop] = route
+                self.nodes[shop] = {
+                    self.canonical(node): node for node in route.graph
+                }
+            else:
+                self.routes[shop] = compile_route(
+                    [self.canonical(department) for department in route]
+                )
+        self.department_of = department_of
+        self.route_cache = route_cache or RouteCache(layouts)
+        self.layouts = layouts
+
+    @property
+    def shops(self) -> List[str]:
+        return [*self.routes, *self.layouts]
+
+    def canonical(self, department: str) -> str:
+        return self.synonyms.get(department, department)
+
+    def route_ranks(
+        self, shop: str, departments: Iterable[Optional[str]]
+    ) -> RouteRanks:
+        """
+        Return the compiled route of a shop, planned on its layout for the
+        given departments when it has one
+        """
+        if shop in self.layouts:
+            nodes = self.nodes[shop]
+            route = self.route_cache.route(
+                shop, (nodes.get(d, d) for d in departments if d)
+            )
+            return compile_route([self.canonical(node) for node in route])
+        return self.routes[shop]
+
+    def departments(self, checklist: Sequence[CheckItem]) -> List[Optional[str]]:
+        """
+        Return the department of each item, looking up each name once
+        """
+        known: Dict[str, Optional[str]] = {}
+        departments = []
+        for item in checklist:
+            name = item["name"]
+            if name not in known:
+                department = self.department_of(name)
+                known[name] = department and self.canonical(department)
+            departments.append(known[name])
+        return departments
+
+    def sort(
+        self,
+        checklist: Sequence[CheckItem],
+        ranks: RouteRanks,
+        departments: Optional[List[Optional[str]]] = None,
+    ) -> List[CheckItem]:
+        """
+        Return the items sorted by the rank of their department, then by
+        name, with new positions. The checklist itself is left unchanged.
+        """
+        if departments is None:
+            departments = self.departments(checklist)
+        unknown = len(ranks)
+        keys = [
+            (
+                ranks.get(department, unknown) if department else unknown,
+                item["name"].lower(),
+            )
+            for item, department in zip(checklist, departments)
+        ]
+        order = sorted(range(len(checklist)), key=keys.__getitem__)
+        return renumbered(checklist[i] for i in order)
+
+    def sort_for_shop(
+        self, checklist: Sequence[CheckItem], shop: str
+    ) -> List[CheckItem]:
+        departments = self.departments(checklist)
+        ranks = self.route_ranks(shop, departments)
+        return self.sort(checklist, ranks, departments)
+
+    def sort_for_shops(
+        self, checklist: Sequence[CheckItem], shops: Optional[Iterable[str]] = None
+    ) -> Dict[str, List[CheckItem]]:
+        """
+        Return the checklist sorted for each shop (all shops by default),
+        looking up the item departments only once
+        """
+        departments = self.departments(checklist)
+        present = set(departments)
+        return {
+            shop: self.sort(
+                checklist, self.route_ranks(shop, present), departments
+            )
+            for shop in (self.shops if shops is None else shops)
+        }
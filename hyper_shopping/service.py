@@ -0,0 +1,237 @@
+"""
+A long-running categorization service, over a Unix socket.
+
+Starting the CLI pays for its imports, the store, the spelling index and
+WordNet (or the lexicon) every time; the service pays once and keeps all
+of them, and the resolver's cache, warm. Requests are JSON lines (see
+``client.ServiceClient``), and the items of concurrent requests are
+micro-batched: whatever arrives within ``max_delay`` of the first request
+is categorized together, with each distinct item looked up only once.
+
+Batches run one at a time in a thread of their own, so that the event
+loop keeps accepting requests meanwhile. The store and its SQLite
+connections belong to the thread that opened them, so they're best opened
+in that thread too (see ``CategorizationService.executor``). Sorting only
+looks the items up, without saving their categories or queueing them for
+review.
+"""
+import asyncio
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .batch import Result
+from .routing import CheckItem, RouteSorter
+
+# categorizes a batch of items, returning one result per item, in order
+BatchCategorizer = Callable[[List[str]], List[Result]]
+
+# the longest request line accepted, in bytes
+MAX_REQUEST = 2 ** 24
+
+
+class AlreadyServing(Exception):
+    """
+    Another service answers on the socket
+    """
+
+
+class MicroBatcher:
+    """
+    Coalesces the items of concurrent requests into single batches.
+
+    :param max_delay: the seconds the first request of a batch waits for
+        others to join it
+    :param max_batch: the number of items a batch is processed at, without
+        waiting any longer
+    :param executor: where batches are processed, a single thread of their
+        own by default
+    """
+
+    def __init__(
+        self,
+        process: BatchCategorizer,
+        max_delay: float = 0.002,
+        max_batch: int = 1000,
+        executor: Optional[Executor] = None,
+    ):
+        self.process = process
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.pending: List[Tuple[List[str], asyncio.Future]] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.requests = 0
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, items: List[str]) -> List[Result]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((items, future))
+        self.size += len(items)
+        self.requests += 1
+        if self.size >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        """
+        Process the pending items in one batch, in the executor, and answer
+        their requests once it's done
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending, self.size = self.pending, [], 0
+        if not pending:
+            return
+        items = [item for batch, _ in pending for item in batch]
+        self.batches += 1
+        self.items += len(items)
+        processed = asyncio.get_running_loop().run_in_executor(
+            self.executor, self.process, items
+        )
+        processed.add_done_callback(partial(self.answer, pending))
+
+    @staticmethod
+    def answer(
+        pending: List[Tuple[List[str], asyncio.Future]], processed: asyncio.Future
+    ):
+        if processed.cancelled():
+            for _, future in pending:
+                future.cancel()
+            return
+        error = processed.exception()
+        if error is not None:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        results = processed.result()
+        start = 0
+        for batch, future in pending:
+            if not future.done():
+                future.set_result(results[start : start + len(batch)])
+            start += len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "items": self.items,
+        }
+
+
+class CategorizationService:
+    """
+    Serves ``categorize``, ``sort``, ``stats`` and ``ping`` requests.
+
+    :param categorize: categorizes a batch of items, e.g. with
+        ``categorize_batch``
+    :param lookup: categorizes a batch of items like ``categorize``, but
+        without saving or queueing anything, to sort them
+    :param sorter: sorts check items by shop route, using the departments
+        the items were categorized in
+    :param executor: where both kinds of batches are processed, one at a
+        time in a thread of their own by default
+    """
+
+    def __init__(
+        self,
+        categorize: BatchCategorizer,
+        lookup: BatchCategorizer,
+        sorter: RouteSorter,
+        max_delay: float = 0.002,
+        max_batch: int = 1000,
+        executor: Optional[Executor] = None,
+    ):
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.batcher = MicroBatcher(categorize, max_delay, max_batch, self.executor)
+        self.lookups = MicroBatcher(lookup, max_delay, max_batch, self.executor)
+        self.sorter = sorter
+
+    async def categorize(self, items: List[str]) -> List[Result]:
+        return await self.batcher.submit(items)
+
+    async def sort(self, checklist: List[CheckItem], shop: str) -> List[CheckItem]:
+        if shop not in self.sorter.shops:
+            raise ValueError(f"Unknown shop {shop!r}")
+        results = await self.lookups.submit([item["name"] for item in checklist])
+        departments = [result["category"] for result in results]
+        ranks = self.sorter.route_ranks(shop, departments)
+        return self.sorter.sort(checklist, ranks, departments)
+
+    async def handle(self, request: Dict[str, Any]) -> Any:
+        op = request.get("op")
+        if op == "categorize":
+            return await self.categorize([str(item) for item in request["items"]])
+        if op == "sort":
+            return await self.sort(request["items"], request["shop"])
+        if op == "stats":
+            categorized, looked_up = self.batcher.stats(), self.lookups.stats()
+            return {name: categorized[name] + looked_up[name] for name in categorized}
+        if op == "ping":
+            return "pong"
+        raise ValueError(f"Unknown operation {op!r}")
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """
+        Answer the requests of a connection, one per line, until it closes
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = {"result": await self.handle(json.loads(line))}
+                except Exception as error:  # answered, the service goes on
+                    response = {"error": f"{type(error).__name__}: {error}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, path: Path) -> asyncio.AbstractServer:
+        """
+        Listen on the socket, unless another service answers on it
+
+        :raises AlreadyServing: when a service answers on the socket
+        """
+        path = Path(path)
+        if path.exists():
+            try:
+                _, writer = await asyncio.open_unix_connection(str(path))
+            except OSError:
+                path.unlink()  # left by a service that didn't shut down
+            else:
+                writer.close()
+                raise AlreadyServing(f"A service is already running on {path}")
+        return await asyncio.start_unix_server(
+            self.handle_connection, str(path), limit=MAX_REQUEST
+        )
+
+    async def serve(self, path: Path, ready: Optional[Callable[[], None]] = None):
+        """
+        Serve on the socket until cancelled
+
+        :param ready: called once the socket is listening
+        """
+        server = await self.start(path)
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            Path(path).unlink(missing_ok=True)
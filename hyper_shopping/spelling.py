@@ -0,0 +1,212 @@
+"""
+A precompiled spelling-candidate index, using symmetric deletes.
+
+Instead of generating every edit of a misspelled word at lookup time, each
+dictionary word is stored under all the variants made by deleting up to
+``max_distance`` characters (of its first ``prefix_length`` characters).
+A lookup only generates the deletes of the query itself, and verifies the
+words found under them with a bounded edit distance.
+"""
+import pickle
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set
+
+VERSION = 1
+
+
+class Suggestion(NamedTuple):
+    word: str
+    distance: int
+    frequency: int
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int:
+    """
+    Return the optimal string alignment distance (Levenshtein, plus
+    transpositions) between two words, or ``max_distance + 1`` as soon as
+    it is known to be larger than ``max_distance``.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    previous_previous: List[int] = []
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        for j, target_char in enumerate(target, 1):
+            cost = source_char != target_char
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if (
+                i > 1
+                and j > 1
+                and source_char == target[j - 2]
+                and source[i - 2] == target_char
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """
+    Return all variants of word with up to ``max_distance`` deleted chars
+    """
+    variants = {word}
+    edge = {word}
+    for _ in range(max_distance):
+        edge = {
+            variant[:i] + variant[i + 1 :]
+            for variant in edge
+            for i in range(len(variant))
+        }
+        variants |= edge
+    return variants
+
+
+class SpellingIndex:
+    """
+    Word frequencies, with the symmetric delete variants of every word.
+
+    :param max_distance: the largest edit distance candidates can have
+    :param prefix_length: only this many leading characters of each word
+        are indexed, which bounds the index size for long words
+    """
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words: Dict[str, int] = {}
+        # delete variant to the space separated words it was made from,
+        # strings (un)pickle much faster than a million lists
+        self.deletes: Dict[str, str] = {}
+
+    @classmethod
+    def build(
+        cls, frequencies: Mapping[str, int], **kwargs
+    ) -> "SpellingIndex":
+        index = cls(**kwargs)
+        variants: Dict[str, List[str]] = {}
+        for word, frequency in frequencies.items():
+            word = word.lower()
+            if word in index.words:
+                index.words[word] += frequency
+                continue
+            index.words[word] = frequency
+            for variant in index._variants(word):
+                variants.setdefault(variant, []).append(word)
+        index.deletes = {
+            variant: " ".join(words) for variant, words in variants.items()
+        }
+        return index
+
+    def _variants(self, word: str) -> Set[str]:
+        return deletes(word[: self.prefix_length], self.max_distance)
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and word.lower() in self.words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add_word(self, word: str, frequency: int = 1):
+        """
+        Add a (single) word, or increase the frequency of a known one
+        """
+        word = word.lower()
+        if word in self.words:
+            self.words[word] += frequency
+            return
+        self.words[word] = frequency
+        for variant in self._variants(word):
+            words = self.deletes.get(variant)
+            self.deletes[variant] = f"{words} {word}" if words else word
+
+    def add_words(self, words: Iterable[str]):
+        for word in words:
+            self.add_word(word)
+
+    def lookup(
+        self, word: str, max_distance: Optional[int] = None, top_k: int = 5
+    ) -> List[Suggestion]:
+        """
+        Return up to ``top_k`` of the closest known words within
+        ``max_distance`` edits of word, most frequent first.
+
+        Every word within ``d`` edits shares a delete variant of depth ``d``
+        or less with the query, so deeper variants are only searched until
+        a word within that many edits is found.
+        """
+        word = word.lower()
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        seen: Set[str] = set()
+        suggestions: List[Suggestion] = []
+        variants = {word[: self.prefix_length]}
+        for depth in range(max_distance + 1):
+            if depth:
+                variants = {
+                    variant[:i] + variant[i + 1 :]
+                    for variant in variants
+                    for i in range(len(variant))
+                }
+            for variant in variants:
+                for candidate in self.deletes.get(variant, "").split():
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = edit_distance(word, candidate, max_distance)
+                    if distance <= max_distance:
+                        suggestions.append(
+                            Suggestion(candidate, distance, self.words[candidate])
+                        )
+            closest = [s for s in suggestions if s.distance <= depth]
+            if closest:
+                break
+        else:
+            closest = suggestions
+        closest.sort(key=lambda s: (s.distance, -s.frequency, s.word))
+        return closest[:top_k]
+
+    def candidates(self, word: str, **kwargs) -> List[str]:
+        return [suggestion.word for suggestion in self.lookup(word, **kwargs)]
+
+    def correct_phrase(self, phrase: str) -> str:
+        """
+        Replace each word of the phrase with its best candidate, if any
+        """
+        corrected = []
+        for word in phrase.split():
+            suggestions = self.lookup(word, top_k=1)
+            corrected.append(suggestions[0].word if suggestions else word)
+        return " ".join(corrected)
+
+    def save(self, path: Path):
+        with open(path, "wb") as file:
+            pickle.dump(
+                (
+                    VERSION,
+                    self.max_distance,
+                    self.prefix_length,
+                    self.words,
+                    self.deletes,
+                ),
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "SpellingIndex":
+        with open(path, "rb") as file:
+            version, max_distance, prefix_length, words, variants = pickle.load(
+                file
+            )
+        if version != VERSION:
+            raise ValueError(f"'{path}' is not a spelling index file")
+        index = cls(max_distance, prefix_length)
+        index.words = words
+        index.deletes = variants
+        return index
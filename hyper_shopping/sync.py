@@ -0,0 +1,131 @@
+"""
+Incremental Trello sync, against a local cache of shopping cards.
+
+The cache keeps, per card id, the card's last seen ``dateLastActivity``
+and its check items. A sync lists the cards without their checklists,
+fetches checklists only for cards whose activity date moved, and diffs
+their items against the cache, so only new or renamed items need to be
+categorized again. The cache is only updated (``CardCache.record``) once
+those items are categorized, so a failed run syncs them again.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from mypy_extensions import TypedDict
+
+from .trello_async import AsyncTrello
+
+CachedCard = TypedDict(
+    "CachedCard",
+    # check item ids to names
+    {"dateLastActivity": str, "items": Dict[str, str]},
+)
+CardDiff = TypedDict(
+    "CardDiff",
+    {
+        "card": str,
+        "added": List[str],
+        "renamed": List[str],
+        "removed": List[str],
+        # the card's new state, to cache
+        "dateLastActivity": str,
+        "items": Dict[str, str],
+    },
+)
+
+
+def checklist_items(checklists: Iterable[Mapping]) -> Dict[str, str]:
+    """
+    Return the check item names of all checklists, by check item id
+    """
+    return {
+        check_item["id"]: check_item["name"]
+        for checklist in checklists
+        for check_item in checklist["checkItems"]
+    }
+
+
+def diff_items(
+    card: Mapping, old: Mapping[str, str], new: Dict[str, str]
+) -> CardDiff:
+    """
+    Compare two snapshots of a card's check items, returning the names of
+    added and renamed items (by their new name) and of removed ones.
+    """
+    return CardDiff(
+        card=card["id"],
+        added=[name for id_, name in new.items() if id_ not in old],
+        renamed=[
+            name for id_, name in new.items() if id_ in old and old[id_] != name
+        ],
+        removed=[name for id_, name in old.items() if id_ not in new],
+        dateLastActivity=card["dateLastActivity"],
+        items=new,
+    )
+
+
+class CardCache:
+    """
+    The last seen state of each card, in a shelf keyed by card id.
+    """
+
+    def __init__(self, shelf):
+        self.data = shelf
+
+    def get(self, card_id: str) -> Optional[CachedCard]:
+        return self.data.get(card_id)
+
+    def is_stale(self, card: Mapping) -> bool:
+        cached = self.get(card["id"])
+        return cached is None or (
+            cached["dateLastActivity"] != card["dateLastActivity"]
+        )
+
+    def record(self, diffs: Iterable[CardDiff]):
+        """
+        Cache the new state of the synced cards, once their changes were
+        handled
+        """
+        for diff in diffs:
+            self.data[diff["card"]] = CachedCard(
+                dateLastActivity=diff["dateLastActivity"], items=diff["items"]
+            )
+
+    def close(self):
+        self.data.close()
+
+
+async def sync_cards(
+    trello: AsyncTrello,
+    cache: CardCache,
+    board_names: Iterable[str] = ("Our Board",),
+) -> List[CardDiff]:
+    """
+    Fetch the checklists of the shopping cards changed since the last
+    sync, and return the changes of each such card. The cache isn't
+    updated, ``record`` the diffs once their items are categorized.
+    """
+    cards = await trello.get_shopping_cards(board_names, checklists="none")
+    changed = [card for card in cards if cache.is_stale(card)]
+    if not changed:
+        return []
+    checklists = await trello.card_checklists(card["id"] for card in changed)
+
+    diffs = []
+    for card in changed:
+        items = checklist_items(checklists[card["id"]])
+        cached = cache.get(card["id"])
+        old_items = cached["items"] if cached else {}
+        diffs.append(diff_items(card, old_items, items))
+    return diffs
+
+
+def changed_items(diffs: Iterable[CardDiff]) -> List[str]:
+    """
+    Return the distinct added or renamed item names, which are the only
+    ones to categorize after a sync
+    """
+    return list(
+        dict.fromkeys(
+            name for diff in diffs for name in diff["added"] + diff["renamed"]
+        )
+    )
@@ -0,0 +1,306 @@
+import pytest
+
+from .batch import (
+    CATALOG,
+    EMBEDDING,
+    FUZZY,
+    HYPERNIMS,
+    STORED,
+    UNRESOLVED,
+    ReviewQueue,
+    categorize_batch,
+    read_items,
+)
+from .catalog import Catalog
+from .categorize import CategoryResolver
+from .datastore import Storage
+from .hypernyms import lookup_hypernims
+from .lexicon import Lexicon, write_lexicon
+from .parallel import categorize_parallel
+from .trigrams import TrigramIndex
+
+HYPERNIMS_INDEX = {
+    "tomatoes": ["entity", "food", "vegetable", "tomato"],
+    "milk": ["entity", "food", "dairy_product", "milk"],
+    "sour_cream": ["entity", "food", "dairy_product", "cream", "sour_cream"],
+    "pizza": ["entity", "food", "baked_goods", "meat", "pizza"],
+}
+
+
+@pytest.fixture
+def storage():
+    return Storage({})
+
+
+@pytest.fixture
+def lookups():
+    return []
+
+
+@pytest.fixture
+def hypernims_of(lookups):
+    def lookup(word):
+        lookups.append(word)
+        return HYPERNIMS_INDEX.get(word, [])
+
+    return lookup
+
+
+@pytest.fixture
+def resolver(storage, hypernims_of):
+    return CategoryResolver(storage, hypernims_of)
+
+
+def test_read_items():
+    assert list(read_items(["Milk\n", "\n", "  Eggs  \n"])) == ["Milk", "Eggs"]
+
+
+def test_categorize_batch(storage, resolver, lookups, tmp_path):
+    storage.set_item_category("Eggs", "dairy")
+    queue = ReviewQueue(tmp_path / "review.jsonl")
+    items = ["Tomatoes", "Eggs", "Milk", "Pizza", "Tomatoes", "pastizzi"]
+
+    results = list(categorize_batch(items, resolver, queue))
+
+    assert [r["item"] for r in results] == items
+    assert [(r["category"], r["source"]) for r in results] == [
+        ("vegetable", HYPERNIMS),
+        ("dairy", STORED),
+        ("dairy", HYPERNIMS),
+        (None, UNRESOLVED),
+        ("vegetable", HYPERNIMS),
+        (None, UNRESOLVED),
+    ]
+    # each distinct item is only looked up once per chunk
+    assert lookups == ["tomatoes", "milk", "pizza", "pastizzi"]
+    assert storage.get_item_category("Tomatoes") == "vegetable"
+    assert storage.get_item_category("Pizza") is None
+
+    deferred = queue.read()
+    assert [r["item"] for r in deferred] == ["Pizza", "pastizzi"]
+    assert deferred[0]["candidates"] == ["baked_goods", "meat"]
+
+
+def test_categorize_batch_classifies_unmatched(tmp_path, storage, resolver):
+    classified = []
+
+    def classify(items):
+        classified.append(items)
+        return ["snacks" if item == "pastizzi" else None for item in items]
+
+    queue = ReviewQueue(tmp_path / "review.jsonl")
+    items = ["Pizza", "pastizzi", "gogosari", "Milk"]
+    results = list(categorize_batch(items, resolver, queue, classify=classify))
+
+    # only items without any candidate, all in one call
+    assert classified == [["pastizzi", "gogosari"]]
+    assert [(r["category"], r["source"]) for r in results] == [
+        (None, UNRESOLVED),
+        ("snacks", EMBEDDING),
+        (None, UNRESOLVED),
+        ("dairy", HYPERNIMS),
+    ]
+    # guesses aren't saved, but reviewed with the guess as the candidate
+    assert storage.get_item_category("pastizzi") is None
+    deferred = {r["item"]: r["candidates"] for r in queue.read()}
+    assert deferred["pastizzi"] == ["snacks"]
+
+
+def test_categorize_batch_lookup(storage, resolver, tmp_path):
+    queue = ReviewQueue(tmp_path / "review.jsonl")
+    items = ["Milk", "Pizza"]
+    results = list(categorize_batch(items, resolver, queue, record=False))
+    assert [r["source"] for r in results] == [HYPERNIMS, UNRESOLVED]
+    assert storage.get_item_categories() == {}
+    assert queue.read() == []
+
+
+def test_categorize_batch_in_chunks(resolver, lookups):
+    items = ["Milk", "Tomatoes", "Milk", "MILK *3", "milk"]
+    results = list(categorize_batch(items, resolver, chunk_size=2))
+    assert [r["source"] for r in results] == [
+        HYPERNIMS,
+        HYPERNIMS,
+        STORED,
+        HYPERNIMS,
+        HYPERNIMS,
+    ]
+    assert [r["category"] for r in results] == ["dairy", "vegetable"] + [
+        "dairy"
+    ] * 3
+    # variants of stored items are resolved from the cache
+    assert lookups == ["milk", "tomatoes"]
+    assert resolver.stats()["hits"] == 2
+
+
+def test_review_queue_clear(tmp_path):
+    queue = ReviewQueue(tmp_path / "review.jsonl")
+    assert queue.read() == []
+    queue.add(dict(item="Pizza", category=None, source=UNRESOLVED, candidates=[]))
+    assert len(queue.read()) == 1
+    queue.clear()
+    assert queue.read() == []
+
+
+def test_review_queue_replace(tmp_path):
+    queue = ReviewQueue(tmp_path / "review.jsonl")
+    for item in ["Pizza", "pastizzi"]:
+        queue.add(dict(item=item, category=None, source=UNRESOLVED, candidates=[]))
+    queue.replace(queue.read()[1:])
+    assert [result["item"] for result in queue.read()] == ["pastizzi"]
+    queue.replace([])
+    assert not queue.path.exists()
+
+
+def test_categorize_parallel_matches_serial(tmp_path):
+    index = {
+        "tomato": ["entity", "food", "vegetable", "tomato"],
+        "milk": ["entity", "food", "dairy_product", "milk"],
+        "pizza": ["entity", "food", "baked_goods", "meat", "pizza"],
+    }
+    lexicon_path = tmp_path / "hypernyms.idx"
+    write_lexicon(index, lexicon_path)
+    items = ["Tomatoes", "Milk", "Pizza", "pastizzi", "Milk", "milk", "Eggs"]
+
+    serial_storage = Storage({})
+    serial_storage.set_item_category("Eggs", "dairy")
+    with Lexicon(lexicon_path) as lexicon:
+        resolver = CategoryResolver(
+            serial_storage, lambda word: lookup_hypernims(lexicon, word)
+        )
+        serial = list(categorize_batch(items, resolver))
+
+    storage = Storage({})
+    storage.set_item_category("Eggs", "dairy")
+    results = categorize_parallel(
+        items, storage, lexicon_path, workers=2, chunk_size=1
+    )
+
+    assert results == serial
+    assert storage.get_item_categories() == serial_storage.get_item_categories()
+
+
+def test_categorize_batch_with_catalog(storage, resolver, lookups, tmp_path):
+    storage.add_category_synonym("fruit_veg", "vegetable")
+    catalog = Catalog(tmp_path / "catalog.sqlite")
+    catalog.add_products(
+        [
+            {
+                "product_id": str(product_id),
+                "name": name,
+                "department": department,
+                "aisle": None,
+                "url": None,
+            }
+            for product_id, (name, department) in enumerate(
+                [
+                    ("Kinnie 1.5L", "Drink"),
+                    ("Cherry Tomatoes", "Fruit & Veg"),
+                    ("Sour Cream", "Chilled"),
+                ]
+            )
+        ]
+    )
+    items = ["Kinnie", "Cherry tomatoes", "Sour cream", "Milk"]
+    results = list(categorize_batch(items, resolver, catalog=catalog))
+    catalog.close()
+
+    assert [(r["category"], r["source"], r["department"]) for r in results] == [
+        ("drink", CATALOG, "Drink"),
+        ("vegetable", CATALOG, "Fruit & Veg"),
+        # a department that isn't a category, the item is looked up instead
+        ("dairy", HYPERNIMS, "Chilled"),
+        ("dairy", HYPERNIMS, None),
+    ]
+    # only WordNet is asked for the items (and departments) with no category
+    assert lookups == ["chilled", "sour_cream", "milk"]
+    # departments, and the categories they map to, aren't stored
+    assert storage.get_item_category("Kinnie") is None
+    assert storage.get_item_category("Cherry tomatoes") is None
+    assert "Fruit & Veg" not in storage.get_known_categories()
+
+
+def test_categorize_batch_fuzzy(storage, resolver):
+    index = TrigramIndex.build({"Pop-Tarts": "breakfast", "Eggs": "dairy"})
+    classify_calls = []
+
+    def classify(items):
+        classify_calls.append(items)
+        return [None] * len(items)
+
+    items = ["Pop tards", "Milk", "pastizzi"]
+    results = list(
+        categorize_batch(items, resolver, classify=classify, fuzzy=index.classify)
+    )
+    assert [(r["category"], r["source"]) for r in results] == [
+        ("breakfast", FUZZY),
+        ("dairy", HYPERNIMS),
+        (None, UNRESOLVED),
+    ]
+    # the classifier only gets what fuzzy matching left
+    assert classify_calls == [["pastizzi"]]
+    assert storage.get_item_category("Pop tards") is None
+    assert results[0]["candidates"] == ["breakfast"]
+
+
+def test_categorize_parallel_matches_serial_fallbacks(tmp_path):
+    index = {
+        "milk": ["entity", "food", "dairy_product", "milk"],
+        "pizza": ["entity", "food", "baked_goods", "meat", "pizza"],
+        "drink": ["entity", "food", "drink"],
+    }
+    lexicon_path = tmp_path / "hypernyms.idx"
+    write_lexicon(index, lexicon_path)
+    catalog = Catalog(tmp_path / "catalog.sqlite")
+    catalog.add_products(
+        [
+            {
+                "product_id": "1",
+                "name": "Kinnie 1.5L",
+                "department": "Drink",
+                "aisle": None,
+                "url": None,
+            }
+        ]
+    )
+    trigrams = TrigramIndex.build({"Pop-Tarts": "breakfast"})
+
+    def classify(items):
+        return ["snacks" if item == "pastizzi" else None for item in items]
+
+    items = ["Kinnie", "Pop tards", "pastizzi", "Milk", "Pizza", "Eggs", "milk"]
+    fallbacks = dict(classify=classify, catalog=catalog, fuzzy=trigrams.classify)
+
+    serial_storage = Storage({})
+    serial_storage.set_item_category("Eggs", "dairy")
+    serial_queue = ReviewQueue(tmp_path / "serial.jsonl")
+    with Lexicon(lexicon_path) as lexicon:
+        resolver = CategoryResolver(
+            serial_storage, lambda word: lookup_hypernims(lexicon, word)
+        )
+        serial = list(
+            categorize_batch(
+                items, resolver, serial_queue, chunk_size=2, **fallbacks
+            )
+        )
+
+    storage = Storage({})
+    storage.set_item_category("Eggs", "dairy")
+    queue = ReviewQueue(tmp_path / "parallel.jsonl")
+    results = categorize_parallel(
+        items, storage, lexicon_path, queue, workers=2, chunk_size=1, **fallbacks
+    )
+    catalog.close()
+
+    assert [r["source"] for r in serial] == [
+        CATALOG,
+        FUZZY,
+        EMBEDDING,
+        HYPERNIMS,
+        UNRESOLVED,
+        STORED,
+        HYPERNIMS,
+    ]
+    assert results == serial
+    assert storage.get_item_categories() == serial_storage.get_item_categories()
+    assert queue.read() == serial_queue.read()
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from .bench import (
+    card_item_names,
+    find_regressions,
+    pipeline_benchmarks,
+    seeded_index,
+    run_benchmarks,
+    synthetic_items,
+)
+
+BASE_ITEMS = ["Milk", "Tomatoes", "Sour cream"]
+
+
+def test_synthetic_items_are_deterministic():
+    items = synthetic_items(BASE_ITEMS, 50)
+    assert len(set(items)) == 50
+    assert items == synthetic_items(BASE_ITEMS, 50)
+    assert items != synthetic_items(BASE_ITEMS, 50, seed=1)
+
+
+def test_synthetic_items_outnumbering_variations_are_distinct():
+    items = synthetic_items(BASE_ITEMS, 1000)
+    assert len(set(items)) == 1000
+
+
+def test_seeded_index():
+    hypernims = [[f"name{i}", f"other{i}"] for i in range(100)]
+    index = seeded_index(hypernims)
+    matched = [found for found in hypernims if index.match(found)]
+    assert 0 < len(matched) < len(hypernims)
+    assert seeded_index(hypernims).match(matched[0]) == index.match(matched[0])
+
+
+def test_card_item_names():
+    names = card_item_names(Path(__file__).parent.parent / "shopping.json")
+    assert "Milk" in names
+
+
+def test_run_benchmarks():
+    report = run_benchmarks(BASE_ITEMS, [10], lambda key: [key], repeat=1)
+    assert set(report["results"]) == {
+        "normalize_word[10]",
+        "get_hypernims[10]",
+        "get_valid_categories[10]",
+        "storage_shelve[10]",
+        "storage_sqlite[10]",
+    }
+    assert report["results"]["normalize_word[10]"]["size"] == 10
+
+
+def test_sort_checklist_benchmark_uses_route():
+    sorts = []
+
+    def sort_checklist(checklist, route, department_of):
+        sorts.append({department_of(item["name"]) for item in checklist})
+
+    route = ["vegetable", "dairy"]
+    benchmarks = pipeline_benchmarks(
+        BASE_ITEMS, lambda key: [key], sort_checklist=sort_checklist, route=route
+    )
+    benchmarks["sort_checklist"]()
+    assert sorts == [set(route)]
+
+
+def test_find_regressions():
+    def report(**timings):
+        return {"results": {name: {"best": best} for name, best in timings.items()}}
+
+    baseline = report(fast=1.0, slow=1.0, gone=1.0)
+    current = report(fast=1.05, slow=1.5, new=3.0)
+    regressions = find_regressions(baseline, current, threshold=0.1)
+    assert [r["name"] for r in regressions] == ["slow"]
+    assert regressions[0]["ratio"] == 1.5
@@ -0,0 +1,31 @@
+from .bloom import BloomFilter, filter_size
+
+
+def test_filter_size():
+    bits, hashes = filter_size(1000, 0.01)
+    assert 9000 < bits < 10000
+    assert hashes == 7
+
+
+def test_bloom_filter(tmp_path):
+    path = tmp_path / "seen"
+    seen = BloomFilter(path, capacity=1000, error_rate=0.001)
+    assert seen.add("104233")
+    assert not seen.add("104233")
+    assert "104233" in seen
+    assert "104234" not in seen
+    keys = [str(key) for key in range(1000)]
+    for key in keys:
+        seen.add(key)
+    assert all(key in seen for key in keys)
+    false_positives = sum(str(key) in seen for key in range(1000, 11000))
+    assert false_positives < 50
+    seen.close()
+
+    # reopened with the same sizing, the keys are still there
+    seen = BloomFilter(path, capacity=1000, error_rate=0.001)
+    assert "104233" in seen
+    seen.close()
+    seen = BloomFilter(path, capacity=2000, error_rate=0.001)
+    assert "104233" not in seen
+    seen.close()
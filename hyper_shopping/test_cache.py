@@ -0,0 +1,43 @@
+from .cache import LRUCache
+from .categorize import CategoryResolver
+from .datastore import Storage
+
+
+def test_lru_cache_evicts_least_recently_used():
+    evicted = []
+    cache = LRUCache(2, on_evict=lambda key, value: evicted.append(key))
+    cache.put("milk", 1)
+    cache.put("eggs", 2)
+    assert cache.get("milk") == 1
+    cache.put("bread", 3)
+
+    assert evicted == ["eggs"]
+    assert "eggs" not in cache
+    assert cache.get("eggs") is None
+    assert cache.stats() == dict(
+        hits=1, misses=1, evictions=1, size=2, maxsize=2
+    )
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(0)
+    cache.put("milk", 1)
+    assert len(cache) == 0
+
+
+def test_resolver_cache_is_dropped_on_new_synonyms():
+    lookups = []
+
+    def hypernims_of(key):
+        lookups.append(key)
+        return ["food", "cheese"]
+
+    storage = Storage({})
+    resolver = CategoryResolver(storage, hypernims_of)
+    assert resolver.resolve("Parmesan").categories == []
+    assert resolver.resolve("parmesan").categories == []
+    assert lookups == ["parmesan"]
+
+    storage.add_category_synonym("cheese", "dairy")
+    assert resolver.resolve("Parmesan").categories == ["dairy"]
+    assert lookups == ["parmesan", "parmesan"]
@@ -0,0 +1,155 @@
+from pathlib import Path
+
+import pytest
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from scrapers.scrapers.pipelines import ScrapersPipeline
+from scrapers.scrapers.spiders.greens import GreensSpider
+
+from .catalog import Catalog, Product
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def product(product_id, name, department, aisle=None):
+    return Product(
+        product_id=product_id, name=name, department=department, aisle=aisle, url=None
+    )
+
+
+def fixture_response(name, url):
+    body = (FIXTURES / name).read_bytes()
+    return HtmlResponse(url, body=body, encoding="utf-8", request=Request(url))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.sqlite")
+    catalog.add_products(
+        [
+            product("1", "Kinnie 1.5L", "Drinks", "Soft Drinks"),
+            product("2", "Fresh Milk", "Dairy"),
+            product("3", "Milk Chocolate Bar", "Confectionery"),
+            product("4", "Sour Cream", "Dairy"),
+        ]
+    )
+    yield catalog
+    catalog.close()
+
+
+def test_search(catalog):
+    assert [found["name"] for found in catalog.search("milk")] == [
+        "Fresh Milk",
+        "Milk Chocolate Bar",
+    ]
+    # operators are searched for as words
+    assert catalog.search("milk NOT") == []
+    assert catalog.search("") == []
+
+
+def test_departments(catalog):
+    items = ["sour cream", "Kinnie", "FRESH MILK *2", "pastizzi"]
+    assert catalog.departments(items) == {
+        "sour cream": "Dairy",
+        "Kinnie": "Drinks",
+        "FRESH MILK *2": "Dairy",
+    }
+    assert catalog.department_of("pastizzi") is None
+    # only the product itself, not the products with the same words
+    assert catalog.department_of("milk") is None
+    assert catalog.department_of("chocolate") is None
+
+
+def test_products(catalog):
+    assert {found["name"]: found["department"] for found in catalog.products()} == {
+        "Kinnie 1.5L": "Drinks",
+        "Fresh Milk": "Dairy",
+        "Milk Chocolate Bar": "Confectionery",
+        "Sour Cream": "Dairy",
+    }
+
+
+def test_add_products_updates(catalog):
+    version = catalog.version
+    catalog.add_products([product("2", "Fresh Milk", "Chilled")])
+    assert len(catalog) == 4
+    # an update is a change too, for the data derived from the products
+    assert catalog.version == version + 1
+    assert catalog.department_of("fresh milk") == "Chilled"
+    assert catalog.search("fresh")[0]["department"] == "Chilled"
+
+
+def test_parse_item():
+    url = "https://www.greens.com.mt/Items/104233"
+    item = GreensSpider().parse_item(fixture_response("greens_item.html", url))
+    assert dict(item) == {
+        "product_id": "104233",
+        "name": "Kinnie 1.5L",
+        "department": "Drinks",
+        "aisle": "Soft Drinks",
+        "url": url,
+    }
+
+
+def test_parse_item_skips_other_pages():
+    url = "https://www.greens.com.mt/Categories/Drinks/SoftDrinks"
+    response = fixture_response("greens_category.html", url)
+    assert GreensSpider().parse_item(response) is None
+
+
+def test_pipeline_loads_in_batches(tmp_path):
+    spider = GreensSpider()
+    url = "https://www.greens.com.mt/Items/104233"
+    pipeline = ScrapersPipeline(
+        tmp_path / "catalog.sqlite", batch_size=2, flush_interval=0
+    )
+    pipeline.open_spider(spider)
+    pipeline.process_item(
+        spider.parse_item(fixture_response("greens_item.html", url)), spider
+    )
+    assert len(pipeline.catalog) == 0
+    pipeline.process_item(
+        {"product_id": "2", "name": "Fresh Milk", "department": "Dairy"}, spider
+    )
+    assert len(pipeline.catalog) == 2
+    pipeline.process_item(
+        {"product_id": "3", "name": "Sour Cream", "department": "Dairy"}, spider
+    )
+    pipeline.close_spider(spider)
+
+    catalog = Catalog(tmp_path / "catalog.sqlite")
+    assert catalog.departments(["kinnie", "sour cream"]) == {
+        "kinnie": "Drinks",
+        "sour cream": "Dairy",
+    }
+    catalog.close()
+
+
+def test_pipeline_drops_duplicates(tmp_path):
+    crawler = get_crawler(
+        GreensSpider,
+        {"CATALOG_PATH": str(tmp_path / "catalog.sqlite"), "JOBDIR": str(tmp_path)},
+    )
+    spider = GreensSpider()
+    pipeline = ScrapersPipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    pipeline.process_item({"product_id": "2", "name": "Fresh Milk"}, spider)
+    with pytest.raises(DropItem):
+        pipeline.process_item({"product_id": "2", "name": "Fresh Milk"}, spider)
+    pipeline.flush()
+    pipeline.close_spider(spider)
+
+    stats = crawler.stats.get_stats()
+    assert stats["catalog/duplicates"] == 1
+    assert stats["catalog/flushes"] == 1
+    assert stats["catalog/items_loaded"] == 1
+    assert stats["catalog/items_per_second"] > 0
+    assert stats["catalog/flush_seconds_max"] >= 0
+    # the seen products of a resumable crawl are kept with its job
+    assert (tmp_path / "catalog.seen").exists()
+    pipeline.open_spider(spider)
+    with pytest.raises(DropItem):
+        pipeline.process_item({"product_id": "2", "name": "Fresh Milk"}, spider)
+    pipeline.close_spider(spider)
@@ -0,0 +1,47 @@
+from .categorize import CategoryIndex, item_key
+from .datastore import Storage
+
+HYPERNIMS = [
+    "entity",
+    "food",
+    "dairy_product",
+    "cheese",
+    "plant",
+    "vegetable",
+    "dairy",
+]
+
+
+def test_item_key():
+    assert item_key("Milk *3") == item_key("MILK") == item_key("milk")
+    assert item_key("Sour cream x2") == "sour_cream"
+    assert item_key("Box of 6") == "box_of_6"
+
+
+def test_category_index_ranks_direct_matches_first():
+    index = CategoryIndex(
+        {"vegetable", "dairy", "meat"},
+        {"dairy_product": "dairy", "plant": "vegetable", "fish": "meat"},
+    )
+    assert index.match(HYPERNIMS) == ["vegetable", "dairy"]
+    assert index.match(["entity", "food", "dairy_product"]) == ["dairy"]
+    assert index.match(["entity", "fish"]) == ["meat"]
+    assert index.match([]) == []
+
+
+def test_category_index_updates():
+    index = CategoryIndex({"dairy"}, {"plant": "vegetable"})
+    index.add_synonym("plant", "greens")
+    index.add_synonym("cheese", "dairy")
+    index.add_category("food")
+    index.add_category("food")
+    assert index.match(HYPERNIMS) == ["food", "dairy", "greens"]
+    assert index.entries["food"] == [(0, "food")]
+
+
+def test_storage_maintains_category_index():
+    storage = Storage({})
+    assert storage.category_index.match(["food", "cheese"]) == []
+    storage.add_category_synonym("cheese", "dairy")
+    storage.add_to_known_categories("food")
+    assert storage.category_index.match(["food", "cheese"]) == ["food", "dairy"]
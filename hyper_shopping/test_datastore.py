@@ -0,0 +1,229 @@
+import shelve
+
+import pytest
+
+from .datastore import (
+    DEFAULT_CATEGORIES,
+    DEFAULT_CATEGORY_SYNONYMS,
+    ShelveBackend,
+    SQLiteBackend,
+    Storage,
+    migrate_shelf,
+)
+
+
+@pytest.fixture(params=["shelve", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "shelve":
+        backend = ShelveBackend({})
+    else:
+        backend = SQLiteBackend(tmp_path / "data.sqlite")
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def storage(backend):
+    return Storage(backend)
+
+
+def test_defaults(storage):
+    assert storage.get_known_categories() == DEFAULT_CATEGORIES
+    assert storage.get_category_synonyms() == DEFAULT_CATEGORY_SYNONYMS
+    assert storage.get_item_categories() == {}
+
+
+def test_set_item_category(storage):
+    storage.set_item_category("Milk", "dairy")
+    storage.set_item_category("Pop tarts", "snacks")
+    assert storage.get_item_category("Milk") == "dairy"
+    assert storage.get_item_category("Eggs") is None
+    assert "snacks" in storage.get_known_categories()
+
+
+def test_set_item_categories(storage):
+    storage.set_item_categories({"Milk": "dairy", "Pastizzi": "pastry"})
+    assert storage.get_item_categories() == {
+        "Milk": "dairy",
+        "Pastizzi": "pastry",
+    }
+    assert "pastry" in storage.get_known_categories()
+
+
+def test_count_item_categories(storage):
+    storage.set_item_category("Milk", "dairy")
+    with storage.batch():
+        storage.set_item_categories({"Milk": "drink", "Pastizzi": "pastry"})
+        # pending writes count, changes of stored items don't
+        assert storage.count_item_categories() == 2
+    assert storage.count_item_categories() == 2
+
+
+def test_add_category_synonym(storage):
+    storage.add_category_synonym("cheese", "dairy")
+    assert storage.get_category_synonyms()["cheese"] == "dairy"
+
+
+def test_sqlite_transaction_rollback(tmp_path):
+    storage = Storage(SQLiteBackend(tmp_path / "data.sqlite"))
+    with pytest.raises(RuntimeError):
+        with storage.backend.transaction():
+            storage.set_item_category("Milk", "dairy")
+            raise RuntimeError
+    assert storage.get_item_category("Milk") is None
+
+
+def test_sqlite_is_persistent(tmp_path):
+    path = tmp_path / "data.sqlite"
+    storage = Storage(SQLiteBackend(path))
+    storage.set_item_category("Milk", "dairy")
+    storage.close()
+
+    storage = Storage(SQLiteBackend(path))
+    assert storage.get_item_category("Milk") == "dairy"
+    storage.close()
+
+
+def test_migrate_shelf(tmp_path):
+    shelf = {
+        "known_categories": {"dairy", "snacks"},
+        "category_synonyms": {"cheese": "dairy"},
+        "item_categories": {"Milk": "dairy", "Pop tarts": "snacks"},
+    }
+    backend = SQLiteBackend(tmp_path / "data.sqlite")
+    migrate_shelf(shelf, backend)
+
+    storage = Storage(backend)
+    assert storage.get_item_categories() == shelf["item_categories"]
+    assert storage.get_category_synonyms()["cheese"] == "dairy"
+    assert storage.get_known_categories() >= {"dairy", "snacks"}
+    backend.close()
+
+
+class CountingBackend(ShelveBackend):
+    def __init__(self):
+        super().__init__({})
+        self.writes = 0
+
+    def set_item_categories(self, item_categories):
+        self.writes += 1
+        super().set_item_categories(item_categories)
+
+    def add_known_categories(self, categories):
+        self.writes += 1
+        super().add_known_categories(categories)
+
+
+@pytest.fixture
+def counting():
+    return CountingBackend()
+
+
+def test_unchanged_writes_are_skipped(counting):
+    storage = Storage(counting)
+    counting.writes = 0
+    storage.set_item_category("Milk", "dairy")
+    storage.set_item_category("Milk", "dairy")
+    storage.add_to_known_categories("dairy")
+    assert counting.writes == 1
+
+
+def test_batch_flushes_once(counting):
+    storage = Storage(counting)
+    counting.writes = 0
+    with storage.batch():
+        storage.set_item_category("Milk", "dairy")
+        storage.set_item_category("Crisps", "snacks")
+        storage.set_item_category("Milk", "drink")
+        assert counting.writes == 0
+        assert storage.get_item_category("Milk") == "drink"
+        assert storage.pending == 3
+    # one write for the new category, one for the items
+    assert counting.writes == 2
+    assert counting.get_item_categories() == {"Milk": "drink", "Crisps": "snacks"}
+    assert storage.pending == 0
+
+
+def test_flush_size(counting):
+    storage = Storage(counting, flush_size=2)
+    storage.set_item_category("Milk", "dairy")
+    assert storage.pending == 1
+    storage.set_item_category("Butter", "dairy")
+    assert storage.pending == 0
+    with storage.batch(size=3):
+        storage.set_item_categories({"Eggs": "dairy", "Cream": "dairy"})
+        assert storage.pending == 2
+        storage.set_item_category("Bread", "baked_goods")
+        assert storage.pending == 0
+
+
+def test_flush_interval(counting, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("time.monotonic", lambda: clock[0])
+    storage = Storage(counting, flush_size=100, flush_interval=5)
+    storage.set_item_category("Milk", "dairy")
+    assert storage.pending == 1
+    clock[0] = 6.0
+    storage.set_item_category("Butter", "dairy")
+    assert storage.pending == 0
+
+
+def test_close_flushes(counting):
+    storage = Storage(counting, flush_size=100)
+    storage.set_item_category("Milk", "dairy")
+    storage.close()
+    assert counting.get_item_category("Milk") == "dairy"
+
+
+class CountingShelf(dict):
+    def __init__(self, shelf):
+        super().__init__()
+        self.shelf = shelf
+        self.reads = 0
+
+    def __contains__(self, key):
+        return key in self.shelf
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return self.shelf[key]
+
+    def __setitem__(self, key, value):
+        self.shelf[key] = value
+
+    def close(self):
+        self.shelf.close()
+
+
+@pytest.mark.parametrize("size", [100, 1000])
+def test_shelve_reads_items_once(tmp_path, size):
+    shelf = CountingShelf(shelve.open(str(tmp_path / "data")))
+    storage = Storage(ShelveBackend(shelf))
+    items = {f"item {i}": "dairy" for i in range(size)}
+    shelf.reads = 0
+    storage.set_item_categories(items)
+    # once to find the changes, and once more as they're written back
+    assert shelf.reads == 2
+    shelf.reads = 0
+    assert storage.get_many_item_categories(items) == items
+    assert shelf.reads == 1
+    storage.close()
+
+    storage = Storage(ShelveBackend(shelve.open(str(tmp_path / "data"))))
+    assert storage.get_item_categories() == items
+    storage.close()
+
+
+def test_shelve_keeps_items_of_other_writers(tmp_path):
+    shelf = shelve.open(str(tmp_path / "data"))
+    first = Storage(ShelveBackend(shelf))
+    second = Storage(ShelveBackend(shelf))
+    first.set_item_category("Milk", "dairy")
+    second.set_item_category("Beer", "drink")
+    first.set_item_category("Eggs", "dairy")
+    assert second.get_item_categories() == {
+        "Milk": "dairy",
+        "Beer": "drink",
+        "Eggs": "dairy",
+    }
+    shelf.close()
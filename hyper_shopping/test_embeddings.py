@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+
+from .embeddings import (
+    EmbeddingClassifier,
+    WordVectors,
+    category_examples,
+    convert_vectors,
+)
+
+# a tiny vector space: pastry-like, vegetable-like and drink-like words
+VECTORS_TEXT = """8 3
+pastizzi 1 0.1 0
+pastry 1 0 0
+pie 0.9 0.2 0
+gogosari 0.1 1 0
+pepper 0 1 0.1
+vegetable 0 1 0
+beer 0 0 1
+drink 0 0.1 1
+"""
+
+
+@pytest.fixture
+def vectors(tmp_path):
+    path = tmp_path / "vectors.npy"
+    assert convert_vectors(io.StringIO(VECTORS_TEXT), path) == 8
+    return WordVectors(path)
+
+
+def test_word_vectors(vectors):
+    assert "pastry" in vectors
+    assert "cake" not in vectors
+    embedded = vectors.embed(["Pastry", "cake", "pastry pie *2"])
+    assert embedded.shape == (3, 3)
+    assert np.allclose(np.linalg.norm(embedded, axis=1), [1, 0, 1])
+
+
+def test_classify(vectors):
+    examples = category_examples(
+        {"Red pepper": "vegetable", "Apple pie": "snacks"},
+        ["vegetable", "drink", "baked_goods"],
+    )
+    classifier = EmbeddingClassifier(vectors, examples, min_similarity=0.5)
+    # categories without any known word can't be predicted
+    assert sorted(classifier.categories) == ["drink", "snacks", "vegetable"]
+    assert classifier.classify(["pastizzi", "Gogosari *2", "Beer", "unknown"]) == [
+        "snacks",
+        "vegetable",
+        "drink",
+        None,
+    ]
+    assert classifier.classify([]) == []
+
+
+@pytest.mark.parametrize("text", ["", "0 300\n"])
+def test_convert_no_vectors(tmp_path, text):
+    path = tmp_path / "vectors.npy"
+    with pytest.raises(ValueError):
+        convert_vectors(io.StringIO(text), path)
+    assert not path.exists()
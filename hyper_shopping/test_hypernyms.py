@@ -0,0 +1,129 @@
+import pytest
+
+from .hypernyms import (
+    base_forms,
+    build_hypernym_index,
+    lookup_hypernims,
+    lookup_many_hypernims,
+    walk_hypernims,
+)
+
+
+class FakeSynset:
+    def __init__(self, name, lemmas, parents=()):
+        self._name = name
+        self._lemmas = lemmas
+        self.parents = list(parents)
+
+    def name(self):
+        return self._name
+
+    def lemma_names(self):
+        return self._lemmas
+
+    def hypernym_paths(self):
+        if not self.parents:
+            return [[self]]
+        return [
+            path + [self]
+            for parent in self.parents
+            for path in parent.hypernym_paths()
+        ]
+
+
+class FakeWordNet:
+    def __init__(self, synsets, exceptions=None):
+        self._exception_map = {"n": exceptions or {}}
+        self.lemmas = {}
+        for synset in synsets:
+            for lemma in synset.lemma_names():
+                self.lemmas.setdefault(lemma, []).append(synset)
+
+    def all_lemma_names(self):
+        return iter(self.lemmas)
+
+    def synsets(self, lemma):
+        return self.lemmas.get(lemma, [])
+
+
+@pytest.fixture
+def wordnet():
+    entity = FakeSynset("entity.n.01", ["entity"])
+    food = FakeSynset("food.n.01", ["food", "nutrient"], [entity])
+    produce = FakeSynset("produce.n.01", ["produce", "green_goods"], [food])
+    vegetable = FakeSynset("vegetable.n.01", ["vegetable"], [produce])
+    plant = FakeSynset("plant.n.02", ["plant"], [entity])
+    tomato = FakeSynset("tomato.n.01", ["tomato"], [vegetable])
+    tomato_plant = FakeSynset("tomato.n.02", ["tomato"], [plant])
+    return FakeWordNet(
+        [entity, food, produce, vegetable, plant, tomato, tomato_plant]
+    )
+
+
+def test_walk_hypernims_dedupes_in_path_order(wordnet):
+    hypernims = walk_hypernims(wordnet.synsets("tomato"))
+    assert hypernims == [
+        "entity",
+        "food",
+        "nutrient",
+        "produce",
+        "green_goods",
+        "vegetable",
+        "tomato",
+        "plant",
+    ]
+
+
+def test_build_index_matches_walk(wordnet):
+    index = build_hypernym_index(wordnet)
+    assert set(index) == set(wordnet.lemmas)
+    for lemma in index:
+        assert index[lemma] == walk_hypernims(wordnet.synsets(lemma))
+
+
+@pytest.mark.parametrize(
+    "word,expected",
+    [
+        ("tomatoes", ["tomatoes", "tomatoe", "tomato"]),
+        ("Cherries", ["cherries", "cherrie", "cherry"]),
+        ("milk", ["milk"]),
+    ],
+)
+def test_base_forms(word, expected):
+    assert base_forms(word) == expected
+
+
+def test_lookup_hypernims(wordnet):
+    index = build_hypernym_index(wordnet)
+    assert lookup_hypernims(index, "Tomatoes") == index["tomato"]
+    assert lookup_hypernims(index, "unknown_thing") == []
+
+
+@pytest.fixture
+def leaves_wordnet():
+    entity = FakeSynset("entity.n.01", ["entity"])
+    herb = FakeSynset("herb.n.01", ["herb"], [entity])
+    leaf = FakeSynset("leaf.n.01", ["leaf", "leafage"], [herb])
+    leave = FakeSynset("leave.n.01", ["leave", "leave_of_absence"], [entity])
+    glass = FakeSynset("glass.n.01", ["glass"], [entity])
+    glasses = FakeSynset("spectacles.n.01", ["spectacles", "glasses"], [entity])
+    return FakeWordNet(
+        [entity, herb, leaf, leave, glass, glasses], {"leaves": ["leaf"]}
+    )
+
+
+def test_lookup_irregular_plurals(leaves_wordnet):
+    index = build_hypernym_index(leaves_wordnet)
+    assert index["leaves"] == index["leaf"]
+    hypernims = lookup_hypernims(index, "Leaves")
+    # the exception first, then what the detachment rules find ("leave")
+    assert hypernims[: len(index["leaf"])] == index["leaf"]
+    assert "herb" in hypernims
+
+
+def test_lookup_returns_union_of_forms(leaves_wordnet):
+    index = build_hypernym_index(leaves_wordnet)
+    hypernims = lookup_hypernims(index, "glasses")
+    assert "spectacles" in hypernims
+    assert "glass" in hypernims
+    assert lookup_many_hypernims(index, ["glasses"]) == {"glasses": hypernims}
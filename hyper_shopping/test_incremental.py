@@ -0,0 +1,150 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+HOME = """
+<html><body>
+  <a href="/Items/1">Kinnie</a>
+  <a href="/Items/2">Fresh Milk</a>
+</body></html>
+"""
+
+ITEM = """
+<html><body>
+  <ol class="breadcrumb">
+    <li><a href="/home">Home</a></li>
+    <li><a href="/{department}">{department}</a></li>
+  </ol>
+  <input type="hidden" id="sid" value="{product_id}" />
+  <div id="name">{name}</div>
+</body></html>
+"""
+
+# a crawl of the local store, in its own process as the reactor can't
+# be restarted
+CRAWL = """
+import os
+import sys
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+from scrapers.spiders.greens import GreensSpider
+
+class LocalSpider(GreensSpider):
+    name = "local"
+    allowed_domains = ["127.0.0.1"]
+    start_urls = [sys.argv[1]]
+
+settings = get_project_settings()
+settings.setdict({
+    "ROBOTSTXT_OBEY": False,
+    "AUTOTHROTTLE_ENABLED": False,
+    "TELNETCONSOLE_ENABLED": False,
+    "LOG_LEVEL": "ERROR",
+    "CATALOG_PATH": "catalog.sqlite",
+    # absolute, as there is no scrapy.cfg to find the .scrapy directory by
+    "HTTPCACHE_DIR": os.path.abspath("httpcache"),
+    "INCREMENTAL_PATH": os.path.abspath("fingerprints.sqlite"),
+    "FEEDS": {sys.argv[2]: {"format": "jsonlines"}},
+}, priority="cmdline")
+process = CrawlerProcess(settings)
+process.crawl(LocalSpider)
+process.start()
+"""
+
+
+class Store:
+    """
+    Product pages with ETags, answering conditional requests
+    """
+
+    def __init__(self):
+        self.pages = {"/home": (HOME, None)}
+        self.requests = []
+
+    def set_item(self, product_id, name, department, etag):
+        page = ITEM.format(product_id=product_id, name=name, department=department)
+        self.pages[f"/Items/{product_id}"] = (page, etag)
+
+    def handler(self):
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page, etag = store.pages[self.path]
+                conditional = self.headers.get("If-None-Match")
+                store.requests.append((self.path, conditional))
+                if etag and conditional == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                body = page.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def store():
+    store = Store()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), store.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    store.url = f"http://127.0.0.1:{server.server_port}/home"
+    yield store
+    server.shutdown()
+    server.server_close()
+
+
+def crawl(store, directory, feed):
+    environment = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([str(ROOT / "scrapers"), str(ROOT)]),
+        SCRAPY_SETTINGS_MODULE="scrapers.settings",
+    )
+    subprocess.run(
+        [sys.executable, "-c", CRAWL, store.url, feed],
+        cwd=str(directory),
+        env=environment,
+        check=True,
+        timeout=60,
+    )
+    with open(directory / feed) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_recrawl_emits_changed_products(store, tmp_path):
+    store.set_item("1", "Kinnie", "Drinks", '"k1"')
+    store.set_item("2", "Fresh Milk", "Dairy", None)
+    first = crawl(store, tmp_path, "first.jsonl")
+    assert sorted(product["name"] for product in first) == ["Fresh Milk", "Kinnie"]
+
+    store.requests = []
+    store.set_item("2", "Fresh Milk", "Chilled", None)
+    second = crawl(store, tmp_path, "second.jsonl")
+    # unchanged pages are revalidated, and their products not emitted again
+    assert ("/Items/1", '"k1"') in store.requests
+    assert [(product["name"], product["department"]) for product in second] == [
+        ("Fresh Milk", "Chilled")
+    ]
+
+    store.requests = []
+    assert crawl(store, tmp_path, "third.jsonl") == []
+    assert {path for path, _ in store.requests} == {"/home", "/Items/1", "/Items/2"}
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import pstats
+
+from . import categorize
+from .datastore import Storage
+from .instrument import Recorder, start_profile
+
+
+def test_patch_and_unpatch():
+    original = Storage.get_item_category
+    original_key = categorize.item_key
+    recorder = Recorder()
+    recorder.patch(Storage, ["get_item_category"], "Storage.")
+    recorder.patch(categorize, ["item_key"])
+
+    storage = Storage({})
+    storage.set_item_category("milk", "dairy")
+    assert storage.get_item_category("milk") == "dairy"
+    assert storage.get_item_category("eggs") is None
+    assert categorize.item_key("Milk *3") == "milk"
+
+    recorder.unpatch()
+    assert Storage.get_item_category is original
+    assert categorize.item_key is original_key
+    stats = recorder.stats()
+    assert stats["Storage.get_item_category"]["calls"] >= 2
+    assert stats["item_key"]["calls"] == 1
+    assert "Storage.get_item_category" in recorder.summary()
+
+
+def test_wrap_coroutines_and_errors():
+    recorder = Recorder()
+
+    async def fetch():
+        await asyncio.sleep(0)
+        return "cards"
+
+    def fail():
+        raise ValueError
+
+    assert asyncio.run(recorder.wrap(fetch, "fetch")()) == "cards"
+    try:
+        recorder.wrap(fail, "fail")()
+    except ValueError:
+        pass
+    assert recorder.stats()["fetch"]["calls"] == 1
+    assert recorder.stats()["fail"]["calls"] == 1
+
+
+def test_save_chrome_trace(tmp_path):
+    recorder = Recorder(max_events=2)
+    for _ in range(3):
+        with recorder.span("lookup"):
+            pass
+    recorder.count("lists")
+    recorder.save(tmp_path / "trace.json")
+
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    assert len(trace["traceEvents"]) == 2
+    assert trace["traceEvents"][0]["ph"] == "X"
+    assert trace["summary"]["lookup"]["calls"] == 3
+    assert trace["counters"] == {"lists": 1}
+
+
+def test_start_profile(tmp_path):
+    stop = start_profile(tmp_path / "run.prof")
+    categorize.item_key("Milk *3")
+    stop()
+    stats = pstats.Stats(str(tmp_path / "run.prof"))
+    assert any(name == "item_key" for _, _, name in stats.stats)
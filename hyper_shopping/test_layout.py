@@ -0,0 +1,121 @@
+import random
+import shelve
+from itertools import permutations
+
+import pytest
+
+from .layout import RouteCache, ShopLayout, frequent_combinations
+from .trello_helpers import sort_checklist
+
+
+def random_layout(departments, seed=0):
+    rng = random.Random(seed)
+    nodes = ["entrance", *departments, "checkout"]
+    aisles = {(a, b): float(rng.randint(1, 20)) for a, b in zip(nodes, nodes[1:])}
+    for _ in range(len(nodes) * 2):
+        a, b = rng.sample(nodes, 2)
+        aisles[(a, b)] = float(rng.randint(1, 20))
+    return ShopLayout(aisles)
+
+
+def test_linear_layout_keeps_its_order():
+    layout = ShopLayout.linear(["bbq", "drink", "diy", "vegetable", "dairy"])
+    assert layout.plan({"dairy", "bbq", "vegetable"}) == (
+        "bbq",
+        "vegetable",
+        "dairy",
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_exact_plan_is_shortest(seed):
+    departments = [f"d{i}" for i in range(6)]
+    layout = random_layout(departments, seed)
+    route = layout.plan(departments)
+    assert sorted(route) == departments
+    shortest = min(layout.walk_length(p) for p in permutations(departments))
+    assert layout.walk_length(route) == shortest
+
+
+def test_heuristic_plan_visits_everything():
+    departments = [f"d{i}" for i in range(25)]
+    layout = random_layout(departments)
+    route = layout.plan(departments)
+    assert sorted(route) == sorted(departments)
+    # no worse than visiting them in an arbitrary order
+    assert layout.walk_length(route) <= layout.walk_length(departments)
+
+
+def test_plan_skips_unknown_departments():
+    layout = ShopLayout({("entrance", "dairy"): 1, ("dairy", "checkout"): 1})
+    assert layout.plan(["dairy", "bbq", "checkout"]) == ("dairy",)
+
+
+def test_route_cache(tmp_path):
+    layouts = {"smart": ShopLayout.linear(["drink", "vegetable", "dairy"])}
+    path = str(tmp_path / "routes")
+    routes = RouteCache(layouts, shelve.open(path))
+    assert routes.route("smart", ["dairy", "drink", "bbq"]) == ("drink", "dairy")
+    assert routes.route("smart", ["drink", "dairy"]) == ("drink", "dairy")
+    assert routes.stats()["hits"] == 1
+    routes.close()
+
+    # planned routes are persisted, but only reused for the same layout
+    layouts["smart"].plan = None
+    routes = RouteCache(layouts, shelve.open(path))
+    assert routes.route("smart", ["drink", "dairy"]) == ("drink", "dairy")
+    routes.close()
+    routes = RouteCache(
+        {"smart": ShopLayout.linear(["dairy", "drink"])}, shelve.open(path)
+    )
+    assert routes.route("smart", ["drink", "dairy"]) == ("dairy", "drink")
+    routes.close()
+
+
+def test_warm_frequent_combinations():
+    lists = [["dairy", "drink"], ["drink", "dairy", None], ["vegetable"]]
+    combinations = frequent_combinations(lists, top=1)
+    assert combinations == [frozenset({"dairy", "drink"})]
+
+    layouts = {
+        "smart": ShopLayout.linear(["drink", "vegetable", "dairy"]),
+        "corner": ShopLayout.linear(["dairy", "drink"]),
+    }
+    routes = RouteCache(layouts)
+    assert routes.warm(combinations) == 2
+    assert routes.route("corner", {"dairy", "drink"}) == ("dairy", "drink")
+    assert routes.stats()["hits"] == 1
+
+
+def test_sort_checklist_with_layout():
+    layout = ShopLayout(
+        {
+            ("entrance", "dairy"): 10,
+            ("entrance", "vegetables"): 1,
+            ("vegetables", "dairy"): 1,
+            ("dairy", "checkout"): 1,
+        }
+    )
+    items = [
+        {"id": "1", "name": "Milk", "pos": "1"},
+        {"id": "2", "name": "Tomatoes", "pos": "2"},
+    ]
+    sorted_items = sort_checklist(items, layout)
+    assert [item["name"] for item in sorted_items] == ["Tomatoes", "Milk"]
+
+
+def test_sort_checklist_with_canonical_layout():
+    layout = ShopLayout(
+        {
+            ("entrance", "vegetable"): 10,
+            ("entrance", "dairy"): 1,
+            ("dairy", "vegetable"): 1,
+            ("vegetable", "checkout"): 1,
+        }
+    )
+    items = [
+        {"id": "1", "name": "Tomatoes", "pos": "1"},
+        {"id": "2", "name": "Milk", "pos": "2"},
+    ]
+    sorted_items = sort_checklist(items, layout)
+    assert [item["name"] for item in sorted_items] == ["Milk", "Tomatoes"]
@@ -0,0 +1,76 @@
+import pytest
+
+from .hypernyms import lookup_hypernims, lookup_many_hypernims
+from .lexicon import Lexicon, write_lexicon
+
+
+@pytest.fixture
+def index():
+    return {
+        "tomato": ["entity", "food", "vegetable", "tomato"],
+        "milk": ["entity", "food", "dairy_product", "milk"],
+        "crème_fraîche": ["entity", "food", "dairy_product", "crème_fraîche"],
+        "adrift": [],
+    }
+
+
+@pytest.fixture
+def lexicon(index, tmp_path):
+    path = tmp_path / "hypernyms.idx"
+    write_lexicon(index, path)
+    with Lexicon(path) as lexicon:
+        yield lexicon
+
+
+def test_lexicon_matches_index(index, lexicon):
+    assert len(lexicon) == len(index)
+    assert dict(lexicon) == index
+    assert list(lexicon) == sorted(index, key=str.encode)
+
+
+def test_lexicon_missing_keys(lexicon):
+    assert "tomatoes" not in lexicon
+    assert lexicon.get("aardvark") is None
+    assert lexicon.get("zebra") is None
+    with pytest.raises(KeyError):
+        lexicon["potato"]
+
+
+def test_lexicon_is_a_drop_in_index(index, lexicon):
+    assert lookup_hypernims(lexicon, "Tomatoes") == index["tomato"]
+
+
+def test_empty_lexicon(tmp_path):
+    path = tmp_path / "empty.idx"
+    write_lexicon({}, path)
+    with Lexicon(path) as lexicon:
+        assert len(lexicon) == 0
+        assert "milk" not in lexicon
+
+
+def test_not_a_lexicon(tmp_path):
+    path = tmp_path / "hypernyms.idx"
+    path.write_bytes(b"tomato\tfood\n")
+    with pytest.raises(ValueError):
+        Lexicon(path)
+    path.write_bytes(b"milk\n")
+    with pytest.raises(ValueError):
+        Lexicon(path)
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        Lexicon(path)
+
+
+def test_lexicon_get_many(index, lexicon):
+    keys = ["zebra", "milk", "tomato", "aardvark", "milk", "crème_fraîche"]
+    assert lexicon.get_many(keys) == {
+        key: index[key] for key in ["milk", "tomato", "crème_fraîche"]
+    }
+    assert lexicon.get_many([]) == {}
+
+
+def test_lookup_many_hypernims(index, lexicon):
+    items = ["Tomatoes", "milk", "potatoes"]
+    expected = {"Tomatoes": index["tomato"], "milk": index["milk"], "potatoes": []}
+    assert lookup_many_hypernims(lexicon, items) == expected
+    assert lookup_many_hypernims(index, items) == expected
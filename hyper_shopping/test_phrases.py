@@ -0,0 +1,102 @@
+import pytest
+
+from .categorize import CategoryResolver
+from .datastore import Storage
+from .phrases import PhraseResolver, candidate_phrases, phrase_tokens
+
+HYPERNIMS_INDEX = {
+    "mozzarella": ["entity", "food", "dairy_product", "cheese", "mozzarella"],
+    "lasagna": ["entity", "food", "dish", "pasta", "lasagna"],
+    "sour_cream": ["entity", "food", "dairy_product", "cream", "sour_cream"],
+    "cream": ["entity", "food", "dairy_product", "cream"],
+    "milk": ["entity", "food", "dairy_product", "milk"],
+    # an adjective, no hypernyms but its own synonyms
+    "fresh": ["fresh", "new"],
+    "leaves": ["entity", "plant_organ", "leaf"],
+    "mint": ["entity", "plant", "herb", "mint"],
+    "bunch": ["entity", "group", "bunch"],
+}
+
+
+@pytest.fixture
+def batches():
+    return []
+
+
+@pytest.fixture
+def phrases(batches):
+    def lookup_many(phrases):
+        batches.append(phrases)
+        return {p: HYPERNIMS_INDEX[p] for p in phrases if p in HYPERNIMS_INDEX}
+
+    return PhraseResolver(lookup_many)
+
+
+@pytest.mark.parametrize(
+    "item, tokens",
+    [
+        ("Milk *3", ["milk"]),
+        ("Barbeque for 1 time", ["barbeque"]),
+        ("Mozzarella a piece  for grating", ["mozzarella", "grating"]),
+    ],
+)
+def test_phrase_tokens(item, tokens):
+    assert phrase_tokens(item) == tokens
+
+
+def test_candidate_phrases():
+    assert candidate_phrases(["fresh", "sour", "cream"]) == [
+        "fresh_sour_cream",
+        "sour_cream",
+        "fresh_sour",
+        "cream",
+        "sour",
+        "fresh",
+    ]
+
+
+def test_resolve_many(phrases, batches):
+    matches = phrases.resolve_many(
+        [
+            "Mozzarella a piece  for grating for lasagna",
+            "fresh sour cream",
+            "Pop tards",
+        ]
+    )
+    assert matches["Mozzarella a piece  for grating for lasagna"].phrase == "lasagna"
+    assert matches["fresh sour cream"] == ("sour_cream", HYPERNIMS_INDEX["sour_cream"])
+    assert matches["Pop tards"] is None
+    # every candidate of every item in one lookup
+    assert len(batches) == 1
+
+
+def test_resolver_falls_back_to_phrases(phrases, batches):
+    resolver = CategoryResolver(
+        Storage({}), lambda key: HYPERNIMS_INDEX.get(key, []), phrases=phrases
+    )
+    resolutions = resolver.resolve_keys(["milk", "sour_cream_x2", "pop_tards"])
+    assert resolutions["milk"].key == "milk"
+    assert resolutions["sour_cream_x2"].key == "sour_cream"
+    assert resolutions["sour_cream_x2"].categories == ["dairy"]
+    assert resolutions["pop_tards"].hypernims == []
+    assert len(batches) == 1
+
+    # cached by the original key
+    assert resolver.resolve_key("sour_cream_x2").key == "sour_cream"
+    assert len(batches) == 1
+
+
+def test_resolve_skips_adjectives(phrases):
+    match = phrases.resolve("Mint leaves fresh")
+    assert match.phrase == "leaves"
+    assert phrases.resolve("fresh") is None
+
+
+def test_resolve_prefers_phrases_with_categories(phrases):
+    categories = {"plant": ["vegetable"]}
+
+    def categories_of(hypernims):
+        return [c for h in hypernims for c in categories.get(h, [])]
+
+    assert phrases.resolve("Mint bunch").phrase == "bunch"
+    assert phrases.resolve("Mint bunch", categories_of).phrase == "mint"
@@ -0,0 +1,74 @@
+import asyncio
+import random
+
+import pytest
+
+from .reorder import (
+    apply_positions,
+    longest_increasing_subsequence,
+    plan_positions,
+)
+
+
+def reordered(positions, updates):
+    new_positions = dict(positions, **updates)
+    return sorted(new_positions, key=new_positions.get)
+
+
+@pytest.mark.parametrize(
+    "values, length",
+    [([], 0), ([3, 1, 2], 2), ([1, 2, 3], 3), ([3, 2, 1], 1), ([2, 2, 3], 2)],
+)
+def test_longest_increasing_subsequence(values, length):
+    indices = longest_increasing_subsequence(values)
+    assert len(indices) == length
+    subsequence = [values[i] for i in indices]
+    assert subsequence == sorted(set(subsequence))
+
+
+def test_plan_positions_moves_only_misplaced_items():
+    positions = {"tomatoes": 17311, "milk": 34651, "parmesan": 34654}
+    order = ["milk", "parmesan", "tomatoes"]
+    updates = plan_positions(positions, order)
+    assert list(updates) == ["tomatoes"]
+    assert reordered(positions, updates) == order
+
+    assert plan_positions(positions, list(positions)) == {}
+
+
+def test_plan_positions_60_items():
+    rng = random.Random(0)
+    positions = {f"item{i}": 16384.0 * (i + 1) for i in range(60)}
+    order = list(positions)
+    # a few items move to a new place
+    for _ in range(5):
+        order.insert(rng.randrange(60), order.pop(rng.randrange(60)))
+    updates = plan_positions(positions, order)
+    assert len(updates) <= 5
+    assert reordered(positions, updates) == order
+
+
+def test_plan_positions_renumbers_crowded_items():
+    positions = {"a": 1.0, "b": 1.0 + 1e-7, "c": 2.0}
+    order = ["a", "c", "b"]
+    updates = plan_positions(positions, order)
+    assert len(updates) == 3
+    assert reordered(positions, updates) == order
+
+
+class FakeTrello:
+    def __init__(self):
+        self.requests = []
+
+    async def request(self, method, path, **params):
+        self.requests.append((method, path, params))
+
+
+def test_apply_positions():
+    trello = FakeTrello()
+    count = asyncio.run(apply_positions(trello, "c1", {"i1": 1.5, "i2": 2.5}))
+    assert count == 2
+    assert trello.requests == [
+        ("PUT", "/cards/c1/checkItem/i1", {"pos": "1.5"}),
+        ("PUT", "/cards/c1/checkItem/i2", {"pos": "2.5"}),
+    ]
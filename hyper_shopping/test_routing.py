@@ -0,0 +1,79 @@
+from .layout import ShopLayout
+from .routing import RouteSorter, compile_route
+
+DEPARTMENTS = {"Tomatoes": "vegetable", "Milk": "dairy", "Beer": "drink"}
+ROUTES = {
+    "smart": ["drink", "vegetable", "dairy"],
+    "corner": ["dairy", "vegetable"],
+}
+
+
+def checklist():
+    return [
+        {"id": "1", "name": "Tomatoes", "pos": "17311"},
+        {"id": "2", "name": "Milk", "pos": "34651"},
+        {"id": "3", "name": "Mystery", "pos": "34652"},
+        {"id": "4", "name": "Beer", "pos": "34653"},
+    ]
+
+
+def test_compile_route():
+    assert compile_route(["dairy", "vegetable", "dairy"]) == {
+        "dairy": 0,
+        "vegetable": 1,
+    }
+
+
+def test_sort_for_shop():
+    items = checklist()
+    sorter = RouteSorter(ROUTES, DEPARTMENTS.get)
+    sorted_items = sorter.sort_for_shop(items, "smart")
+    assert [item["name"] for item in sorted_items] == [
+        "Beer",
+        "Tomatoes",
+        "Milk",
+        "Mystery",
+    ]
+    assert [item["pos"] for item in sorted_items] == ["1", "2", "3", "4"]
+    assert items == checklist()  # original is unchanged
+
+
+def test_sort_for_shops_looks_up_departments_once():
+    lookups = []
+
+    def department_of(name):
+        lookups.append(name)
+        return DEPARTMENTS.get(name)
+
+    items = checklist() * 500
+    sorted_by_shop = RouteSorter(ROUTES, department_of).sort_for_shops(items)
+    assert sorted(lookups) == ["Beer", "Milk", "Mystery", "Tomatoes"]
+    corner = [item["name"] for item in sorted_by_shop["corner"]]
+    # beer's department isn't on this route, so it's unknown
+    assert corner[:500] == ["Milk"] * 500
+    assert corner[500:1000] == ["Tomatoes"] * 500
+    assert set(corner[1000:]) == {"Beer", "Mystery"}
+    assert len(sorted_by_shop["smart"]) == 2000
+
+
+def test_departments_are_compared_by_category():
+    synonyms = {"vegetables": "vegetable", "drinks": "drink"}
+    routes = {
+        "smart": ["drinks", "vegetables", "dairy"],
+        "layout": ShopLayout.linear(["dairy", "vegetables", "drinks"]),
+    }
+    departments = {**DEPARTMENTS, "Beer": "drinks"}
+    sorter = RouteSorter(routes, departments.get, synonyms=synonyms)
+    sorted_by_shop = sorter.sort_for_shops(checklist())
+    assert [item["name"] for item in sorted_by_shop["smart"]] == [
+        "Beer",
+        "Tomatoes",
+        "Milk",
+        "Mystery",
+    ]
+    assert [item["name"] for item in sorted_by_shop["layout"]] == [
+        "Milk",
+        "Tomatoes",
+        "Beer",
+        "Mystery",
+    ]
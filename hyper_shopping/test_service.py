@@ -0,0 +1,207 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from .batch import HYPERNIMS, UNRESOLVED, Result
+from .client import ServiceClient, ServiceError, delegate, service_available
+from .routing import RouteSorter
+from .service import AlreadyServing, CategorizationService, MicroBatcher
+
+CATEGORIES = {"milk": "dairy", "tomatoes": "vegetable", "kinnie": "drink"}
+
+
+def categorize(batches):
+    def process(items):
+        batches.append(items)
+        return [
+            Result(
+                item=item,
+                category=CATEGORIES.get(item.lower()),
+                source=HYPERNIMS if item.lower() in CATEGORIES else UNRESOLVED,
+                candidates=[],
+            )
+            for item in items
+        ]
+
+    return process
+
+
+def test_micro_batching():
+    batches = []
+    batcher = MicroBatcher(categorize(batches), max_delay=0.01)
+
+    async def requests():
+        return await asyncio.gather(
+            batcher.submit(["Milk"]),
+            batcher.submit(["Tomatoes", "pastizzi"]),
+            batcher.submit(["Kinnie"]),
+        )
+
+    results = asyncio.run(requests())
+    assert [[r["category"] for r in result] for result in results] == [
+        ["dairy"],
+        ["vegetable", None],
+        ["drink"],
+    ]
+    assert batches == [["Milk", "Tomatoes", "pastizzi", "Kinnie"]]
+    assert batcher.stats() == {"requests": 3, "batches": 1, "items": 4}
+
+
+def test_full_batches_dont_wait():
+    batches = []
+    batcher = MicroBatcher(categorize(batches), max_delay=60, max_batch=2)
+
+    async def requests():
+        return await asyncio.gather(
+            batcher.submit(["Milk"]), batcher.submit(["Tomatoes", "Kinnie"])
+        )
+
+    assert len(asyncio.run(asyncio.wait_for(requests(), 1))) == 2
+    assert batches == [["Milk", "Tomatoes", "Kinnie"]]
+
+
+def test_failed_batch():
+    def fail(items):
+        raise RuntimeError("store is locked")
+
+    batcher = MicroBatcher(fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.submit(["Milk"]))
+
+
+def test_service(tmp_path):
+    path = tmp_path / "service.sock"
+    batches = []
+    lookups = []
+    sorter = RouteSorter({"smart": ["vegetable", "drink", "dairy"]}, CATEGORIES.get)
+    service = CategorizationService(
+        categorize(batches), categorize(lookups), sorter, max_delay=0.01
+    )
+    checklist = [
+        {"id": "1", "name": "Milk", "pos": "1"},
+        {"id": "2", "name": "Kinnie", "pos": "2"},
+        {"id": "3", "name": "Tomatoes", "pos": "3"},
+    ]
+
+    def use_service():
+        assert service_available(path)
+        with ServiceClient(path) as client:
+            results = client.categorize(["Milk", "pastizzi"])
+            assert [r["category"] for r in results] == ["dairy", None]
+            sorted_items = client.sort(checklist, "smart")
+            assert [item["name"] for item in sorted_items] == [
+                "Tomatoes",
+                "Kinnie",
+                "Milk",
+            ]
+            with pytest.raises(ServiceError, match="Unknown shop"):
+                client.sort(checklist, "corner")
+            # the connection survives errors
+            return client.stats()
+
+    async def run():
+        server = await service.start(path)
+        async with server:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, use_service)
+
+    stats = asyncio.run(run())
+    assert stats == {"requests": 2, "batches": 2, "items": 5}
+    # sorting only looks the items up
+    assert batches == [["Milk", "pastizzi"]]
+    assert lookups == [["Milk", "Kinnie", "Tomatoes"]]
+    assert not service_available(tmp_path / "missing.sock")
+
+
+def test_delegate(tmp_path):
+    path = tmp_path / "service.sock"
+    batches = []
+    sorter = RouteSorter({"smart": ["dairy"]}, CATEGORIES.get)
+    service = CategorizationService(
+        categorize(batches), categorize([]), sorter, max_delay=0.001
+    )
+    items = tmp_path / "items.txt"
+    items.write_text("Milk\n\nKinnie\npastizzi\n")
+    output = tmp_path / "results.jsonl"
+
+    def use_service():
+        # left to the full CLI
+        assert not delegate(["categorize", str(items), "--local"], path)
+        assert not delegate(["categorize", "--workers", "2"], path)
+        assert not delegate(["review"], path)
+        assert not delegate(["categorize", str(tmp_path / "missing")], path)
+        return delegate(
+            ["categorize", str(items), "-o", str(output), "--chunk-size", "2"], path
+        )
+
+    async def run():
+        server = await service.start(path)
+        async with server:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, use_service)
+
+    assert asyncio.run(run())
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["category"] for r in results] == ["dairy", "drink", None]
+    assert batches == [["Milk", "Kinnie"], ["pastizzi"]]
+    # no service
+    assert not delegate(["categorize", str(items)], path)
+
+
+def test_batches_run_off_the_event_loop():
+    threads = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def process(items):
+        threads.append(threading.get_ident())
+        started.set()
+        release.wait(1)
+        return categorize([])(items)
+
+    batcher = MicroBatcher(process, max_delay=0)
+
+    async def requests():
+        submitted = asyncio.ensure_future(batcher.submit(["Milk"]))
+        # the loop goes on while the batch runs
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        assert not submitted.done()
+        release.set()
+        return await submitted
+
+    assert [r["category"] for r in asyncio.run(requests())] == ["dairy"]
+    assert threads[0] != threading.get_ident()
+
+
+def test_start_refuses_a_running_service(tmp_path):
+    path = tmp_path / "service.sock"
+    sorter = RouteSorter({"smart": ["dairy"]}, CATEGORIES.get)
+
+    def service():
+        return CategorizationService(categorize([]), categorize([]), sorter)
+
+    async def run():
+        server = await service().start(path)
+        async with server:
+            with pytest.raises(AlreadyServing):
+                await service().start(path)
+        assert path.exists()
+
+    asyncio.run(run())
+
+    # the socket left by a service that is gone is replaced
+    if not path.exists():
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(str(path))
+        stale.close()
+
+    async def restart():
+        server = await service().start(path)
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(restart())
@@ -0,0 +1,74 @@
+import pytest
+
+from .spelling import SpellingIndex, deletes, edit_distance
+
+FREQUENCIES = {
+    "tomato": 50,
+    "tomatoes": 80,
+    "potato": 60,
+    "garlic": 40,
+    "garlicky": 2,
+    "mozzarella": 10,
+    "milk": 90,
+    "silk": 20,
+}
+
+
+@pytest.fixture
+def index():
+    return SpellingIndex.build(FREQUENCIES)
+
+
+@pytest.mark.parametrize(
+    "source,target,distance",
+    [
+        ("milk", "milk", 0),
+        ("milk", "silk", 1),
+        ("garlick", "garlic", 1),
+        ("mlik", "milk", 1),
+        ("tomatos", "potato", 3),
+        ("mlk", "silk", 2),
+        ("milk", "mozzarella", 3),
+    ],
+)
+def test_edit_distance(source, target, distance):
+    assert edit_distance(source, target, 2) == min(distance, 3)
+
+
+def test_deletes():
+    assert deletes("abc", 1) == {"abc", "ab", "ac", "bc"}
+    assert "a" in deletes("abc", 2)
+
+
+def test_lookup_ranks_by_distance_then_frequency(index):
+    suggestions = index.lookup("tomatoe")
+    assert [s.word for s in suggestions] == ["tomatoes", "tomato"]
+    assert [s.distance for s in suggestions] == [1, 1]
+    # only the closest words are suggested
+    suggestions = index.lookup("mlk")
+    assert [(s.word, s.distance) for s in suggestions] == [("milk", 1)]
+    suggestions = index.lookup("sillk", top_k=1)
+    assert [(s.word, s.distance) for s in suggestions] == [("silk", 1)]
+
+
+def test_lookup_bounds(index):
+    assert index.candidates("mlk", max_distance=1) == ["milk"]
+    assert index.candidates("tomatos", top_k=1) == ["tomatoes"]
+    assert index.candidates("mozarela") == ["mozzarella"]
+    assert index.candidates("pastizzi") == []
+
+
+def test_add_words(index):
+    assert "pastizzi" not in index
+    index.add_words(["Pastizzi", "gogosari"])
+    assert "pastizzi" in index
+    assert index.candidates("pastizi") == ["pastizzi"]
+    assert index.correct_phrase("marinated gogosary") == "marinated gogosari"
+
+
+def test_save_load(index, tmp_path):
+    path = tmp_path / "spelling.idx"
+    index.save(path)
+    loaded = SpellingIndex.load(path)
+    assert loaded.words == index.words
+    assert loaded.candidates("garlick") == index.candidates("garlick")
@@ -0,0 +1,95 @@
+import asyncio
+
+from .sync import CardCache, changed_items, diff_items, sync_cards
+
+
+class FakeTrello:
+    """
+    Serves cards from a dict, recording which checklists were fetched
+    """
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.fetched = []
+
+    async def get_shopping_cards(self, board_names, checklists="all"):
+        assert checklists == "none"
+        return [
+            {"id": card_id, "dateLastActivity": card["date"]}
+            for card_id, card in self.cards.items()
+        ]
+
+    async def card_checklists(self, card_ids):
+        card_ids = list(card_ids)
+        self.fetched.extend(card_ids)
+        return {
+            card_id: [
+                {
+                    "checkItems": [
+                        {"id": id_, "name": name}
+                        for id_, name in self.cards[card_id]["items"].items()
+                    ]
+                }
+            ]
+            for card_id in card_ids
+        }
+
+
+def test_diff_items():
+    old = {"1": "milk", "2": "tomatos", "3": "eggs"}
+    new = {"1": "milk", "2": "tomatoes", "4": "bread"}
+    card = {"id": "c1", "dateLastActivity": "2019-08-10"}
+    assert diff_items(card, old, new) == {
+        "card": "c1",
+        "added": ["bread"],
+        "renamed": ["tomatoes"],
+        "removed": ["eggs"],
+        "dateLastActivity": "2019-08-10",
+        "items": new,
+    }
+
+
+def test_sync_only_fetches_changed_cards():
+    trello = FakeTrello(
+        {
+            "c1": {"date": "2019-08-10", "items": {"1": "milk", "2": "eggs"}},
+            "c2": {"date": "2019-08-11", "items": {"3": "bread"}},
+        }
+    )
+    cache = CardCache({})
+
+    diffs = asyncio.run(sync_cards(trello, cache))
+    assert trello.fetched == ["c1", "c2"]
+    assert changed_items(diffs) == ["milk", "eggs", "bread"]
+    cache.record(diffs)
+
+    # nothing changed, nothing fetched
+    trello.fetched.clear()
+    assert asyncio.run(sync_cards(trello, cache)) == []
+    assert trello.fetched == []
+
+    trello.cards["c2"] = {
+        "date": "2019-08-12",
+        "items": {"3": "brown bread", "4": "milk"},
+    }
+    diffs = asyncio.run(sync_cards(trello, cache))
+    assert trello.fetched == ["c2"]
+    assert changed_items(diffs) == ["milk", "brown bread"]
+    cache.record(diffs)
+    assert cache.get("c2") == {
+        "dateLastActivity": "2019-08-12",
+        "items": {"3": "brown bread", "4": "milk"},
+    }
+
+
+def test_sync_is_cached_once_recorded():
+    trello = FakeTrello({"c1": {"date": "2019-08-10", "items": {"1": "milk"}}})
+    cache = CardCache({})
+    asyncio.run(sync_cards(trello, cache))
+    # e.g. categorizing failed, the card is synced again
+    assert cache.get("c1") is None
+    diffs = asyncio.run(sync_cards(trello, cache))
+    assert changed_items(diffs) == ["milk"]
+
+    cache.record(diffs)
+    assert asyncio.run(sync_cards(trello, cache)) == []
@@ -1,8 +1,18 @@
+import io
+import json
 from copy import deepcopy
+from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
-from .trello_helpers import sort_checklist, Checklist
+from .layout import RouteCache, ShopLayout
+from .trello_helpers import (
+    sort_checklist,
+    sort_checklists,
+    stream_check_items,
+    Checklist,
+)
 
 
 def test_get_checklist():
@@ -72,3 +82,68 @@ def test_sort_checklist(test_items, test_departments):
         assert sorted_items[0]["id"] == original[1]["id"]
         assert sorted_items[1]["id"] == original[2]["id"]
         assert sorted_items[2]["id"] == original[0]["id"]
+
+
+@pytest.mark.parametrize(
+    "route, names",
+    [
+        (["vegetable", "dairy"], ["Tomatoes", "Milk", "Parmesan"]),
+        (["dairy", "vegetable"], ["Milk", "Parmesan", "Tomatoes"]),
+        (["dairy", "vegetables"], ["Milk", "Parmesan", "Tomatoes"]),
+    ],
+)
+def test_sort_checklist_by_category(test_items, route, names):
+    sorted_items = sort_checklist(test_items, route)
+    assert [item["name"] for item in sorted_items] == names
+
+
+def test_sort_checklists(test_items):
+    departments = {"Tomatoes": "vegetable", "Milk": "dairy"}
+    routes = RouteCache({"smart": ShopLayout.linear(["dairy", "vegetable"])})
+    card = SimpleNamespace(checklists=[SimpleNamespace(items=test_items)])
+    (checklist,) = sort_checklists(card, "smart", departments.get, routes)
+    assert [item["name"] for item in checklist.items] == [
+        "Milk",
+        "Tomatoes",
+        "Parmesan",
+    ]
+    assert routes.stats()["misses"] == 1
+
+
+def test_stream_check_items():
+    export = Path(__file__).parent.parent / "shopping.json"
+    with open(export, "rb") as file:
+        check_items = list(stream_check_items(file))
+    with open(export) as file:
+        card = json.load(file)
+    expected = [
+        (check_item["id"], check_item["name"])
+        for checklist in card["checklists"]
+        for check_item in checklist["checkItems"]
+    ]
+    assert [(ci["id"], ci["name"]) for ci in check_items] == expected
+    assert all(isinstance(ci["pos"], str) for ci in check_items)
+
+
+def test_stream_check_items_is_lazy():
+    checklist = {
+        "checkItems": [
+            {"id": str(i), "name": f"item {i}", "pos": i} for i in range(1000)
+        ]
+    }
+    export = io.BytesIO(json.dumps({"checklists": [checklist] * 100}).encode())
+    stream = stream_check_items(export)
+    assert next(stream) == {"id": "0", "name": "item 0", "pos": "0"}
+    # only the start of the export was read so far
+    assert export.tell() < len(export.getvalue()) / 10
+    assert sum(1 for _ in stream) == 100 * 1000 - 1
+
+
+def test_stream_check_items_of_card_list():
+    check_item = {"id": "1", "name": "milk", "pos": 2}
+    cards = [{"checklists": [{"checkItems": [check_item]}]}]
+    export = io.BytesIO(json.dumps(cards).encode())
+    check_items = stream_check_items(
+        export, "item.checklists.item.checkItems.item"
+    )
+    assert list(check_items) == [{"id": "1", "name": "milk", "pos": "2"}]
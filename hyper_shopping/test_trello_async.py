@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from .trello_async import AsyncTrello, TrelloError
+
+BOARDS = [
+    {"id": "b1", "name": "Our Board"},
+    {"id": "b2", "name": "Work"},
+    {"id": "b3", "name": "Holiday"},
+]
+CARDS = {
+    "b1": [
+        {"id": "c1", "name": "Shopping", "dateLastActivity": "2019-08-10T09:00Z"},
+        {"id": "c2", "name": "Chores", "dateLastActivity": "2019-08-11T09:00Z"},
+    ],
+    "b2": [
+        {"id": "c3", "name": "shopping", "dateLastActivity": "2019-08-12T09:00Z"},
+    ],
+    "b3": [
+        {"id": "c4", "name": "Shopping", "dateLastActivity": "2019-08-13T09:00Z"},
+    ],
+}
+
+
+def checklists(card_id):
+    return [{"id": f"cl-{card_id}", "checkItems": [{"name": f"milk {card_id}"}]}]
+
+
+class StubTrello:
+    """
+    A local stand-in for the Trello API, counting requests
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        app = web.Application(middlewares=[self.track])
+        app.router.add_get("/1/members/me/boards", self.boards)
+        app.router.add_get("/1/boards/{board}/cards/open", self.cards)
+        app.router.add_get("/1/cards/{card}/checklists", self.checklists)
+        app.router.add_get("/1/batch", self.batch)
+        app.router.add_put("/1/cards/{card}/checkItem/{item}", self.move)
+        self.server = TestServer(app)
+
+    @web.middleware
+    async def track(self, request, handler):
+        assert request.query["key"] == "key"
+        assert request.query["token"] == "token"
+        self.requests.append(request.path)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    async def boards(self, request):
+        return web.json_response(BOARDS)
+
+    async def cards(self, request):
+        board = request.match_info["board"]
+        if request.query["checklists"] == "none":
+            return web.json_response(CARDS[board])
+        return web.json_response(
+            [dict(card, checklists=checklists(card["id"])) for card in CARDS[board]]
+        )
+
+    async def checklists(self, request):
+        return web.json_response(checklists(request.match_info["card"]))
+
+    async def batch(self, request):
+        urls = request.query["urls"].split(",")
+        assert len(urls) <= 10
+        results = []
+        for url in urls:
+            card_id = url.split("/")[2]
+            if card_id == "missing":
+                results.append({"404": "not found"})
+            else:
+                results.append({"200": checklists(card_id)})
+        return web.json_response(results)
+
+    async def move(self, request):
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        return web.json_response({"pos": float(request.query["pos"])})
+
+
+def run_with_stub(test, **stub_state):
+    async def main():
+        stub = StubTrello()
+        vars(stub).update(stub_state)
+        await stub.server.start_server()
+        try:
+            base_url = str(stub.server.make_url("/1"))
+            async with AsyncTrello("key", "token", base_url, concurrency=2) as trello:
+                return stub, await test(trello)
+        finally:
+            await stub.server.close()
+
+    return asyncio.run(main())
+
+
+def test_get_shopping_cards():
+    stub, cards = run_with_stub(
+        lambda trello: trello.get_shopping_cards(["Our Board", "Work"])
+    )
+    assert [card["id"] for card in cards] == ["c3", "c1"]
+    assert cards[0]["checklists"][0]["checkItems"] == [{"name": "milk c3"}]
+    # one request for the boards, then one per board
+    assert sorted(stub.requests) == [
+        "/1/boards/b1/cards/open",
+        "/1/boards/b2/cards/open",
+        "/1/members/me/boards",
+    ]
+
+
+def test_get_shopping_cards_without_checklists():
+    stub, cards = run_with_stub(
+        lambda trello: trello.get_shopping_cards(["Holiday"], checklists="none")
+    )
+    assert cards == CARDS["b3"]
+
+
+def test_card_checklists_are_batched():
+    card_ids = [f"card{i}" for i in range(25)]
+    stub, checklists_by_card = run_with_stub(
+        lambda trello: trello.card_checklists(card_ids)
+    )
+    assert list(checklists_by_card) == card_ids
+    assert checklists_by_card["card7"] == checklists("card7")
+    assert stub.requests == ["/1/batch"] * 3
+    # concurrent, but bounded
+    assert stub.max_in_flight == 2
+
+
+def test_batch_errors():
+    with pytest.raises(TrelloError):
+        run_with_stub(lambda trello: trello.card_checklists(["c1", "missing"]))
+
+
+def test_request_errors():
+    with pytest.raises(TrelloError):
+        run_with_stub(lambda trello: trello.get("/nowhere"))
+
+
+def test_rate_limited_requests_are_retried():
+    stub, moved = run_with_stub(
+        lambda trello: trello.request("PUT", "/cards/c1/checkItem/i1", pos="2.5"),
+        rate_limited=2,
+    )
+    assert moved == {"pos": 2.5}
+    assert stub.requests == ["/1/cards/c1/checkItem/i1"] * 3
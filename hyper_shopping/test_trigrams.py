@@ -0,0 +1,89 @@
+import pytest
+
+from .trigrams import TrigramIndex, trigrams
+
+ENTRIES = {
+    "Pop-Tarts Frosted Strawberry": "breakfast",
+    "Salty Cucumbers": "vegetable",
+    "Kinnie 1.5L": "drink",
+    "Fresh Milk": "dairy",
+    "Milk Chocolate Bar": "sweets",
+}
+
+
+@pytest.fixture
+def index():
+    return TrigramIndex.build(ENTRIES)
+
+
+def test_trigrams():
+    assert trigrams("Pop") == {"  p", " po", "pop", "op "}
+    assert trigrams("pop pop") == trigrams("POP")
+    assert trigrams("") == frozenset()
+
+
+@pytest.mark.parametrize(
+    "query,name",
+    [
+        ("Pop tards", "Pop-Tarts Frosted Strawberry"),
+        ("Polish salty cucumbers in a bag", "Salty Cucumbers"),
+        ("kinie", "Kinnie 1.5L"),
+        ("fresh mlik", "Fresh Milk"),
+    ],
+)
+def test_search(index, query, name):
+    assert index.search(query)[0].name == name
+
+
+@pytest.mark.parametrize(
+    "query,name",
+    [
+        ("Steak", "Pop-Tarts Frosted Strawberry"),
+        ("Eggplant", "Egg"),
+        ("Corned beef", "Corn"),
+        ("Milk chocolate", "Fresh Milk"),
+        ("Milk chocolate", "Milk"),
+    ],
+)
+def test_search_needs_every_word(query, name):
+    index = TrigramIndex.build({name: "dairy"})
+    assert index.search(query) == []
+
+
+def test_search_threshold(index):
+    assert index.search("pastizzi") == []
+    matches = index.search("milk", min_similarity=0)
+    assert [match.name for match in matches] == ["Fresh Milk", "Milk Chocolate Bar"]
+    assert matches[0].jaccard > matches[1].jaccard
+
+
+def test_classify(index):
+    assert index.classify(["pop tards", "pastizzi", "pop tards"]) == [
+        "breakfast",
+        None,
+        "breakfast",
+    ]
+
+
+def test_incremental_update(index, tmp_path):
+    assert index.update(ENTRIES) == 0
+    assert index.update({"Fresh Milk": "chilled", "Pastizzi": "bakery"}) == 2
+    assert index.search("pastizi")[0].category == "bakery"
+    assert index.get("Fresh Milk") == "chilled"
+    index.remove("Salty Cucumbers")
+    assert index.search("salty cucumbers") == []
+    assert len(index) == 5
+
+    path = tmp_path / "trigrams.idx"
+    index.save(path)
+    loaded = TrigramIndex.load(path)
+    assert loaded.search("pop tards") == index.search("pop tards")
+    assert "Salty Cucumbers" not in loaded
+
+
+def test_stamp_is_saved(index, tmp_path):
+    assert index.stamp is None
+    index.stamp = (3, 120)
+    path = tmp_path / "trigrams.idx"
+    index.save(path)
+    assert TrigramIndex.load(path).stamp == (3, 120)
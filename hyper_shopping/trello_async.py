@@ -0,0 +1,172 @@
+"""
+An asyncio Trello client, over a single pooled HTTP session.
+
+``py-trello`` makes one blocking request per board, card and checklist;
+here requests run concurrently (bounded by ``concurrency``), boards are
+fetched with all their open cards and checklists in one request each, and
+per-card requests go through Trello's ``/batch`` endpoint.
+"""
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+
+TRELLO_API = "https://api.trello.com/1"
+# the most urls Trello accepts in a single /batch request
+BATCH_SIZE = 10
+
+CARD_FIELDS = "name,dateLastActivity,idBoard,idChecklists"
+
+
+class TrelloError(Exception):
+    pass
+
+
+class AsyncTrello:
+    """
+    Use as an async context manager, which owns the HTTP session::
+
+        async with AsyncTrello() as trello:
+            cards = await trello.get_shopping_cards()
+
+    :param concurrency: the most requests in flight at any time
+    :param retries: how many times a rate limited (429) request is retried,
+        backing off exponentially from ``backoff`` seconds
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        token: Optional[str] = None,
+        base_url: str = TRELLO_API,
+        concurrency: int = 10,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self.api_key = api_key or os.getenv("TRELLO_API_KEY")
+        self.token = token or os.getenv("TRELLO_TOKEN")
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self) -> "AsyncTrello":
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self.session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method: str, path: str, **params) -> Any:
+        """
+        Make an authenticated API request, returning the decoded JSON.
+
+        Rate limited requests are retried after the ``Retry-After`` delay
+        the API asks for, or an exponential backoff.
+        """
+        if self.session is None:
+            raise TrelloError("use AsyncTrello as an 'async with' context")
+        params.update(key=self.api_key or "", token=self.token or "")
+        for attempt in range(self.retries + 1):
+            async with self._slots:
+                async with self.session.request(
+                    method, f"{self.base_url}{path}", params=params
+                ) as response:
+                    if response.status == 429 and attempt < self.retries:
+                        retry_after = response.headers.get("Retry-After")
+                        delay = (
+                            float(retry_after)
+                            if retry_after
+                            else self.backoff * 2 ** attempt
+                        )
+                    elif response.status >= 400:
+                        text = await response.text()
+                        raise TrelloError(
+                            f"{method} {path} failed ({response.status}): {text}"
+                        )
+                    else:
+                        return await response.json()
+            # wait without holding a slot
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def get(self, path: str, **params) -> Any:
+        return await self.request("GET", path, **params)
+
+    async def batch(self, paths: List[str]) -> List[Any]:
+        """
+        GET many API paths, at most ``BATCH_SIZE`` per request, with all
+        the batch requests made concurrently. Results keep the paths' order.
+        """
+        chunks = [
+            paths[start : start + BATCH_SIZE]
+            for start in range(0, len(paths), BATCH_SIZE)
+        ]
+        responses = await asyncio.gather(
+            *(self.get("/batch", urls=",".join(chunk)) for chunk in chunks)
+        )
+        results = []
+        for response in responses:
+            for result in response:
+                # each result is {"200": body}, or an error status
+                status, body = next(iter(result.items()))
+                if status != "200":
+                    raise TrelloError(f"batch request failed ({status}): {body}")
+                results.append(body)
+        return results
+
+    async def list_boards(self) -> List[Dict]:
+        return await self.get("/members/me/boards", fields="name", filter="open")
+
+    async def board_cards(
+        self, board_id: str, checklists: str = "all"
+    ) -> List[Dict]:
+        """
+        Return the open cards of a board, with all their checklists
+
+        :param checklists: ``"none"`` to only fetch the card fields
+        """
+        return await self.get(
+            f"/boards/{board_id}/cards/open",
+            fields=CARD_FIELDS,
+            checklists=checklists,
+        )
+
+    async def card_checklists(self, card_ids: Iterable[str]) -> Dict[str, List]:
+        """
+        Return the checklists of each card, fetched in batches
+        """
+        card_ids = list(card_ids)
+        checklists = await self.batch(
+            [f"/cards/{card_id}/checklists" for card_id in card_ids]
+        )
+        return dict(zip(card_ids, checklists))
+
+    async def get_shopping_cards(
+        self,
+        board_names: Iterable[str] = ("Our Board",),
+        checklists: str = "all",
+    ) -> List[Dict]:
+        """
+        Return the shopping cards (with checklists) of the named boards,
+        most recently active first. All boards are fetched concurrently.
+        """
+        names = set(board_names)
+        boards = [b for b in await self.list_boards() if b["name"] in names]
+        board_cards = await asyncio.gather(
+            *(self.board_cards(board["id"], checklists) for board in boards)
+        )
+        cards = [
+            card
+            for cards in board_cards
+            for card in cards
+            if card["name"].lower() == "shopping"
+        ]
+        # ISO 8601 timestamps sort chronologically as strings
+        return sorted(cards, key=lambda c: c["dateLastActivity"], reverse=True)
@@ -1,17 +1,19 @@
 import os
-from functools import partial
-from copy import deepcopy
 from trello import TrelloClient
 from trello.card import Card
 from trello.checklist import Checklist
 
-from typing import List, Dict
-from mypy_extensions import TypedDict
+from typing import BinaryIO, Iterator, List, Dict, Optional
+import ijson
 import json
 
-CheckItem = TypedDict("CheckItem", {"id": str, "name": str, "pos": str})
+from .datastore import DEFAULT_CATEGORY_SYNONYMS
+from .layout import RouteCache
+from .routing import CheckItem, DepartmentLookup, RouteSorter, ShopRoute
 
-SHOP_ROUTES = {"smart": ["bbq", "drinks", "diy", "vegetables", "dairy"]}
+# where check items are in a card or a whole board export, for a JSON list
+# of cards (as returned by the API) use "item.checklists.item.checkItems.item"
+EXPORT_CHECK_ITEMS = "checklists.item.checkItems.item"
 
 trello = TrelloClient(
     api_key=os.getenv("TRELLO_API_KEY"),
@@ -55,54 +57,78 @@ def get_card_from_file(card_file_path: str) -> Card:
         return json.load(file)
 
 
-def sort_checklists(card: Card, shop: str) -> List[Checklist]:
+def stream_check_items(
+    file: BinaryIO, prefix: str = EXPORT_CHECK_ITEMS
+) -> Iterator[CheckItem]:
     """
-    Sort a Trello card for all checklists using pre-defined sections for the given shop
+    Yield the check items of a Trello JSON export, parsing it incrementally
+    so that memory use doesn't grow with the size of the export.
+
+    :param file: the export, opened in binary mode
+    :param prefix: the JSON path of the check items in the export
     """
-    preferred_shop_route = SHOP_ROUTES[shop]
-    for checklist in card.checklists:
-        checklist.items = sort_checklist(
-            checklist=checklist.items, route=preferred_shop_route
+    for check_item in ijson.items(file, prefix, use_float=True):
+        yield CheckItem(
+            id=check_item["id"],
+            name=check_item["name"],
+            pos=str(check_item["pos"]),
         )
+
+
+def sort_checklists(
+    card: Card,
+    shop: str,
+    department_of: DepartmentLookup,
+    routes: RouteCache,
+) -> List[Checklist]:
+    """
+    Sort a Trello card for all checklists using the shortest route
+    through the given shop
+
+    :param department_of: returns the department of an item name, such
+        as the category store's lookup
+    :param routes: the shop layouts and their planned routes, such as
+        the persisted route cache
+    """
+    sorter = RouteSorter(
+        routes.layouts, department_of, routes, DEFAULT_CATEGORY_SYNONYMS
+    )
+    for checklist in card.checklists:
+        checklist.items = sorter.sort_for_shop(checklist.items, shop)
     return card.checklists
 
 
-# TODO: find items' departments via nltk
+# departments of the sample card items, for when there is no category store
 dummy_item_department_map = {
-    "tomatoes": "vegetables",
+    "tomatoes": "vegetable",
     "milk": "dairy",
     "parmesan": "dairy",
 }
 
 
-def sort_function(item: CheckItem, department_order: List[str]):
-    """
-    A sorted key function that returns a tuple of two items:
-     ( the index of the department of this item in the route,
-       the name of the item )
-    """
-    normalized_name = item["name"].lower()
-    department = dummy_item_department_map[normalized_name]
-    return (department_order.index(department), normalized_name)
+def dummy_department(name: str) -> Optional[str]:
+    return dummy_item_department_map.get(name.lower())
 
 
-def sort_checklist(checklist: List[CheckItem], route: List[str]):
+def sort_checklist(
+    checklist: List[CheckItem],
+    route: ShopRoute,
+    department_of: DepartmentLookup = dummy_department,
+) -> List[CheckItem]:
     """
     Given a route through a given shop's departments, sort
     the trello items in the list by the departments on the route
     grouping items that are available in that shop's section.
+    Items of unknown departments come last.
 
     :param checklist: the list of trello checklist items
-    :param route: list of department names ordered for optimal route
-    :returns: the sorted list of items
+    :param route: list of department names ordered for optimal route,
+        or a shop layout to plan the route through the list's departments,
+        synonyms of a category (e.g. "vegetables") are on its department
+    :param department_of: returns the department of an item name
+    :returns: sorted copies of the items, with new positions
     """
-    checklist = deepcopy(checklist)  # don't change original
-
-    sorted_items = sorted(
-        checklist, key=partial(sort_function, department_order=route)
+    sorter = RouteSorter(
+        {"route": route}, department_of, synonyms=DEFAULT_CATEGORY_SYNONYMS
     )
-
-    # reset positions to new positive integer values
-    for i, item in enumerate(sorted_items):
-        item["pos"] = str(i + 1)
-    return sorted_items
+    return sorter.sort_for_shop(checklist, "route")
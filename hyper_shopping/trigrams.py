@@ -0,0 +1,242 @@
+"""
+A character trigram index, for fuzzy matching items to known names.
+
+Free text like "Pop tards" or "Polish salty cucumbers in a bag" is neither a
+lemma nor a single typo, but shares most of its trigrams with the name it
+is about ("Pop-Tarts", "Salty Cucumbers"). Each known name (a catalog
+product, or an already categorized item) is indexed under the trigrams of
+its words, padded like PostgreSQL's pg_trgm so word starts weigh more, and
+a query only scores the names sharing at least one trigram with it.
+
+A match scores how well each word of the query matches its closest word of
+the name (by Dice similarity of their trigrams), weighted by word length:
+a few words of a long product name still match fully ("Pop tards" is
+"Pop-Tarts Frosted Strawberry"), but a word the name lacks counts against
+it, so "Milk chocolate" isn't "Milk" and "Eggplant" isn't "Egg". Ties are
+ranked by the Jaccard similarity of the whole trigram sets, which counts
+the name's other words too. Stopwords (see ``phrases.STOPWORDS``) are left
+out of both.
+"""
+import pickle
+from collections import Counter
+from pathlib import Path
+from typing import (
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+)
+
+from .categorize import item_key
+from .phrases import STOPWORDS
+
+VERSION = 3
+
+
+class TrigramMatch(NamedTuple):
+    name: str
+    category: str
+    similarity: float
+    jaccard: float
+
+
+def word_trigrams(text: str) -> List[FrozenSet[str]]:
+    """
+    Return the trigrams of each distinct word of text but stopwords, padded
+    with two spaces before and one after
+    """
+    grams = []
+    for word in dict.fromkeys(item_key(text).split("_")):
+        if word and word not in STOPWORDS:
+            padded = f"  {word} "
+            grams.append(
+                frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+            )
+    return grams
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Return the trigrams of all the words of text (see ``word_trigrams``)
+    """
+    grams: Set[str] = set()
+    for word in word_trigrams(text):
+        grams.update(word)
+    return frozenset(grams)
+
+
+def word_similarity(
+    query: List[FrozenSet[str]], name: List[FrozenSet[str]]
+) -> float:
+    """
+    Return the Dice similarity of each query word to its closest name word,
+    averaged over the query words weighted by their number of trigrams
+    """
+    total = sum(len(word) for word in query)
+    if not total or not name:
+        return 0.0
+    matched = sum(
+        max(2 * len(word & other) / (len(word) + len(other)) for other in name)
+        * len(word)
+        for word in query
+    )
+    return matched / total
+
+
+class TrigramIndex:
+    """
+    Names and their category, searchable by trigram similarity.
+
+    Names are only ever added: the postings of a renamed or removed name
+    are kept, but skipped, until the index is rebuilt.
+
+    :param min_similarity: the similarity (see ``word_similarity``) below
+        which matches are ignored
+    """
+
+    # a cheap stamp of the entries the index was last updated with, saved
+    # with it, so that they're only read again once it changes
+    stamp: Hashable
+
+    def __init__(self, min_similarity: float = 0.6):
+        self.min_similarity = min_similarity
+        self.stamp = None
+        self.names: List[str] = []
+        self.categories: List[Optional[str]] = []
+        self.sizes: List[int] = []
+        self.ids: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = {}
+
+    @classmethod
+    def build(cls, entries: Mapping[str, str], **kwargs) -> "TrigramIndex":
+        index = cls(**kwargs)
+        index.update(entries)
+        return index
+
+    def __len__(self) -> int:
+        return sum(category is not None for category in self.categories)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self.get(name) is not None
+
+    def get(self, name: str) -> Optional[str]:
+        row = self.ids.get(name)
+        return self.categories[row] if row is not None else None
+
+    def add(self, name: str, category: str):
+        """
+        Add a name, or change the category of a known one
+        """
+        row = self.ids.get(name)
+        if row is not None:
+            self.categories[row] = category
+            return
+        grams = trigrams(name)
+        if not grams:
+            return
+        row = self.ids[name] = len(self.names)
+        self.names.append(name)
+        self.categories.append(category)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(row)
+
+    def remove(self, name: str):
+        row = self.ids.get(name)
+        if row is not None:
+            self.categories[row] = None
+
+    def update(self, entries: Mapping[str, str]) -> int:
+        """
+        Add the new names and changed categories of entries, returning how
+        many there were (only new names are split into trigrams)
+        """
+        changed = 0
+        for name, category in entries.items():
+            if self.get(name) != category:
+                self.add(name, category)
+                changed += 1
+        return changed
+
+    def search(
+        self, query: str, top_k: int = 5, min_similarity: Optional[float] = None
+    ) -> List[TrigramMatch]:
+        """
+        Return up to ``top_k`` of the names most similar to query
+        """
+        if min_similarity is None:
+            min_similarity = self.min_similarity
+        words = word_trigrams(query)
+        grams = trigrams(query)
+        total = sum(len(word) for word in words)
+        # the trigrams each name shares with each query word, all summed
+        shared: Counter = Counter()
+        for word in words:
+            for gram in word:
+                shared.update(self.postings.get(gram, ()))
+
+        matches = []
+        for row, count in shared.items():
+            category = self.categories[row]
+            # a word's Dice similarity is at most twice the share of its
+            # trigrams found, so only names sharing enough are compared
+            if category is None or 2 * count < min_similarity * total:
+                continue
+            name = self.names[row]
+            similarity = word_similarity(words, word_trigrams(name))
+            if similarity >= min_similarity:
+                common = len(grams & trigrams(name))
+                jaccard = common / (len(grams) + self.sizes[row] - common)
+                matches.append(TrigramMatch(name, category, similarity, jaccard))
+        matches.sort(key=lambda match: (-match.similarity, -match.jaccard, match.name))
+        return matches[:top_k]
+
+    def search_many(
+        self, queries: Iterable[str], top_k: int = 5
+    ) -> Dict[str, List[TrigramMatch]]:
+        """
+        Search each distinct query once
+        """
+        return {
+            query: self.search(query, top_k) for query in dict.fromkeys(queries)
+        }
+
+    def classify(self, items: List[str]) -> List[Optional[str]]:
+        """
+        Return the category of each item's best match, or None
+        """
+        found = self.search_many(items, top_k=1)
+        return [found[item][0].category if found[item] else None for item in items]
+
+    def save(self, path: Path):
+        with open(path, "wb") as file:
+            pickle.dump(
+                (
+                    VERSION,
+                    self.min_similarity,
+                    self.stamp,
+                    self.names,
+                    self.categories,
+                    self.sizes,
+                    self.postings,
+                ),
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "TrigramIndex":
+        with open(path, "rb") as file:
+            version, min_similarity, stamp, *state = pickle.load(file)
+        if version != VERSION:
+            raise ValueError(f"'{path}' is not a trigram index file")
+        index = cls(min_similarity)
+        index.stamp = stamp
+        index.names, index.categories, index.sizes, index.postings = state
+        index.ids = {name: row for row, name in enumerate(index.names)}
+        return index
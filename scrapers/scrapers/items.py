@@ -8,7 +8,13 @@
 import scrapy
 
 
-class ScrapersItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+class ProductItem(scrapy.Item):
+    """
+    A store product, with the fields of ``hyper_shopping.catalog.Product``
+    """
+
+    product_id = scrapy.Field()
+    name = scrapy.Field()
+    department = scrapy.Field()
+    aisle = scrapy.Field()
+    url = scrapy.Field()
@@ -4,8 +4,14 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
 
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.project import data_path
 
 
 class ScrapersSpiderMiddleware(object):
@@ -56,48 +62,136 @@ class ScrapersSpiderMiddleware(object):
         spider.logger.info('Spider opened: %s' % spider.name)
 
 
-class ScrapersDownloaderMiddleware(object):
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+class PageFingerprints(object):
+    """
+    The ETag, Last-Modified and body hash of each crawled page, in SQLite.
+
+    Writes are committed every ``commit_every`` pages and on close, rather
+    than one transaction per page.
+    """
+
+    def __init__(self, path, commit_every=100):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                hash TEXT NOT NULL,
+                checked REAL NOT NULL
+            )
+            """
+        )
+        self.commit_every = commit_every
+        self.pending = 0
+
+    def get(self, url):
+        """
+        Return the etag, last modified date and hash of a page, or None
+        """
+        return self.connection.execute(
+            "SELECT etag, last_modified, hash FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+
+    def set(self, url, etag, last_modified, digest):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, digest, time.time()),
+        )
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+
+def header(headers, name):
+    value = headers.get(name)
+    return value.decode("latin-1") if value else None
+
+
+class IncrementalMiddleware(object):
+    """
+    Make recrawls cost what changed rather than what there is.
+
+    Pages are requested conditionally, with the validators (ETag and
+    Last-Modified) they were last served with, and the body of every page
+    fetched is hashed. Responses of pages that haven't changed, either not
+    modified (304) or with the same body, get ``meta["unchanged"]`` so
+    spiders can skip parsing them.
+
+    Place it after ``HttpCacheMiddleware`` (nearer the downloader) so it
+    sees 304 responses before the HTTP cache swaps in the cached page,
+    whose links can still be followed. Without a cached page, a 304
+    response is ignored.
+    """
+
+    def __init__(self, fingerprints, stats=None):
+        self.fingerprints = fingerprints
+        self.stats = stats
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+        path = Path(data_path(crawler.settings.get("INCREMENTAL_PATH")))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        middleware = cls(PageFingerprints(path), crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def tracks(self, request):
+        return request.method == "GET" and not request.meta.get("dont_track")
+
+    def inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
 
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        if not self.tracks(request):
+            return None
+        known = self.fingerprints.get(request.url)
+        if known is not None:
+            etag, last_modified, _ = known
+            # the HTTP cache sets its own validators, when it has the page
+            if etag and b"If-None-Match" not in request.headers:
+                request.headers[b"If-None-Match"] = etag
+            if last_modified and b"If-Modified-Since" not in request.headers:
+                request.headers[b"If-Modified-Since"] = last_modified
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
-
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if not self.tracks(request):
+            return response
+        if response.status == 304:
+            self.inc_stat("incremental/not_modified")
+            request.meta["unchanged"] = True
+            if "cached_response" not in request.meta:
+                raise IgnoreRequest(f"{request.url} is not modified")
+            return response
+        if response.status != 200:
+            return response
+
+        digest = hashlib.sha1(response.body).hexdigest()
+        known = self.fingerprints.get(request.url)
+        self.fingerprints.set(
+            request.url,
+            header(response.headers, b"ETag"),
+            header(response.headers, b"Last-Modified"),
+            digest,
+        )
+        if known is not None and known[2] == digest:
+            self.inc_stat("incremental/unchanged")
+            request.meta["unchanged"] = True
+        else:
+            self.inc_stat("incremental/changed")
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
-
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
-
-    def spider_opened(self, spider):
-        spider.logger.info('Spider opened: %s' % spider.name)
+    def spider_closed(self, spider):
+        self.fingerprints.close()
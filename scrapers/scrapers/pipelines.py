@@ -4,8 +4,134 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+import tempfile
+import time
+from pathlib import Path
+
+from scrapy.exceptions import DropItem
+from scrapy.utils.job import job_dir
+from twisted.internet import task
+
+from hyper_shopping.bloom import BloomFilter
+from hyper_shopping.catalog import Catalog
 
 
 class ScrapersPipeline(object):
+    """
+    Bulk-load scraped products into the local catalog.
+
+    Products are buffered and loaded in one transaction once
+    ``batch_size`` are waiting, every ``flush_interval`` seconds, and when
+    the spider closes. Products already seen in this crawl are dropped,
+    remembered in a Bloom filter file (in the JOBDIR when the crawl is
+    resumable, so it survives pauses), so memory stays flat however many
+    pages are crawled.
+
+    The throughput and flush latencies are reported in the ``catalog/``
+    crawl stats.
+    """
+
+    def __init__(
+        self,
+        catalog_path,
+        batch_size=500,
+        flush_interval=5.0,
+        seen_path=None,
+        seen_capacity=1000000,
+        stats=None,
+    ):
+        self.catalog_path = Path(catalog_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.seen_path = Path(seen_path) if seen_path else None
+        self.seen_capacity = seen_capacity
+        self.stats = stats
+        self.products = {}
+        self.catalog = None
+        self.seen = None
+        self.temporary = None
+        self.timer = None
+        self.started = None
+        self.loaded = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        directory = job_dir(settings)
+        return cls(
+            settings.get("CATALOG_PATH", "../catalog.sqlite"),
+            settings.getint("CATALOG_BATCH_SIZE", 500),
+            settings.getfloat("CATALOG_FLUSH_INTERVAL", 5.0),
+            Path(directory) / "catalog.seen" if directory else None,
+            settings.getint("CATALOG_SEEN_CAPACITY", 1000000),
+            crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self.catalog = Catalog(self.catalog_path)
+        if self.seen_path is None:
+            # only this crawl's products, the file goes when it's done
+            self.temporary = tempfile.TemporaryDirectory()
+            path = Path(self.temporary.name) / "catalog.seen"
+        else:
+            path = self.seen_path
+        self.seen = BloomFilter(path, self.seen_capacity)
+        self.started = time.monotonic()
+        if self.flush_interval:
+            self.timer = task.LoopingCall(self.flush)
+            self.timer.start(self.flush_interval, now=False)
+
+    def close_spider(self, spider):
+        if self.timer is not None and self.timer.running:
+            self.timer.stop()
+        self.flush()
+        self.catalog.close()
+        self.seen.close()
+        if self.temporary is not None:
+            self.temporary.cleanup()
+        elapsed = time.monotonic() - self.started
+        if elapsed:
+            self.set_stat("catalog/items_per_second", self.loaded / elapsed)
+
+    def inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    def set_stat(self, key, value):
+        if self.stats is not None:
+            self.stats.set_value(key, value)
+
+    def flush(self):
+        """
+        Load the buffered products in a single transaction
+        """
+        if not self.products:
+            return
+        start = time.monotonic()
+        self.catalog.add_products(self.products.values())
+        latency = time.monotonic() - start
+        self.loaded += len(self.products)
+        self.products = {}
+        self.inc_stat("catalog/flushes")
+        self.inc_stat("catalog/flush_seconds", latency)
+        if self.stats is not None:
+            self.stats.max_value("catalog/flush_seconds_max", latency)
+        self.set_stat("catalog/items_loaded", self.loaded)
+
     def process_item(self, item, spider):
+        if not item.get("product_id") or not item.get("name"):
+            raise DropItem(f"Incomplete product at {item.get('url')}")
+        product_id = str(item["product_id"])
+        if not self.seen.add(product_id):
+            self.inc_stat("catalog/duplicates")
+            raise DropItem(f"Product {product_id} was already seen")
+        self.products[product_id] = dict(
+            product_id=product_id,
+            name=item["name"],
+            department=item.get("department") or "",
+            aisle=item.get("aisle"),
+            url=item.get("url"),
+        )
+        if len(self.products) >= self.batch_size:
+            self.flush()
         return item
@@ -1,19 +1,43 @@
 # -*- coding: utf-8 -*-
-import scrapy
 from scrapy.linkextractors import LinkExtractor
 from scrapy.spiders import CrawlSpider, Rule
 
+from ..items import ProductItem
+
+PRODUCT_ID = '//input[@id="sid"]/@value'
+PRODUCT_NAME = 'normalize-space(//div[@id="name"])'
+# the links of the breadcrumb trail, from the home page to the product
+BREADCRUMBS = '//*[contains(@class, "breadcrumb")]//a/text()'
+
 
 class GreensSpider(CrawlSpider):
     name = "greens"
-    allowed_domains = ["https://www.greens.com.mt"]
+    allowed_domains = ["www.greens.com.mt"]
     start_urls = ["https://www.greens.com.mt/home"]
 
     rules = (Rule(LinkExtractor(allow=r"Items/"), callback="parse_item", follow=True),)
 
     def parse_item(self, response):
-        item = {}
-        # item['domain_id'] = response.xpath('//input[@id="sid"]/@value').get()
-        # item['name'] = response.xpath('//div[@id="name"]').get()
-        # item['description'] = response.xpath('//div[@id="description"]').get()
-        return item
+        """
+        Return the product of an item page, in the department and aisle of
+        its breadcrumb trail ("Home / Department / Aisle / Product"), unless
+        the page is unchanged since the last crawl
+        """
+        if response.meta.get("unchanged"):
+            return None
+        product_id = response.xpath(PRODUCT_ID).get()
+        name = response.xpath(PRODUCT_NAME).get()
+        if not product_id or not name:
+            return None
+        trail = [
+            crumb.strip()
+            for crumb in response.xpath(BREADCRUMBS).getall()
+            if crumb.strip() and crumb.strip().lower() != "home"
+        ]
+        return ProductItem(
+            product_id=product_id.strip(),
+            name=name,
+            department=trail[0] if trail else "",
+            aisle=trail[1] if len(trail) > 1 else None,
+            url=response.url,
+        )